@@ -1,14 +1,111 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QTextEdit, QTableWidget, QTableWidgetItem, QDateTimeEdit, QFileDialog, QMessageBox
-from PyQt5.QtCore import Qt, QDateTime
-import sqlite3
+import argparse
+from startup_timing import StartupTimer
+from PyQt5.QtWidgets import QApplication, QWidget, QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QTableWidget, QTableWidgetItem, QAbstractItemView, QDateEdit, QDateTimeEdit, QComboBox, QFileDialog, QMessageBox, QShortcut
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtCore import QDateTime, QDate, QTime, QTimer
 from datetime import datetime
 
+import instrumentation
+from bulk_import import ConsoleJob, import_summary
+from csv_export import export_rows
+from database import connect
+from date_range import DATE_RANGES, CUSTOM_RANGE
+from log_panel import LogPanel
+from retention import archive_months, archive_path, archived_until, clear_table
+from search_cache import SearchCache, SEARCH_DEBOUNCE_MS
+from repository import ATTENDANCE
+from storage import attendance_month_report, reset_attendance_daily
+from table_model import SqliteTableModel
+from table_window import create_executors, create_table_view, date_range_filter, export_records, import_records, prompt_and_archive, show_filtered, shutdown_executors
+from write_queue import WriteQueue
+
+
+REPORT_HEADERS = ['Name', 'Days Present', 'Punches', 'Hours (first in to last out)']
+
+
+def format_duration(seconds):
+    return f'{seconds // 3600}:{seconds % 3600 // 60:02d}'
+
+
+class MonthlyReportDialog(QDialog):
+    # Per-person totals for one month, read from the daily summaries rather
+    # than the attendance log.
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+
+        self.executor = executor
+        self.rows = []
+        self.setWindowTitle('Monthly Attendance Report')
+        self.resize(700, 500)
+
+        self.month_label = QLabel('Month:', self)
+        self.month_input = QDateEdit(QDate.currentDate(), self)
+        self.month_input.setDisplayFormat('yyyy-MM')
+        self.month_input.setCalendarPopup(True)
+        self.export_button = QPushButton('Export to CSV', self)
+        self.status_label = QLabel(self)
+
+        self.report_table = QTableWidget(0, len(REPORT_HEADERS), self)
+        self.report_table.setHorizontalHeaderLabels(REPORT_HEADERS)
+        self.report_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.report_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+
+        layout = QVBoxLayout(self)
+        month_layout = QHBoxLayout()
+        month_layout.addWidget(self.month_label)
+        month_layout.addWidget(self.month_input)
+        month_layout.addWidget(self.export_button)
+        layout.addLayout(month_layout)
+        layout.addWidget(self.report_table)
+        layout.addWidget(self.status_label)
+
+        self.month_input.dateChanged.connect(self.load_report)
+        self.export_button.clicked.connect(self.export_report)
+
+    def month(self):
+        return self.month_input.date().toString('yyyy-MM')
+
+    def load_report(self):
+        month = self.month()
+        archive_file = archive_path(ATTENDANCE.table, month) if month in archive_months(ATTENDANCE.table) else None
+        self.status_label.setText('Loading...')
+        self.executor.submit(attendance_month_report, month, archive_file, key='report', on_result=self.show_report, operation='report')
+
+    def show_report(self, rows):
+        self.rows = [(name, days, punches, format_duration(seconds)) for name, days, punches, seconds in rows]
+        self.report_table.setUpdatesEnabled(False)
+        self.report_table.setRowCount(len(self.rows))
+        for position, row in enumerate(self.rows):
+            for column, value in enumerate(row):
+                self.report_table.setItem(position, column, QTableWidgetItem(str(value)))
+        self.report_table.setUpdatesEnabled(True)
+        self.status_label.setText(f'{len(self.rows)} people attended in {self.month()}')
+
+    def export_report(self):
+        options = QFileDialog.Options()
+        options |= QFileDialog.DontUseNativeDialog
+        file_name, _ = QFileDialog.getSaveFileName(self, "Save Monthly Report", f"attendance-{self.month()}.csv", "CSV Files (*.csv);;All Files (*)", options=options)
+
+        if file_name:
+            def report_exported(row_count):
+                self.status_label.setText(f'Exported {row_count} rows to {file_name}')
+
+            self.executor.submit(export_rows, REPORT_HEADERS, self.rows, file_name, on_result=report_exported, operation='export')
+
+
 class AttendanceSystem(QWidget):
     def __init__(self):
         super().__init__()
 
-        self.db_connection = sqlite3.connect('attendance.db')
+        self.db_executor, self.report_executor, self.bulk_executor = create_executors(self, ATTENDANCE.database)
+        self.write_queue = WriteQueue(self.db_executor, parent=self)
+        self.search_indexed = False
+        self.search_cache = SearchCache([1])
+        self.search_term = ''
+        self.archived_until = None
+        self.attached_months = None
+        self.report_dialog = None
         self.create_table()
 
         self.init_ui()
@@ -27,17 +124,35 @@ class AttendanceSystem(QWidget):
         self.mark_attendance_button = QPushButton('Mark Attendance', self)
         self.search_label = QLabel('Search Name:', self)
         self.search_input = QLineEdit(self)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.search_attendance)
         self.search_button = QPushButton('Search', self)
+
+        self.date_range_label = QLabel('Show:', self)
+        self.date_range_input = QComboBox(self)
+        self.date_range_input.addItems(DATE_RANGES)
+        self.date_from_label = QLabel('From:', self)
+        self.date_from_input = QDateTimeEdit(QDateTime(QDate.currentDate(), QTime(0, 0)), self)
+        self.date_from_input.setCalendarPopup(True)
+        self.date_to_label = QLabel('To:', self)
+        self.date_to_input = QDateTimeEdit(QDateTime(QDate.currentDate(), QTime(23, 59, 59)), self)
+        self.date_to_input.setCalendarPopup(True)
+        self.date_from_input.setEnabled(False)
+        self.date_to_input.setEnabled(False)
         self.export_button = QPushButton('Export to CSV', self)
         self.view_details_button = QPushButton('View Details', self)
+        self.import_button = QPushButton('Import CSV', self)
         self.clear_records_button = QPushButton('Clear Records', self)
+        self.archive_button = QPushButton('Archive Old Records', self)
+        self.report_button = QPushButton('Monthly Report', self)
 
-        self.log_display = QTextEdit(self)
-        self.log_display.setReadOnly(True)
+        self.log_display = LogPanel('attendance', self)
 
-        self.attendance_table = QTableWidget(self)
-        self.attendance_table.setColumnCount(3)
-        self.attendance_table.setHorizontalHeaderLabels(['ID', 'Name', 'Timestamp'])
+        self.attendance_model = SqliteTableModel(self.report_executor, ATTENDANCE.table, ATTENDANCE.columns, ATTENDANCE.headers, formatters=ATTENDANCE.formatters, sort_keys=ATTENDANCE.sort_keys, deferred=True, parent=self)
+        self.attendance_model.fully_loaded.connect(self.cache_search_results)
+        self.attendance_table = create_table_view(self, self.attendance_model)
 
         layout = QVBoxLayout(self)
 
@@ -55,10 +170,22 @@ class AttendanceSystem(QWidget):
         search_layout.addWidget(self.search_button)
         layout.addLayout(search_layout)
 
+        date_layout = QHBoxLayout()
+        date_layout.addWidget(self.date_range_label)
+        date_layout.addWidget(self.date_range_input)
+        date_layout.addWidget(self.date_from_label)
+        date_layout.addWidget(self.date_from_input)
+        date_layout.addWidget(self.date_to_label)
+        date_layout.addWidget(self.date_to_input)
+        layout.addLayout(date_layout)
+
         buttons_layout = QHBoxLayout()
         buttons_layout.addWidget(self.export_button)
         buttons_layout.addWidget(self.view_details_button)
+        buttons_layout.addWidget(self.import_button)
         buttons_layout.addWidget(self.clear_records_button)
+        buttons_layout.addWidget(self.archive_button)
+        buttons_layout.addWidget(self.report_button)
         layout.addLayout(buttons_layout)
 
         layout.addWidget(self.log_display)
@@ -66,109 +193,160 @@ class AttendanceSystem(QWidget):
 
         self.mark_attendance_button.clicked.connect(self.mark_attendance)
         self.search_button.clicked.connect(self.search_attendance)
+        self.search_input.returnPressed.connect(self.search_attendance)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        self.date_range_input.currentIndexChanged.connect(self.date_range_changed)
+        self.date_from_input.dateTimeChanged.connect(self.date_range_changed)
+        self.date_to_input.dateTimeChanged.connect(self.date_range_changed)
         self.export_button.clicked.connect(self.export_to_csv)
         self.view_details_button.clicked.connect(self.view_details)
+        self.import_button.clicked.connect(self.import_from_csv)
         self.clear_records_button.clicked.connect(self.clear_records)
+        self.archive_button.clicked.connect(self.archive_old_records)
+        self.report_button.clicked.connect(self.show_monthly_report)
+
+        if instrumentation.ENABLED:
+            self.stats_shortcut = QShortcut(QKeySequence('Ctrl+Shift+S'), self)
+            self.stats_shortcut.activated.connect(self.show_stats)
 
-        self.update_attendance_table()
+        # Rows are read once create_table has finished.
         self.show()
 
     def create_table(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS attendance (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                timestamp TEXT NOT NULL
-            )
-        ''')
-        self.db_connection.commit()
+        def table_created(indexed):
+            self.search_indexed = indexed
+            self.attendance_model.refresh()
+
+        def archive_state_loaded(until):
+            self.archived_until = until
+
+        self.db_executor.submit(ATTENDANCE.create_table, on_result=table_created)
+        self.db_executor.submit(archived_until, ATTENDANCE.table, on_result=archive_state_loaded)
 
     def mark_attendance(self):
         name = self.name_input.text().strip()
         timestamp = self.timestamp_input.dateTime().toString('yyyy-MM-dd HH:mm:ss')
 
         if name:
-            cursor = self.db_connection.cursor()
-            cursor.execute('INSERT INTO attendance (name, timestamp) VALUES (?, ?)', (name, timestamp))
-            self.db_connection.commit()
+            def attendance_marked(row_id):
+                self.search_cache.clear()
+                self.attendance_model.refresh_row(row_id)
+                self.log_display.append(f'Marked attendance for {name} at {timestamp}')
 
-            self.update_attendance_table()
-            self.log_display.append(f'Marked attendance for {name} at {timestamp}')
+            self.write_queue.submit(ATTENDANCE.insert_sql, (name, timestamp), on_result=attendance_marked, operation='mark')
 
     def search_attendance(self):
+        self.search_timer.stop()
         search_name = self.search_input.text().strip()
+        self.search_term = search_name
+        self.apply_filters()
         if search_name:
-            cursor = self.db_connection.cursor()
-            cursor.execute('SELECT * FROM attendance WHERE name LIKE ?', (f'%{search_name}%',))
-            data = cursor.fetchall()
+            self.log_display.append(f'Searched attendance for {search_name}')
 
-            self.attendance_table.setRowCount(len(data))
-            for row_index, row_data in enumerate(data):
-                for col_index, col_data in enumerate(row_data):
-                    item = QTableWidgetItem(str(col_data))
-                    item.setFlags(Qt.ItemIsEnabled)
-                    self.attendance_table.setItem(row_index, col_index, item)
+    def date_range_changed(self):
+        custom = self.date_range_input.currentText() == CUSTOM_RANGE
+        self.date_from_input.setEnabled(custom)
+        self.date_to_input.setEnabled(custom)
 
-            self.log_display.append(f'Searched attendance for {search_name}')
+        # Cached searches were taken over the previous range.
+        self.search_cache.clear()
+        self.apply_filters()
 
-    def export_to_csv(self):
-        options = QFileDialog.Options()
-        options |= QFileDialog.DontUseNativeDialog
-        file_name, _ = QFileDialog.getSaveFileName(self, "Save Attendance Data", "", "CSV Files (*.csv);;All Files (*)", options=options)
+    def apply_filters(self):
+        clauses = []
+        params = []
+        order_by = 'id'
+        table = None
 
-        if file_name:
-            with open(file_name, 'w') as file:
-                cursor = self.db_connection.cursor()
-                cursor.execute('SELECT * FROM attendance')
-                data = cursor.fetchall()
+        date_range = date_range_filter(self, ATTENDANCE)
+        if date_range is not None:
+            where, bounds, table = date_range
+            clauses.append(where)
+            params.extend(bounds)
+            order_by = 'timestamp'
 
-                headers = ['ID', 'Name', 'Timestamp']
-                file.write(','.join(headers) + '\n')
+        show_filtered(self, self.attendance_model, ATTENDANCE, clauses, params, order_by, table)
 
-                for row_data in data:
-                    file.write(','.join(map(str, row_data)) + '\n')
+    def cache_search_results(self):
+        if self.search_term:
+            self.search_cache.put(self.search_term, self.attendance_model.rows)
 
-            self.log_display.append(f'Exported attendance data to {file_name}')
+    def export_to_csv(self):
+        export_records(self, ATTENDANCE, 'Attendance', 'attendance')
 
-    def view_details(self):
-        selected_row = self.attendance_table.currentRow()
-        if selected_row >= 0:
-            id_item = self.attendance_table.item(selected_row, 0)
-            name_item = self.attendance_table.item(selected_row, 1)
-            timestamp_item = self.attendance_table.item(selected_row, 2)
+    def import_from_csv(self):
+        def imported():
+            self.search_cache.clear()
+            self.update_attendance_table()
+
+        import_records(self, ATTENDANCE, 'Attendance', imported)
 
-            id_value = id_item.text()
-            name_value = name_item.text()
-            timestamp_value = timestamp_item.text()
+    def view_details(self):
+        selected_index = self.attendance_table.currentIndex()
+        if selected_index.isValid():
+            record = ATTENDANCE.record(self.attendance_model.record(selected_index.row()))
 
-            details = f'Details for ID {id_value}:\nName: {name_value}\nTimestamp: {timestamp_value}'
+            details = f'Details for ID {record.id}:\nName: {record.name}\nTimestamp: {record.timestamp}'
             self.log_display.append(details)
 
     def clear_records(self):
         confirmation = QMessageBox.question(self, 'Confirmation', 'Are you sure you want to clear all records? This action cannot be undone.', QMessageBox.Yes | QMessageBox.No)
         if confirmation == QMessageBox.Yes:
-            cursor = self.db_connection.cursor()
-            cursor.execute('DELETE FROM attendance')
-            self.db_connection.commit()
-
-            self.update_attendance_table()
-            self.log_display.append('All records cleared.')
+            def records_cleared(_):
+                self.search_cache.clear()
+                self.update_attendance_table()
+                self.log_display.append('All records cleared.' if self.archived_until is None else 'All records cleared. Archived months were kept.')
+
+            self.write_queue.flush()
+            self.db_executor.submit(clear_table, ATTENDANCE.table, reset_attendance_daily, on_result=records_cleared, operation='clear')
+
+    def archive_old_records(self):
+        prompt_and_archive(self, ATTENDANCE, 'attendance')
+
+    def show_monthly_report(self):
+        if self.report_dialog is None:
+            self.report_dialog = MonthlyReportDialog(self.bulk_executor, self)
+        # Pending punches count towards the report.
+        self.write_queue.flush()
+        self.report_dialog.load_report()
+        self.report_dialog.show()
+        self.report_dialog.raise_()
 
     def update_attendance_table(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute('SELECT * FROM attendance')
-        data = cursor.fetchall()
+        self.attendance_model.refresh()
+
+    def show_database_error(self, job, error):
+        self.log_display.append(f'Database error: {error}')
+
+    def show_stats(self):
+        self.log_display.append(instrumentation.stats.report())
+        if instrumentation.STATS_FILE:
+            instrumentation.stats.dump(instrumentation.STATS_FILE)
+            self.log_display.append(f'Performance stats written to {instrumentation.STATS_FILE}')
 
-        self.attendance_table.setRowCount(len(data))
-        for row_index, row_data in enumerate(data):
-            for col_index, col_data in enumerate(row_data):
-                item = QTableWidgetItem(str(col_data))
-                item.setFlags(Qt.ItemIsEnabled)
-                self.attendance_table.setItem(row_index, col_index, item)
+    def closeEvent(self, event):
+        shutdown_executors(self)
+        super().closeEvent(event)
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description='Professional Attendance System')
+    parser.add_argument('--import', dest='import_file', metavar='CSV', help='bulk-load attendance records from a CSV file (optionally .gz) and exit')
+    parser.add_argument('--startup-report', metavar='FILE', nargs='?', const='-', help='report import, first paint and first rows times as a JSON line to stderr, or append it to FILE')
+    args, qt_args = parser.parse_known_args()
+
+    startup_timer = StartupTimer('attendance', args.startup_report)
+    startup_timer.mark('imports_ms')
+
+    if args.import_file:
+        job = ConsoleJob(connect(ATTENDANCE.database))
+        ATTENDANCE.create_table(job)
+        result = ATTENDANCE.import_file(job, args.import_file)
+        print(file=sys.stderr)
+        print(import_summary(result))
+        sys.exit(0)
+
+    app = QApplication(sys.argv[:1] + qt_args)
     window = AttendanceSystem()
+    startup_timer.watch(window, window.attendance_model)
     sys.exit(app.exec_())
@@ -0,0 +1,68 @@
+# Compares sustained check-ins per second with one commit per row (the
+# default) against group commits of increasing batch size, for each
+# synchronous setting given.
+#
+#     python -m benchmarks.bench_group_commit --rows 5000 --batch-sizes 1 16 64 256 --synchronous NORMAL FULL
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bulk_import import ConsoleJob
+from database import DB_DIR_ENV, connect
+from db_worker import execute
+from storage import ATTENDANCE_INSERT, commit_batch, create_attendance_table
+
+
+def run(db_dir, synchronous, batch_size, rows):
+    os.environ[DB_DIR_ENV] = db_dir
+    database = f'group-commit-{synchronous.lower()}-{batch_size}.db'
+    connection = connect(database)
+    connection.execute(f'PRAGMA synchronous = {synchronous}')
+    job = ConsoleJob(connection)
+    create_attendance_table(job)
+
+    timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+    check_ins = [(ATTENDANCE_INSERT, (f'person {index}', timestamp)) for index in range(rows)]
+
+    started = time.perf_counter()
+    if batch_size <= 1:
+        for sql, params in check_ins:
+            execute(job, sql, params)
+    else:
+        for start in range(0, rows, batch_size):
+            commit_batch(job, check_ins[start:start + batch_size])
+    elapsed = time.perf_counter() - started
+
+    inserted = connection.execute('SELECT COUNT(*) FROM attendance').fetchone()[0]
+    connection.close()
+    return {
+        'synchronous': synchronous,
+        'batch_size': batch_size,
+        'rows': inserted,
+        'seconds': round(elapsed, 3),
+        'check_ins_per_second': round(inserted / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-row commits versus group commits for attendance check-ins')
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16, 64, 256], help='1 means one commit per row')
+    parser.add_argument('--synchronous', nargs='+', default=['NORMAL', 'FULL'])
+    parser.add_argument('--db-dir', help='directory for the benchmark databases (default: a fresh temporary directory)')
+    args = parser.parse_args()
+
+    db_dir = args.db_dir or tempfile.mkdtemp(prefix='group-commit-')
+    results = [run(db_dir, synchronous, batch_size, args.rows) for synchronous in args.synchronous for batch_size in args.batch_sizes]
+    for result in results:
+        baseline = next(other for other in results if other['synchronous'] == result['synchronous'])
+        result['speedup'] = round(result['check_ins_per_second'] / baseline['check_ins_per_second'], 2)
+    print(json.dumps({'db_dir': db_dir, 'results': results}, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
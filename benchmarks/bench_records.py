@@ -0,0 +1,134 @@
+# Compares ways of holding and displaying rows at table scale: what each
+# row representation costs to fetch (CPU) and to keep (bytes per row), how
+# eager per-cell formatting compares with formatting only what is painted,
+# and what the per-connection statement cache saves on repeated lookups.
+#
+#     python -m benchmarks.bench_records --rows 1000000
+import argparse
+import gc
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+
+from benchmarks.synthetic_data import DATABASES, generate
+
+SELECT_SQL = 'SELECT id, name, timestamp FROM attendance ORDER BY id'
+VISIBLE_ROWS = 40
+REPAINTS = 1000
+LOOKUPS = 100000
+
+AttendanceRecord = namedtuple('AttendanceRecord', ['id', 'name', 'timestamp'])
+
+
+class SlotsRecord:
+    __slots__ = ('id', 'name', 'timestamp')
+
+    def __init__(self, id, name, timestamp):
+        self.id = id
+        self.name = name
+        self.timestamp = timestamp
+
+
+REPRESENTATIONS = {
+    'tuple': None,
+    'sqlite3.Row': sqlite3.Row,
+    'namedtuple': lambda cursor, row: AttendanceRecord._make(row),
+    '__slots__': lambda cursor, row: SlotsRecord(*row),
+    'dict': lambda cursor, row: {'id': row[0], 'name': row[1], 'timestamp': row[2]},
+    'str cells': lambda cursor, row: [str(value) for value in row],
+}
+
+
+def fetch(path, row_factory):
+    connection = sqlite3.connect(path)
+    connection.row_factory = row_factory
+    rows = connection.execute(SELECT_SQL).fetchall()
+    connection.close()
+    return rows
+
+
+def measure_representations(path, rows):
+    results = []
+    for name, row_factory in REPRESENTATIONS.items():
+        gc.collect()
+        started = time.perf_counter()
+        fetched = fetch(path, row_factory)
+        seconds = time.perf_counter() - started
+        del fetched
+
+        # Measured separately: tracemalloc slows the fetch itself down.
+        gc.collect()
+        tracemalloc.start()
+        fetched = fetch(path, row_factory)
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del fetched
+        results.append((name, seconds, retained / rows))
+    return results
+
+
+def measure_formatting(path, rows):
+    # Eager: every cell of every row turned into a string up front, as the
+    # old row-to-cell loops did. Lazy: str() for the visible cells only, on
+    # each of REPAINTS repaints.
+    fetched = fetch(path, None)
+    started = time.perf_counter()
+    cells = [[str(value) for value in row] for row in fetched]
+    eager = time.perf_counter() - started
+    del cells
+
+    started = time.perf_counter()
+    for repaint in range(REPAINTS):
+        first = repaint * VISIBLE_ROWS % max(1, rows - VISIBLE_ROWS)
+        for row in fetched[first:first + VISIBLE_ROWS]:
+            for value in row:
+                str(value)
+    lazy = time.perf_counter() - started
+    return eager, lazy
+
+
+def measure_statement_cache(path, rows):
+    results = []
+    for cached_statements in (0, 128):
+        connection = sqlite3.connect(path, cached_statements=cached_statements)
+        started = time.perf_counter()
+        for lookup in range(LOOKUPS):
+            connection.execute('SELECT id, name, timestamp FROM attendance WHERE id = ?', (lookup * 7919 % rows + 1,)).fetchone()
+        results.append((cached_statements, time.perf_counter() - started))
+        connection.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Row representation, formatting and statement cache micro-benchmarks')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'visitor-apps-bench-records'), help='where the generated attendance.db is cached')
+    args = parser.parse_args()
+
+    path = os.path.join(args.data_dir, f'attendance-{args.rows}.db')
+    if not os.path.exists(path):
+        os.makedirs(args.data_dir, exist_ok=True)
+        _, table, fields, create_table, make_rows, after_load = DATABASES[0]
+        generate(path, table, fields, create_table, make_rows, after_load, args.rows, 1)
+
+    print(f'{args.rows} rows, Python {sys.version.split()[0]}, SQLite {sqlite3.sqlite_version}')
+    print(f'\n{"representation":<16}{"fetch s":>10}{"bytes/row":>12}')
+    for name, seconds, per_row in measure_representations(path, args.rows):
+        print(f'{name:<16}{seconds:>10.3f}{per_row:>12.0f}')
+
+    eager, lazy = measure_formatting(path, args.rows)
+    print(f'\nformat every cell up front: {eager:.3f} s')
+    print(f'format visible cells, {REPAINTS} repaints of {VISIBLE_ROWS} rows: {lazy:.3f} s')
+
+    print(f'\n{LOOKUPS} lookups by id')
+    for cached_statements, seconds in measure_statement_cache(path, args.rows):
+        print(f'cached_statements={cached_statements:<5}{seconds:>8.3f} s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+# Load generator for checkin_service.py. Opens --clients keep-alive
+# connections to a service on localhost and has each send --requests
+# requests, mostly check-ins with a share of searches, then reports
+# throughput and latency. With --start it launches its own service on a
+# fresh temporary database directory first.
+#
+#     python -m benchmarks.load_checkin_service --start --clients 2000 --requests 20
+#
+# Thousands of clients need a matching open file limit (ulimit -n).
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from database import DB_DIR_ENV
+
+SERVICE_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'checkin_service.py')
+
+
+def make_request(client_id, index, search_ratio):
+    if random.random() < search_ratio:
+        path = random.choice(['/attendance', '/visits', '/customers'])
+        return 'GET', f'{path}?q=desk+{client_id % 10}&limit=20', None
+    kind = index % 3
+    if kind == 0:
+        return 'POST', '/attendance', {'name': f'desk {client_id % 10} person {client_id}'}
+    if kind == 1:
+        return 'POST', '/visits', {'name': f'desk {client_id % 10} visitor {client_id}', 'mobile': f'555{client_id:07d}', 'reason': 'Meeting'}
+    return 'POST', '/customers', {'name': f'desk {client_id % 10} customer {client_id}', 'contact': f'555{client_id:07d}', 'item': f'item {index % 25}', 'amount': '12.50'}
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+
+async def run_client(host, port, client_id, requests, search_ratio, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for index in range(requests):
+            method, path, body = make_request(client_id, index, search_ratio)
+            data = json.dumps(body).encode('utf-8') if body is not None else b''
+            head = f'{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n'
+            started = time.perf_counter()
+            writer.write(head.encode('latin-1') + data)
+            await writer.drain()
+            status = await read_response(reader)
+            latencies.setdefault(method, []).append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run_load(args):
+    latencies = {}
+    statuses = {}
+    errors = []
+    clients = [run_client(args.host, args.port, client_id, args.requests, args.search_ratio, latencies, statuses) for client_id in range(args.clients)]
+    started = time.perf_counter()
+    for result in await asyncio.gather(*clients, return_exceptions=True):
+        if isinstance(result, Exception):
+            errors.append(repr(result))
+    return time.perf_counter() - started, latencies, statuses, errors
+
+
+async def wait_for_service(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent client load generator for the check-in service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=20, help='requests sent by each client over its keep-alive connection')
+    parser.add_argument('--search-ratio', type=float, default=0.1, help='share of requests that are searches')
+    parser.add_argument('--start', action='store_true', help='start a service on a temporary database directory for the run')
+    parser.add_argument('--batch-size', type=int, help='passed to the started service')
+    args = parser.parse_args()
+
+    service = None
+    db_dir = None
+    if args.start:
+        db_dir = tempfile.mkdtemp(prefix='checkin-load-')
+        command = [sys.executable, SERVICE_SCRIPT, '--host', args.host, '--port', str(args.port)]
+        if args.batch_size:
+            command += ['--batch-size', str(args.batch_size)]
+        service = subprocess.Popen(command, env={**os.environ, DB_DIR_ENV: db_dir})
+
+    try:
+        asyncio.run(wait_for_service(args.host, args.port))
+        elapsed, latencies, statuses, errors = asyncio.run(run_load(args))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+    completed = sum(statuses.values())
+    summary = {
+        'db_dir': db_dir,
+        'clients': args.clients,
+        'requests': completed,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(completed / elapsed, 1),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'errors': len(errors),
+        'first_errors': errors[:5],
+    }
+    for method, values in sorted(latencies.items()):
+        values.sort()
+        summary[f'{method.lower()}_latency_ms_p50'] = round(statistics.median(values) * 1000, 3)
+        summary[f'{method.lower()}_latency_ms_p99'] = round(percentile(values, 0.99) * 1000, 3)
+    print(json.dumps(summary, indent=2))
+    ok = not errors and all(200 <= status < 300 for status in statuses)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
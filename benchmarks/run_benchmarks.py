@@ -0,0 +1,283 @@
+# Drives the three desktop apps headlessly (QT_QPA_PLATFORM=offscreen) over
+# synthetic databases and times what a desk actually waits for: startup to
+# first rows, inserts, refresh, search, export, totals and the chart. Each
+# app and size runs in its own process so peak RSS can be attributed to it.
+#
+#     python -m benchmarks.run_benchmarks --sizes 10k 1m --output after.json
+#     python -m benchmarks.run_benchmarks --compare before.json after.json
+#
+# Generated databases are cached under --data-dir and copied for every run,
+# so runs never see each other's writes.
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from benchmarks.synthetic_data import DATABASES, SIZES, generate_all
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INSERT_COUNT = 100
+SEARCH_TERMS = {'search_common': 'Khan', 'search_rare': 'Benchmark'}
+NOISE_FLOOR_SECONDS = 0.005
+
+
+def load_app(script):
+    spec = importlib.util.spec_from_file_location(os.path.splitext(script)[0].replace('-', '_'), os.path.join(REPO_DIR, script))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def idle(job):
+    return True
+
+
+def mark_attendance(window, index):
+    window.name_input.setText(f'Benchmark Person {index}')
+    window.mark_attendance()
+
+
+def mark_visit(window, index):
+    window.name_input.setText(f'Benchmark Visitor {index}')
+    window.mobile_input.setText(f'0300{index:07d}')
+    window.reason_input.setText('Benchmark')
+    window.mark_visit()
+
+
+def add_customer(window, index):
+    window.name_input.setText(f'Benchmark Customer {index}')
+    window.contact_input.setText(f'0300{index:07d}')
+    window.item_input.setText('Benchmark Item')
+    window.amount_input.setText(f'{index % 500}.99')
+    window.add_customer()
+
+
+APPS = {
+    'attendance': ('attendence.py', 'AttendanceSystem', 'attendance_model', mark_attendance, 'search_attendance', 'update_attendance_table'),
+    'visitors': ('visitor-attendence.py', 'VisitorTrackingSystem', 'visitors_model', mark_visit, 'search_visitors', 'update_visitors_table'),
+    'customers': ('customer_tracker.py', 'CustomerManagementSystem', 'customers_model', add_customer, 'search_customers', 'update_customers_table'),
+}
+
+
+def peak_rss_kib():
+    # On Linux ru_maxrss survives exec, so a worker would report the runner's
+    # own peak from generating data; VmHWM covers this process alone.
+    try:
+        with open('/proc/self/status', encoding='ascii') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB everywhere else.
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_worker(app_name, work_dir):
+    os.environ['QT_QPA_PLATFORM'] = 'offscreen'
+    os.environ['VISITOR_APPS_DB_DIR'] = work_dir
+    os.chdir(work_dir)
+
+    from PyQt5.QtCore import Qt, QEventLoop
+    from PyQt5.QtWidgets import QApplication, QFileDialog
+
+    script, class_name, model_name, mark, search_name, refresh_name = APPS[app_name]
+    app = QApplication([])
+    module = load_app(script)
+    export_name = os.path.join(work_dir, 'export.csv')
+    QFileDialog.getSaveFileName = lambda *args, **kwargs: (export_name, '')
+
+    operations = {}
+
+    def wait_until(condition):
+        while not condition():
+            app.processEvents(QEventLoop.AllEvents, 50)
+
+    def wait_idle(window):
+        # Each executor runs jobs in order, so once this no-op finishes every
+        # job submitted before it has finished and delivered its result.
+        # Writes and long jobs go first: their results can submit reads
+        # (refresh_row, or the refresh after an import).
+        for executor in [window.db_executor, window.bulk_executor, window.report_executor]:
+            done = []
+            executor.submit(idle, on_result=done.append)
+            wait_until(lambda: done)
+            app.processEvents()
+
+    @contextmanager
+    def timed(name, count=1):
+        started = time.perf_counter()
+        yield
+        operations[name] = {'seconds': round(time.perf_counter() - started, 6), 'count': count}
+
+    with timed('startup'):
+        window = getattr(module, class_name)()
+        model = getattr(window, model_name)
+        wait_until(lambda: model.rows or not model.has_more)
+        wait_idle(window)
+
+    with timed('insert', INSERT_COUNT):
+        for index in range(INSERT_COUNT):
+            mark(window, index)
+        window.write_queue.flush()
+        wait_idle(window)
+
+    with timed('refresh'):
+        getattr(window, refresh_name)()
+        wait_idle(window)
+
+    for operation, term in SEARCH_TERMS.items():
+        window.search_input.setText(term)
+        window.search_timer.stop()
+        with timed(operation):
+            getattr(window, search_name)()
+            wait_idle(window)
+    window.search_input.setText('')
+    getattr(window, search_name)()
+    wait_idle(window)
+
+    # A header click on the last column (timestamp, reason or amount),
+    # newest or largest first; then back to the default order.
+    with timed('sort'):
+        model.sort(model.columnCount() - 1, Qt.DescendingOrder)
+        wait_idle(window)
+    model.sort(-1)
+    wait_idle(window)
+
+    with timed('export'):
+        window.export_to_csv()
+        wait_idle(window)
+
+    if app_name == 'customers':
+        with timed('total'):
+            window.calculate_total_amount()
+            wait_idle(window)
+        with timed('chart'):
+            window.view_chart_button.setChecked(True)
+            wait_idle(window)
+            if window.chart_canvas is not None:
+                window.chart_canvas.draw()
+        with timed('chart_unchanged'):
+            window.refresh_chart()
+            wait_idle(window)
+
+    window.close()
+    return {'app': app_name, 'operations': operations, 'peak_rss_kib': peak_rss_kib()}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes, apps, data_dir):
+    results = []
+    memory = []
+    for size in sizes:
+        rows = SIZES[size]
+        size_dir = os.path.join(data_dir, size)
+        if not all(os.path.exists(os.path.join(size_dir, name)) for name, *_ in DATABASES):
+            generate_all(size_dir, rows)
+
+        for app_name in apps:
+            work_dir = tempfile.mkdtemp(prefix=f'bench-{app_name}-{size}-')
+            for name, *_ in DATABASES:
+                shutil.copy(os.path.join(size_dir, name), work_dir)
+            print(f'{app_name} {size}...', file=sys.stderr)
+            completed = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.run_benchmarks', '--worker', app_name, '--work-dir', work_dir],
+                cwd=REPO_DIR, capture_output=True, text=True
+            )
+            shutil.rmtree(work_dir, ignore_errors=True)
+            if completed.returncode != 0:
+                print(completed.stderr, file=sys.stderr)
+                raise SystemExit(f'benchmark worker for {app_name} {size} failed')
+
+            report = json.loads(completed.stdout.splitlines()[-1])
+            for operation, timing in report['operations'].items():
+                results.append({'app': app_name, 'size': size, 'rows': rows, 'operation': operation, **timing})
+            memory.append({'app': app_name, 'size': size, 'rows': rows, 'peak_rss_kib': report['peak_rss_kib']})
+
+    return {
+        'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'results': results,
+        'memory': memory,
+    }
+
+
+def compare(before_name, after_name, threshold):
+    # Prints every shared measurement with its ratio and returns how many got
+    # slower (or bigger) by more than threshold; timings under the noise
+    # floor are never counted as regressions.
+    with open(before_name, encoding='utf-8') as file:
+        before = json.load(file)
+    with open(after_name, encoding='utf-8') as file:
+        after = json.load(file)
+
+    def keyed(report):
+        measurements = {(row['app'], row['size'], row['operation']): row['seconds'] for row in report['results']}
+        measurements.update({(row['app'], row['size'], 'peak_rss_kib'): row['peak_rss_kib'] for row in report['memory'] if row['peak_rss_kib']})
+        return measurements
+
+    old = keyed(before)
+    new = keyed(after)
+    regressions = 0
+    print(f'{"app":<11}{"size":<6}{"operation":<17}{"before":>12}{"after":>12}{"ratio":>8}')
+    for key in sorted(old.keys() & new.keys()):
+        ratio = new[key] / old[key] if old[key] else float('inf')
+        noisy = key[2] != 'peak_rss_kib' and abs(new[key] - old[key]) < NOISE_FLOOR_SECONDS
+        regressed = ratio > 1 + threshold and not noisy
+        regressions += regressed
+        print(f'{key[0]:<11}{key[1]:<6}{key[2]:<17}{old[key]:>12.4f}{new[key]:>12.4f}{ratio:>8.2f}{"  REGRESSION" if regressed else ""}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless benchmarks for the attendance, visitor and customer apps')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['10k'])
+    parser.add_argument('--apps', nargs='+', choices=list(APPS), default=list(APPS))
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'visitor-apps-bench-data'), help='where generated databases are cached')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two result files instead of running')
+    parser.add_argument('--threshold', type=float, default=0.2, help='slowdown ratio above which --compare reports a regression')
+    parser.add_argument('--worker', choices=list(APPS), help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.work_dir)))
+        return 0
+
+    if args.compare:
+        return 1 if compare(*args.compare, args.threshold) else 0
+
+    report = json.dumps(run_suite(args.sizes, args.apps, args.data_dir), indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(report + '\n')
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
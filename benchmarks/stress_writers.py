@@ -0,0 +1,111 @@
+# Runs several writer processes (one per simulated reception desk) and
+# reader processes against a single attendance.db and checks that no write
+# fails with "database is locked" and that every row arrives.
+#
+#     python -m benchmarks.stress_writers --writers 8 --rows 2000 --readers 2
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from bulk_import import ConsoleJob
+from database import DB_DIR_ENV, connect
+from storage import create_attendance_table
+
+
+def run_writer(db_dir, writer_id, rows, results):
+    os.environ[DB_DIR_ENV] = db_dir
+    connection = connect('attendance.db')
+    latencies = []
+    errors = []
+    for index in range(rows):
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+        started = time.perf_counter()
+        try:
+            connection.execute('INSERT INTO attendance (name, timestamp) VALUES (?, ?)', (f'desk {writer_id} person {index}', timestamp))
+            connection.commit()
+        except sqlite3.OperationalError as error:
+            connection.rollback()
+            errors.append(str(error))
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+    results.put({'writer': writer_id, 'latencies': latencies, 'errors': errors})
+
+
+def run_reader(db_dir, stop, results):
+    os.environ[DB_DIR_ENV] = db_dir
+    connection = connect('attendance.db')
+    queries = 0
+    errors = []
+    last_id = 0
+    while not stop.is_set():
+        try:
+            rows = connection.execute('SELECT id, name, timestamp FROM attendance WHERE id > ? ORDER BY id LIMIT 500', (last_id,)).fetchall()
+            last_id = rows[-1][0] if rows else 0
+            connection.execute("SELECT COUNT(*) FROM attendance_fts WHERE attendance_fts MATCH '\"person 1\"'").fetchone()
+        except sqlite3.OperationalError as error:
+            errors.append(str(error))
+        queries += 1
+    connection.close()
+    results.put({'reader_queries': queries, 'errors': errors})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent writer stress test for the shared SQLite connection layer')
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=1000, help='rows inserted by each writer, one commit per row')
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--db-dir', help='directory for attendance.db (default: a fresh temporary directory)')
+    args = parser.parse_args()
+
+    db_dir = args.db_dir or tempfile.mkdtemp(prefix='stress-writers-')
+    os.environ[DB_DIR_ENV] = db_dir
+    setup = connect('attendance.db')
+    create_attendance_table(ConsoleJob(setup))
+    before = setup.execute('SELECT COUNT(*) FROM attendance').fetchone()[0]
+
+    results = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    readers = [multiprocessing.Process(target=run_reader, args=(db_dir, stop, results)) for _ in range(args.readers)]
+    writers = [multiprocessing.Process(target=run_writer, args=(db_dir, writer_id, args.rows, results)) for writer_id in range(args.writers)]
+
+    started = time.perf_counter()
+    for process in readers + writers:
+        process.start()
+    reports = [results.get() for _ in writers]
+    elapsed = time.perf_counter() - started
+    stop.set()
+    reports += [results.get() for _ in readers]
+    for process in readers + writers:
+        process.join()
+
+    latencies = sorted(latency for report in reports for latency in report.get('latencies', []))
+    errors = [error for report in reports for error in report['errors']]
+    inserted = setup.execute('SELECT COUNT(*) FROM attendance').fetchone()[0] - before
+    expected = args.writers * args.rows
+    summary = {
+        'db_dir': db_dir,
+        'writers': args.writers,
+        'readers': args.readers,
+        'rows_expected': expected,
+        'rows_inserted': inserted,
+        'seconds': round(elapsed, 3),
+        'commits_per_second': round(inserted / elapsed, 1),
+        'commit_latency_ms_p50': round(statistics.median(latencies) * 1000, 3),
+        'commit_latency_ms_p99': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3),
+        'commit_latency_ms_max': round(latencies[-1] * 1000, 3),
+        'reader_queries': sum(report.get('reader_queries', 0) for report in reports),
+        'errors': len(errors),
+        'first_errors': errors[:5],
+    }
+    print(json.dumps(summary, indent=2))
+    return 0 if not errors and inserted == expected else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
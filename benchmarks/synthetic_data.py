@@ -0,0 +1,127 @@
+# Generates attendance.db, visitors.db and customers.db filled with
+# synthetic rows through the apps' own schema code, so search indexes,
+# summary tables and triggers are all in place.
+#
+#     python -m benchmarks.synthetic_data --size 1m --out /tmp/bench-data/1m
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bulk_import import ConsoleJob
+from database import connect
+from date_range import TIMESTAMP_FORMAT
+from storage import (
+    add_imported_customers, create_attendance_table, create_customers_table, create_visitors_table, index_attendance_rows,
+    index_visitor_rows
+)
+
+SIZES = {'10k': 10000, '1m': 1000000, '10m': 10000000}
+GENERATE_BATCH_SIZE = 100000
+
+FIRST_NAMES = ['Aisha', 'Omar', 'Sara', 'Bilal', 'Fatima', 'Hamza', 'Zara', 'Imran', 'Nadia', 'Yusuf', 'Maria', 'Ali', 'Hina', 'Usman', 'Sana', 'Tariq', 'Amina', 'Faisal', 'Rabia', 'Kamran']
+LAST_NAMES = ['Khan', 'Ahmed', 'Malik', 'Hussain', 'Sheikh', 'Qureshi', 'Butt', 'Chaudhry', 'Raza', 'Siddiqui', 'Iqbal', 'Mirza', 'Javed', 'Aslam', 'Rehman', 'Nawaz', 'Anwar', 'Baig', 'Farooq', 'Haider']
+REASONS = ['Meeting', 'Interview', 'Delivery', 'Maintenance', 'Audit', 'Training', 'Consultation', 'Pickup', 'Inspection', 'Personal']
+ITEMS = [f'{kind} {size}' for kind in ['Shirt', 'Shoes', 'Bag', 'Watch', 'Phone', 'Laptop', 'Book', 'Lamp', 'Chair', 'Desk'] for size in ['S', 'M', 'L', 'XL', 'Pro']]
+
+
+def people(count, rng):
+    # Distinct names with a numeric suffix, so the pool is as large as asked
+    # and every name is still realistic enough to search for.
+    return [f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {index}' for index in range(count)]
+
+
+def timestamps(rows, rng, days=365):
+    # Ascending timestamps over the last `days` days, like real check-ins.
+    start = datetime.now() - timedelta(days=days)
+    step = days * 86400 / max(rows, 1)
+    for index in range(rows):
+        yield (start + timedelta(seconds=index * step + rng.random() * step)).strftime(TIMESTAMP_FORMAT)
+
+
+def attendance_rows(rows, rng):
+    names = people(max(100, rows // 50), rng)
+    for timestamp in timestamps(rows, rng):
+        yield rng.choice(names), timestamp
+
+
+def visitor_rows(rows, rng):
+    names = people(max(100, rows // 5), rng)
+    mobiles = {name: f'03{rng.randrange(10 ** 9):09d}' for name in names}
+    for timestamp in timestamps(rows, rng):
+        name = rng.choice(names)
+        yield name, mobiles[name], timestamp, rng.choice(REASONS)
+
+
+def customer_rows(rows, rng):
+    names = people(max(100, rows // 20), rng)
+    contacts = {name: f'03{rng.randrange(10 ** 9):09d}' for name in names}
+    for _ in range(rows):
+        name = rng.choice(names)
+        yield name, contacts[name], rng.choice(ITEMS), rng.randrange(100, 50000)
+
+
+DATABASES = [
+    ('attendance.db', 'attendance', ['name', 'timestamp'], create_attendance_table, attendance_rows, index_attendance_rows),
+    ('visitors.db', 'visitors', ['name', 'mobile', 'timestamp', 'reason'], create_visitors_table, visitor_rows, index_visitor_rows),
+    ('customers.db', 'customers', ['name', 'contact', 'item', 'amount_cents'], create_customers_table, customer_rows, add_imported_customers),
+]
+
+
+def generate(path, table, fields, create_table, make_rows, after_load, rows, seed):
+    # Loads like a bulk import into an empty table: triggers and secondary
+    # indexes are dropped, rows go in with executemany and the search index
+    # and summary tables are then filled in one pass before they come back.
+    for stale in [path, path + '-wal', path + '-shm']:
+        if os.path.exists(stale):
+            os.remove(stale)
+    connection = connect(path)
+    create_table(ConsoleJob(connection))
+
+    cursor = connection.cursor()
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('trigger', 'index') AND sql IS NOT NULL", (table,))
+    schema = cursor.fetchall()
+    cursor.execute('BEGIN IMMEDIATE')
+    for name, sql in schema:
+        cursor.execute(f'DROP {"TRIGGER" if sql.upper().startswith("CREATE TRIGGER") else "INDEX"} {name}')
+
+    insert_sql = f'INSERT INTO {table} ({", ".join(fields)}) VALUES ({", ".join("?" for _ in fields)})'
+    generated = make_rows(rows, random.Random(seed))
+    while True:
+        batch = [row for _, row in zip(range(GENERATE_BATCH_SIZE), generated)]
+        if not batch:
+            break
+        cursor.executemany(insert_sql, batch)
+
+    after_load(connection, 0)
+    for _, sql in schema:
+        cursor.execute(sql)
+    connection.commit()
+    connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    connection.close()
+
+
+def generate_all(out_dir, rows, seed=1):
+    os.makedirs(out_dir, exist_ok=True)
+    for name, table, fields, create_table, make_rows, after_load in DATABASES:
+        started = time.perf_counter()
+        generate(os.path.join(out_dir, name), table, fields, create_table, make_rows, after_load, rows, seed)
+        print(f'{name}: {rows} rows in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic attendance, visitors and customers databases')
+    parser.add_argument('--size', choices=list(SIZES), default='10k')
+    parser.add_argument('--rows', type=int, help='exact row count, overriding --size')
+    parser.add_argument('--out', required=True, help='directory to write the three databases to')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    generate_all(args.out, args.rows or SIZES[args.size], args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
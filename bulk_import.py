@@ -0,0 +1,155 @@
+import csv
+import gzip
+import io
+import os
+import sys
+import time
+from collections import namedtuple
+
+IMPORT_BATCH_SIZE = 50000
+
+ImportResult = namedtuple('ImportResult', ['imported', 'rejected', 'seconds', 'rejects_name'])
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+class ConsoleJob:
+    # Stands in for a DatabaseJob when an import runs from the command line.
+    def __init__(self, connection):
+        self.connection = connection
+
+    def is_cancelled(self):
+        return False
+
+    def report_progress(self, value):
+        print(f'\r{value}%', end='', file=sys.stderr, flush=True)
+
+
+def open_import_file(file_name):
+    raw = open(file_name, 'rb')
+    stream = gzip.GzipFile(fileobj=raw) if file_name.endswith('.gz') else raw
+    return raw, io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def import_csv(job, table, fields, parse_row, file_name, after_batch=None, batch_size=IMPORT_BATCH_SIZE):
+    # Streams a CSV file into table in batched transactions of batch_size
+    # rows. The file may have a header naming the fields in any order (extra
+    # columns such as an exported ID are ignored) or be positional, with or
+    # without a leading ID column. parse_row turns the raw field strings into
+    # the values to insert or raises ValueError; rejected lines are written
+    # with the reason to <file>.rejects.csv.
+    #
+    # Triggers on table are dropped for the duration of each batch and
+    # recreated in the same transaction; after_batch(connection, after_id)
+    # applies their effect to the batch's rows in bulk. When the table starts
+    # empty its secondary indexes are also dropped and rebuilt once at the end.
+    connection = job.connection
+    cursor = connection.cursor()
+    placeholders = ', '.join('?' for _ in fields)
+    insert_sql = f'INSERT INTO {table} ({", ".join(fields)}) VALUES ({placeholders})'
+
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,))
+    triggers = cursor.fetchall()
+
+    indexes = []
+    cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {table})')
+    if not cursor.fetchone()[0]:
+        cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,))
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {name}')
+        connection.commit()
+
+    rejects_name = file_name + '.rejects.csv'
+    rejects_file = None
+    rejects_writer = None
+    imported = 0
+    rejected = 0
+    started = time.perf_counter()
+
+    def load(batch):
+        # IMMEDIATE takes the write lock up front; a deferred transaction that
+        # reads first can fail with SQLITE_BUSY when another desk commits.
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}')
+        after_id = cursor.fetchone()[0]
+        for name, _ in triggers:
+            cursor.execute(f'DROP TRIGGER {name}')
+        cursor.executemany(insert_sql, batch)
+        if after_batch is not None:
+            after_batch(connection, after_id)
+        for _, sql in triggers:
+            cursor.execute(sql)
+        connection.commit()
+
+    size = os.path.getsize(file_name)
+    raw, file = open_import_file(file_name)
+    try:
+        reader = csv.reader(file)
+        positions = None
+        batch = []
+        for line_number, values in enumerate(reader, 1):
+            if line_number == 1:
+                header = [value.strip().lower() for value in values]
+                if all(field_label(field) in header for field in fields):
+                    positions = [header.index(field_label(field)) for field in fields]
+                    continue
+            try:
+                if positions is not None:
+                    raw_values = [values[position] for position in positions]
+                elif len(values) == len(fields) + 1:
+                    raw_values = values[1:]
+                elif len(values) == len(fields):
+                    raw_values = values
+                else:
+                    raise ValueError(f'expected {len(fields)} fields, got {len(values)}')
+                batch.append(parse_row(*raw_values))
+            # ArithmeticError covers number parsing, such as decimal's
+            # InvalidOperation, so one odd value rejects a line, not the file.
+            except (ValueError, IndexError, ArithmeticError) as error:
+                if rejects_writer is None:
+                    rejects_file = open(rejects_name, 'w', encoding='utf-8', newline='')
+                    rejects_writer = csv.writer(rejects_file)
+                    rejects_writer.writerow(['line', 'error', 'values'])
+                rejects_writer.writerow([line_number, str(error), *values])
+                rejected += 1
+                continue
+
+            if len(batch) >= batch_size:
+                if job.is_cancelled():
+                    raise ImportCancelled(file_name)
+                load(batch)
+                imported += len(batch)
+                batch = []
+                job.report_progress(min(100, raw.tell() * 100 // size) if size else 100)
+        if batch:
+            load(batch)
+            imported += len(batch)
+    finally:
+        if connection.in_transaction:
+            connection.rollback()
+        file.close()
+        raw.close()
+        if rejects_file is not None:
+            rejects_file.close()
+        for _, sql in indexes:
+            cursor.execute(sql)
+        connection.commit()
+
+    job.report_progress(100)
+    return ImportResult(imported, rejected, time.perf_counter() - started, rejects_name if rejected else None)
+
+
+def field_label(field):
+    # Header labels match the export headers: amount_cents is 'Amount'.
+    return field.removesuffix('_cents')
+
+
+def import_summary(result):
+    rate = result.imported / result.seconds if result.seconds else result.imported
+    summary = f'Imported {result.imported} rows in {result.seconds:.1f}s ({rate:,.0f} rows/s)'
+    if result.rejected:
+        summary += f'; {result.rejected} rejected rows written to {result.rejects_name}'
+    return summary
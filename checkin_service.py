@@ -0,0 +1,330 @@
+import sys
+import argparse
+import asyncio
+import json
+import signal
+import sqlite3
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import instrumentation
+from bulk_import import ConsoleJob
+from database import thread_connection
+from date_range import TIMESTAMP_FORMAT
+from repository import ATTENDANCE, VISITORS, CUSTOMERS
+from storage import commit_batch, format_amount, parse_attendance_row, parse_visitor_row, parse_customer_row
+
+# Headless HTTP/JSON front end for turnstiles and tablets, sharing the
+# desktop apps' databases, schema and insert statements:
+#
+#     POST /attendance  {"name": ..., "timestamp": optional}
+#     POST /visits      {"name": ..., "mobile": ..., "reason": ..., "timestamp": optional}
+#     POST /customers   {"name": ..., "contact": ..., "item": ..., "amount": "12.50"}
+#     GET  /attendance?q=term&limit=50   (likewise /visits and /customers)
+#     GET  /customers/totals
+#     GET  /stats        (latency histograms, with VISITOR_APPS_INSTRUMENT set)
+#
+# Inserts from concurrent requests are grouped into one transaction per
+# database; a request is answered only after its row has been committed.
+SERVICE_BATCH_SIZE = 512
+SERVICE_BATCH_DELAY_MS = 2
+SERVICE_READERS = 4
+SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 1000
+MAX_BODY_SIZE = 64 * 1024
+
+
+def now():
+    return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+
+def attendance_values(body):
+    return parse_attendance_row(body['name'], body.get('timestamp') or now())
+
+
+def visit_values(body):
+    return parse_visitor_row(body['name'], body['mobile'], body.get('timestamp') or now(), body['reason'])
+
+
+def customer_values(body):
+    return parse_customer_row(body['name'], body['contact'], body['item'], str(body['amount']))
+
+
+def customer_totals(job):
+    cursor = job.connection.cursor()
+    cursor.execute('SELECT total_cents, purchase_count FROM customer_totals WHERE id = 1')
+    total_cents, purchase_count = cursor.fetchone()
+    return {'total': format_amount(total_cents), 'purchases': purchase_count}
+
+
+class Store:
+    # One writer thread per database, so commits never contend with each
+    # other inside the process, plus a small pool of reader threads. Each
+    # thread keeps its own connection (see database.thread_connection).
+    def __init__(self, database, readers=SERVICE_READERS):
+        self.database = database
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix=f'{database}-writer')
+        self.readers = ThreadPoolExecutor(readers, thread_name_prefix=f'{database}-reader')
+
+    def run(self, fn, args):
+        connection = thread_connection(self.database)
+        try:
+            return fn(ConsoleJob(connection), *args)
+        except Exception:
+            if connection.in_transaction:
+                connection.rollback()
+            raise
+
+    def write(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.writer, self.run, fn, args)
+
+    def read(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.readers, self.run, fn, args)
+
+    def close(self):
+        self.writer.shutdown()
+        self.readers.shutdown()
+
+
+class WriteBatcher:
+    # Collects inserts from concurrent requests and commits up to max_batch
+    # of them together with commit_batch. Whatever queues up while a batch is
+    # committing goes into the next one; max_delay_ms bounds how long the
+    # first insert of a batch waits for company.
+    def __init__(self, store, max_batch=SERVICE_BATCH_SIZE, max_delay_ms=SERVICE_BATCH_DELAY_MS):
+        self.store = store
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.queue = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def submit(self, sql, params):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((sql, params, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                results = await self.store.write(commit_batch, [(sql, params) for sql, params, _ in batch])
+            except Exception as error:
+                results = [error] * len(batch)
+            for (_, _, future), result in zip(batch, results):
+                if future.done():
+                    pass
+                elif isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+                self.queue.task_done()
+
+    async def close(self):
+        await self.queue.join()
+        self.task.cancel()
+
+
+class Endpoint:
+    # fields names the JSON keys for the repository's columns.
+    def __init__(self, repository, parse_body, fields=None, totals=None):
+        self.repository = repository
+        self.parse_body = parse_body
+        self.fields = fields or repository.columns
+        self.totals = totals
+        self.search_indexed = False
+        self.store = None
+        self.batcher = None
+
+    def record(self, row):
+        formatters = self.repository.formatters
+        return {field: formatters[column](value) if column in formatters else value for column, (field, value) in enumerate(zip(self.fields, row))}
+
+
+def create_endpoints():
+    return {
+        'attendance': Endpoint(ATTENDANCE, attendance_values),
+        'visits': Endpoint(VISITORS, visit_values),
+        'customers': Endpoint(CUSTOMERS, customer_values, ['id', 'name', 'contact', 'item', 'amount'], totals=customer_totals),
+    }
+
+
+class CheckinService:
+    def __init__(self, batch_size=SERVICE_BATCH_SIZE, batch_delay_ms=SERVICE_BATCH_DELAY_MS, readers=SERVICE_READERS):
+        self.batch_size = batch_size
+        self.batch_delay_ms = batch_delay_ms
+        self.readers = readers
+        self.endpoints = create_endpoints()
+        self.server = None
+
+    async def start(self, host, port):
+        for endpoint in self.endpoints.values():
+            endpoint.store = Store(endpoint.repository.database, self.readers)
+            endpoint.search_indexed = await endpoint.store.write(endpoint.repository.create_table)
+            endpoint.batcher = WriteBatcher(endpoint.store, self.batch_size, self.batch_delay_ms)
+        self.server = await asyncio.start_server(self.handle_client, host, port, backlog=4096)
+        return self.server
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for endpoint in self.endpoints.values():
+            await endpoint.batcher.close()
+            endpoint.store.close()
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {'error': 'malformed request'}, False)
+                    break
+                if length < 0:
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {'error': 'malformed request'}, False)
+                    break
+                if length > MAX_BODY_SIZE:
+                    await self.respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': 'request body too large'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                started = time.perf_counter()
+                status, payload = await self.dispatch(method, target, body)
+                if instrumentation.ENABLED:
+                    instrumentation.record(f'{method} {urlsplit(target).path}', time.perf_counter() - started)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive):
+        data = json.dumps(payload).encode('utf-8')
+        head = (
+            f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(data)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'
+        )
+        writer.write(head.encode('latin-1') + data)
+        await writer.drain()
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        parts = url.path.strip('/').split('/')
+        if parts == ['stats'] and method == 'GET':
+            return HTTPStatus.OK, instrumentation.stats.snapshot()
+        endpoint = self.endpoints.get(parts[0])
+        if endpoint is None or len(parts) > 2:
+            return HTTPStatus.NOT_FOUND, {'error': 'not found'}
+
+        try:
+            if parts[1:] == []:
+                if method == 'POST':
+                    return await self.insert(endpoint, body)
+                if method == 'GET':
+                    return await self.search(endpoint, parse_qs(url.query))
+                return HTTPStatus.METHOD_NOT_ALLOWED, {'error': 'use GET or POST'}
+            if parts[1:] == ['totals'] and endpoint.totals is not None:
+                if method == 'GET':
+                    return HTTPStatus.OK, await endpoint.store.read(endpoint.totals)
+                return HTTPStatus.METHOD_NOT_ALLOWED, {'error': 'use GET'}
+            return HTTPStatus.NOT_FOUND, {'error': 'not found'}
+        except sqlite3.Error as error:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {'error': f'database error: {error}'}
+        except Exception:
+            # Anything unforeseen still gets a reply rather than a dropped
+            # connection; the traceback goes to the service's stderr.
+            traceback.print_exc()
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': 'internal error'}
+
+    async def insert(self, endpoint, body):
+        try:
+            values = json.loads(body)
+            if not isinstance(values, dict):
+                raise ValueError('expected a JSON object')
+            params = endpoint.parse_body(values)
+        except KeyError as error:
+            return HTTPStatus.BAD_REQUEST, {'error': f'missing field {error}'}
+        except (ValueError, TypeError, AttributeError, ArithmeticError) as error:
+            return HTTPStatus.BAD_REQUEST, {'error': str(error)}
+
+        try:
+            row_id = await endpoint.batcher.submit(endpoint.repository.insert_sql, params)
+        except (ValueError, ArithmeticError) as error:
+            # Raised when binding a value SQLite cannot store, such as an
+            # integer beyond 64 bits.
+            return HTTPStatus.BAD_REQUEST, {'error': str(error)}
+        return HTTPStatus.CREATED, {'id': row_id}
+
+    async def search(self, endpoint, query):
+        term = query.get('q', [''])[0].strip()
+        try:
+            limit = max(1, min(int(query.get('limit', [SEARCH_LIMIT])[0]), MAX_SEARCH_LIMIT))
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {'error': 'limit must be a number'}
+
+        rows = await endpoint.store.read(endpoint.repository.search, term, endpoint.search_indexed, limit)
+        return HTTPStatus.OK, {'rows': [endpoint.record(row) for row in rows]}
+
+
+async def serve(args):
+    service = CheckinService(args.batch_size, args.batch_delay_ms, args.readers)
+    server = await service.start(args.host, args.port)
+    print(f'Check-in service listening on {", ".join(str(sock.getsockname()) for sock in server.sockets)}', file=sys.stderr)
+    stopped = asyncio.Event()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopped.set)
+    except (NotImplementedError, AttributeError):
+        pass
+    try:
+        await stopped.wait()
+    finally:
+        await service.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Headless HTTP/JSON check-in service for the attendance, visitor and customer databases')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--batch-size', type=int, default=SERVICE_BATCH_SIZE, help='most inserts committed in one transaction')
+    parser.add_argument('--batch-delay-ms', type=int, default=SERVICE_BATCH_DELAY_MS, help='longest an insert waits for others to share its commit')
+    parser.add_argument('--readers', type=int, default=SERVICE_READERS, help='reader threads per database')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
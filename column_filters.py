@@ -0,0 +1,23 @@
+# Per-column filters as (where, params) pairs, like search_filter, for the
+# windows to AND together and hand to SqliteTableModel.set_filter.
+
+
+def prefix_filter(column, prefix):
+    # Case-insensitive "starts with". LIKE is case-insensitive for ASCII,
+    # like NOCASE, so with an index on (column COLLATE NOCASE) SQLite turns
+    # this into a range seek on that index instead of a scan.
+    pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    return f"{column} LIKE ? ESCAPE '\\'", (pattern,)
+
+
+def range_filter(column, low=None, high=None):
+    # Inclusive bounds; either may be None for an open end.
+    clauses = []
+    params = []
+    if low is not None:
+        clauses.append(f'{column} >= ?')
+        params.append(low)
+    if high is not None:
+        clauses.append(f'{column} <= ?')
+        params.append(high)
+    return ' AND '.join(clauses), tuple(params)
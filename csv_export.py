@@ -0,0 +1,68 @@
+import csv
+import gzip
+import io
+import os
+
+EXPORT_BATCH_SIZE = 5000
+EXPORT_BUFFER_SIZE = 1024 * 1024
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def open_export_file(file_name):
+    # A name ending in .gz is written gzip-compressed.
+    if file_name.endswith('.gz'):
+        compressed = gzip.GzipFile(filename=file_name, mode='wb', compresslevel=6)
+        return io.TextIOWrapper(io.BufferedWriter(compressed, EXPORT_BUFFER_SIZE), encoding='utf-8', newline='')
+    return open(file_name, 'w', encoding='utf-8', newline='', buffering=EXPORT_BUFFER_SIZE)
+
+
+def export_table(job, table, columns, headers, file_name, batch_size=EXPORT_BATCH_SIZE):
+    # Streams the table to CSV in fixed-size batches so memory stays flat
+    # regardless of table size. Progress is reported as a percentage and the
+    # partial file is removed if the job is cancelled or fails.
+    cursor = job.connection.cursor()
+    cursor.execute(f'SELECT COUNT(*) FROM {table}')
+    total = cursor.fetchone()[0]
+
+    file = open_export_file(file_name)
+    try:
+        writer = csv.writer(file)
+        writer.writerow(headers)
+
+        cursor.execute(f'SELECT {", ".join(columns)} FROM {table} ORDER BY id')
+        written = 0
+        while True:
+            if job.is_cancelled():
+                raise ExportCancelled(file_name)
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            writer.writerows(rows)
+            written += len(rows)
+            job.report_progress(min(100, written * 100 // total) if total else 100)
+    except BaseException:
+        file.close()
+        os.remove(file_name)
+        raise
+    file.close()
+
+    return written
+
+
+def export_rows(job, headers, rows, file_name):
+    # For result sets that are already in memory, such as reports.
+    file = open_export_file(file_name)
+    try:
+        writer = csv.writer(file)
+        writer.writerow(headers)
+        writer.writerows(rows)
+    except BaseException:
+        file.close()
+        os.remove(file_name)
+        raise
+    file.close()
+
+    return len(rows)
@@ -0,0 +1,134 @@
+import math
+from itertools import chain
+
+from storage import format_amount
+
+# Purchase analytics for the customers window. SQLite hands amounts over
+# already grouped, (amount_cents, purchases) in amount order off the
+# covering idx_customers_amount, so Python sees one row per distinct amount
+# rather than one per purchase. Those rows are streamed ANALYTICS_CHUNK_ROWS
+# at a time into NumPy arrays, and percentiles, histogram counts and sums
+# are accumulated chunk by chunk, so memory stays bounded however large the
+# table grows. Per-customer and per-item figures come from the totals
+# tables the triggers already maintain.
+ANALYTICS_CHUNK_ROWS = 100000
+ANALYTICS_PERCENTILES = [25, 50, 75, 90, 99]
+ANALYTICS_HISTOGRAM_BINS = 10
+ANALYTICS_TOP_N = 10
+ANALYTICS_TOP_SHARE = 10
+
+
+def distribution(job, sql, count, low, high):
+    # Streams (value, weight) rows in ascending value order, with weights
+    # adding up to count, and returns (percentiles, histogram edges,
+    # histogram counts, sum of squares). Percentiles are exact (nearest
+    # rank). Histogram edges are whole cents, bin i holding the values from
+    # edges[i] up to but not including edges[i + 1]. None if the job was
+    # cancelled.
+    #
+    # NumPy is imported here rather than at the top, so the window starts
+    # without it and only pays for the import once analytics are first run.
+    import numpy as np
+
+    ranks = np.maximum(1, np.ceil(np.array(ANALYTICS_PERCENTILES) / 100 * count)).astype(np.int64)
+    percentiles = np.zeros(len(ranks), dtype=np.int64)
+    # A narrow range gets fewer bins rather than bins under a cent wide.
+    width = -(-(high - low + 1) // ANALYTICS_HISTOGRAM_BINS)
+    bins = -(-(high - low + 1) // width)
+    edges = low + width * np.arange(bins + 1, dtype=np.int64)
+    histogram = np.zeros(bins, dtype=np.int64)
+    square_sum = 0.0
+    seen = 0
+
+    cursor = job.connection.cursor()
+    cursor.execute(sql)
+    while True:
+        if job.is_cancelled():
+            return None
+        rows = cursor.fetchmany(ANALYTICS_CHUNK_ROWS)
+        if not rows:
+            break
+        chunk = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows)).reshape(-1, 2)
+        values, weights = chunk[:, 0], chunk[:, 1]
+
+        cumulative = seen + np.cumsum(weights)
+        inside = (ranks > seen) & (ranks <= cumulative[-1])
+        percentiles[inside] = values[np.searchsorted(cumulative, ranks[inside])]
+        histogram += np.histogram(values, bins=edges, weights=weights)[0].astype(np.int64)
+        square_sum += float(np.dot(values.astype(np.float64) ** 2, weights))
+        seen = int(cumulative[-1])
+        job.report_progress(min(99, seen * 100 // count))
+
+    return percentiles.tolist(), edges.tolist(), histogram.tolist(), square_sum
+
+
+def customer_analytics(job, known_version=None):
+    # Returns (version, report) for the customers table, or None when its
+    # data is still at known_version (customer_totals.version) or the job
+    # was cancelled. Run it through db_worker.read_snapshot, so every figure
+    # comes from the same point in time.
+    cursor = job.connection.cursor()
+    cursor.execute('SELECT version, total_cents, purchase_count FROM customer_totals WHERE id = 1')
+    version, total_cents, purchase_count = cursor.fetchone()
+    if version == known_version:
+        return None
+
+    report = {'purchases': purchase_count, 'total_cents': total_cents}
+    if purchase_count:
+        # Separate subqueries, so each is a single seek to one end of the
+        # index; MIN and MAX in one SELECT scan the whole of it.
+        cursor.execute('SELECT (SELECT MIN(amount_cents) FROM customers), (SELECT MAX(amount_cents) FROM customers)')
+        low, high = cursor.fetchone()
+        amounts = distribution(job, 'SELECT amount_cents, COUNT(*) FROM customers GROUP BY amount_cents', purchase_count, low, high)
+        if amounts is None:
+            return None
+        mean = total_cents / purchase_count
+        report['amounts'] = (low, high, mean, math.sqrt(max(0.0, amounts[3] / purchase_count - mean * mean))) + amounts[:3]
+
+        cursor.execute('SELECT (SELECT COUNT(*) FROM customer_name_totals), (SELECT MIN(total_cents) FROM customer_name_totals), (SELECT MAX(total_cents) FROM customer_name_totals)')
+        customers, low, high = cursor.fetchone()
+        spend = distribution(job, 'SELECT total_cents, COUNT(*) FROM customer_name_totals GROUP BY total_cents', customers, low, high)
+        if spend is None:
+            return None
+        top_customers = math.ceil(customers * ANALYTICS_TOP_SHARE / 100)
+        cursor.execute('SELECT SUM(total_cents) FROM (SELECT total_cents FROM customer_name_totals ORDER BY total_cents DESC LIMIT ?)', (top_customers,))
+        report['customers'] = (customers, total_cents / customers, spend[0], cursor.fetchone()[0] / total_cents if total_cents else 0)
+
+        for grouping in ['name', 'item']:
+            cursor.execute(f'SELECT {grouping}, total_cents, purchase_count FROM customer_{grouping}_totals ORDER BY total_cents DESC LIMIT ?', (ANALYTICS_TOP_N,))
+            report[f'top_{grouping}s'] = cursor.fetchall()
+
+    job.report_progress(100)
+    return version, report
+
+
+def format_analytics(report):
+    purchases = report['purchases']
+    lines = [f'Purchases: {purchases}    Total: {format_amount(report["total_cents"])}']
+    if not purchases:
+        return '\n'.join(lines)
+
+    low, high, mean, deviation, percentiles, edges, histogram = report['amounts']
+    lines.append(f'Amount    min {format_amount(low)}    mean {format_amount(round(mean))}    max {format_amount(high)}    std dev {format_amount(round(deviation))}')
+    lines.append('Percentiles  ' + '    '.join(f'p{percentile} {format_amount(value)}' for percentile, value in zip(ANALYTICS_PERCENTILES, percentiles)))
+
+    lines.append('')
+    lines.append('Purchase amounts')
+    widest = max(histogram)
+    for position, count in enumerate(histogram):
+        start = edges[position]
+        end = min(high, edges[position + 1] - 1)
+        bar = '#' * round(40 * count / widest) if widest else ''
+        lines.append(f'{format_amount(start):>12} - {format_amount(end):<12}{count:>10}  {bar}')
+
+    customers, average, spend, top_share = report['customers']
+    lines.append('')
+    lines.append(f'Customers: {customers}    average spend {format_amount(round(average))}    median spend {format_amount(spend[ANALYTICS_PERCENTILES.index(50)])}')
+    lines.append(f'Top {ANALYTICS_TOP_SHARE}% of customers: {top_share:.1%} of revenue')
+
+    for title, key in [('Top customers', 'top_names'), ('Top items', 'top_items')]:
+        lines.append('')
+        lines.append(f'{title:<32}{"total":>14}{"purchases":>12}{"average":>12}')
+        for label, total, count in report[key]:
+            lines.append(f'{label[:31]:<32}{format_amount(total):>14}{count:>12}{format_amount(total // count):>12}')
+    return '\n'.join(lines)
@@ -1,21 +1,49 @@
 import sys
+import argparse
+from startup_timing import StartupTimer
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
-    QTextEdit, QTableWidget, QTableWidgetItem, QFileDialog, QMessageBox
+    QMessageBox, QInputDialog, QComboBox, QShortcut, QPlainTextEdit
 )
-from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import Qt
-import sqlite3
+from PyQt5.QtGui import QIcon, QKeySequence, QFontDatabase
+from PyQt5.QtCore import QTimer
 from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
+
+import instrumentation
+from bulk_import import ConsoleJob, import_summary
+from database import connect
+from db_worker import execute, fetch_one, read_snapshot
+from log_panel import LogPanel
+from retention import clear_table
+from search_cache import SearchCache, SEARCH_DEBOUNCE_MS
+from column_filters import prefix_filter, range_filter
+from customer_analytics import customer_analytics, format_analytics
+from repository import CUSTOMERS
+from storage import CUSTOMER_AMOUNT_UPDATE, MAX_AMOUNT_CENTS, customer_chart_data, format_amount, parse_amount, rebuild_customer_totals, unmigrated_customer_count
+from table_model import SqliteTableModel
+from table_window import create_executors, create_table_view, export_records, import_records, show_filtered, shutdown_executors
+from write_queue import WriteQueue
+
+# The chart shows the CHART_TOP_N largest customers or items plus an "Other"
+# bar, and while it is visible checks every CHART_POLL_MS whether the totals
+# have changed; it is only redrawn when they have.
+CHART_TOP_N = 10
+CHART_POLL_MS = 1000
+CHART_GROUPINGS = {'Customer': 'name', 'Item': 'item'}
+
 
 class CustomerManagementSystem(QWidget):
     def __init__(self):
         super().__init__()
 
-        self.db_connection = sqlite3.connect('customers.db')
+        self.db_executor, self.report_executor, self.bulk_executor = create_executors(self, CUSTOMERS.database)
+        self.write_queue = WriteQueue(self.db_executor, parent=self)
+        self.search_indexed = False
+        self.search_cache = SearchCache([1, 2, 3])
+        self.search_term = ''
+        self.chart_canvas = None
+        self.chart_key = None
+        self.analytics_version = None
         self.create_table()
 
         self.init_ui()
@@ -49,18 +77,35 @@ class CustomerManagementSystem(QWidget):
         self.edit_customer_button = QPushButton('Edit Customer', self)
         self.edit_customer_button.setStyleSheet("background-color: #3498db; color: white;")
 
-        self.search_label = QLabel('Search Customer Name:', self)
+        self.search_label = QLabel('Search Name, Contact or Item:', self)
         self.search_input = QLineEdit(self)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.search_customers)
 
         self.search_button = QPushButton('Search', self)
         self.search_button.setStyleSheet("background-color: #008CBA; color: white;")
 
+        self.item_filter_label = QLabel('Item starts with:', self)
+        self.item_filter_input = QLineEdit(self)
+        self.amount_from_label = QLabel('Amount from:', self)
+        self.amount_from_input = QLineEdit(self)
+        self.amount_to_label = QLabel('To:', self)
+        self.amount_to_input = QLineEdit(self)
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.filter_timer.timeout.connect(self.filters_changed)
+
         self.export_button = QPushButton('Export to CSV', self)
         self.export_button.setStyleSheet("background-color: #f44336; color: white;")
 
         self.view_details_button = QPushButton('View Details', self)
         self.view_details_button.setStyleSheet("background-color: #555555; color: white;")
 
+        self.import_button = QPushButton('Import CSV', self)
+        self.import_button.setStyleSheet("background-color: #2c3e50; color: white;")
         self.clear_records_button = QPushButton('Clear Records', self)
         self.clear_records_button.setStyleSheet("background-color: #FFA500; color: white;")
 
@@ -69,13 +114,32 @@ class CustomerManagementSystem(QWidget):
 
         self.view_chart_button = QPushButton('View Purchase Chart', self)
         self.view_chart_button.setStyleSheet("background-color: #9b59b6; color: white;")
+        self.view_chart_button.setCheckable(True)
+
+        self.chart_panel = QWidget(self)
+        self.chart_grouping_label = QLabel('Chart by:', self.chart_panel)
+        self.chart_grouping_input = QComboBox(self.chart_panel)
+        self.chart_grouping_input.addItems(list(CHART_GROUPINGS))
+        self.chart_timer = QTimer(self)
+        self.chart_timer.setInterval(CHART_POLL_MS)
+        self.chart_timer.timeout.connect(self.refresh_chart)
 
-        self.log_display = QTextEdit(self)
-        self.log_display.setReadOnly(True)
+        self.view_analytics_button = QPushButton('View Analytics', self)
+        self.view_analytics_button.setStyleSheet("background-color: #16a085; color: white;")
+        self.view_analytics_button.setCheckable(True)
 
-        self.customers_table = QTableWidget(self)
-        self.customers_table.setColumnCount(5)
-        self.customers_table.setHorizontalHeaderLabels(['ID', 'Name', 'Contact', 'Item', 'Amount'])
+        self.analytics_panel = QWidget(self)
+        self.analytics_status = QLabel(self.analytics_panel)
+        self.refresh_analytics_button = QPushButton('Refresh', self.analytics_panel)
+        self.analytics_display = QPlainTextEdit(self.analytics_panel)
+        self.analytics_display.setReadOnly(True)
+        self.analytics_display.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+
+        self.log_display = LogPanel('customers', self)
+
+        self.customers_model = SqliteTableModel(self.report_executor, CUSTOMERS.table, CUSTOMERS.columns, CUSTOMERS.headers, formatters=CUSTOMERS.formatters, sort_keys=CUSTOMERS.sort_keys, deferred=True, parent=self)
+        self.customers_model.fully_loaded.connect(self.cache_search_results)
+        self.customers_table = create_table_view(self, self.customers_model)
 
         layout = QVBoxLayout(self)
 
@@ -98,41 +162,83 @@ class CustomerManagementSystem(QWidget):
         search_layout.addWidget(self.search_button)
         layout.addLayout(search_layout)
 
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(self.item_filter_label)
+        filter_layout.addWidget(self.item_filter_input)
+        filter_layout.addWidget(self.amount_from_label)
+        filter_layout.addWidget(self.amount_from_input)
+        filter_layout.addWidget(self.amount_to_label)
+        filter_layout.addWidget(self.amount_to_input)
+        layout.addLayout(filter_layout)
+
         buttons_layout = QHBoxLayout()
         buttons_layout.addWidget(self.export_button)
         buttons_layout.addWidget(self.view_details_button)
+        buttons_layout.addWidget(self.import_button)
         buttons_layout.addWidget(self.clear_records_button)
         buttons_layout.addWidget(self.calculate_total_button)
         buttons_layout.addWidget(self.view_chart_button)
+        buttons_layout.addWidget(self.view_analytics_button)
         layout.addLayout(buttons_layout)
 
+        chart_layout = QVBoxLayout(self.chart_panel)
+        chart_options_layout = QHBoxLayout()
+        chart_options_layout.addWidget(self.chart_grouping_label)
+        chart_options_layout.addWidget(self.chart_grouping_input)
+        chart_options_layout.addStretch()
+        chart_layout.addLayout(chart_options_layout)
+        self.chart_panel.hide()
+
+        analytics_layout = QVBoxLayout(self.analytics_panel)
+        analytics_options_layout = QHBoxLayout()
+        analytics_options_layout.addWidget(self.analytics_status)
+        analytics_options_layout.addStretch()
+        analytics_options_layout.addWidget(self.refresh_analytics_button)
+        analytics_layout.addLayout(analytics_options_layout)
+        analytics_layout.addWidget(self.analytics_display)
+        self.analytics_panel.hide()
+
         layout.addWidget(self.log_display)
         layout.addWidget(self.customers_table)
+        layout.addWidget(self.chart_panel)
+        layout.addWidget(self.analytics_panel)
 
         self.add_customer_button.clicked.connect(self.add_customer)
         self.edit_customer_button.clicked.connect(self.edit_customer)
         self.search_button.clicked.connect(self.search_customers)
+        self.search_input.returnPressed.connect(self.search_customers)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        for filter_input in [self.item_filter_input, self.amount_from_input, self.amount_to_input]:
+            filter_input.textChanged.connect(self.filter_timer.start)
+            filter_input.returnPressed.connect(self.filters_changed)
         self.export_button.clicked.connect(self.export_to_csv)
         self.view_details_button.clicked.connect(self.view_details)
+        self.import_button.clicked.connect(self.import_from_csv)
         self.clear_records_button.clicked.connect(self.clear_records)
         self.calculate_total_button.clicked.connect(self.calculate_total_amount)
-        self.view_chart_button.clicked.connect(self.view_purchase_chart)
+        self.view_chart_button.toggled.connect(self.view_purchase_chart)
+        self.chart_grouping_input.currentIndexChanged.connect(self.refresh_chart)
+        self.view_analytics_button.toggled.connect(self.view_analytics)
+        self.refresh_analytics_button.clicked.connect(self.refresh_analytics)
 
-        self.update_customers_table()
+        if instrumentation.ENABLED:
+            self.stats_shortcut = QShortcut(QKeySequence('Ctrl+Shift+S'), self)
+            self.stats_shortcut.activated.connect(self.show_stats)
+
+        # Rows are read once create_table has finished.
         self.show()
 
     def create_table(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS customers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                contact TEXT NOT NULL,
-                item TEXT NOT NULL,
-                amount TEXT NOT NULL
-            )
-        ''')
-        self.db_connection.commit()
+        def table_created(indexed):
+            self.search_indexed = indexed
+            self.customers_model.refresh()
+
+        def unmigrated_counted(count):
+            if count:
+                self.log_display.append(f'{count} older purchases had amounts that could not be read and were moved to the customers_unmigrated table; correct them there and add them again.')
+
+        self.db_executor.submit(CUSTOMERS.create_table, on_result=table_created)
+        self.db_executor.submit(unmigrated_customer_count, on_result=unmigrated_counted)
 
     def add_customer(self):
         name = self.name_input.text().strip()
@@ -141,139 +247,222 @@ class CustomerManagementSystem(QWidget):
         amount = self.amount_input.text().strip()
 
         if name and contact and item and amount:
-            cursor = self.db_connection.cursor()
-            cursor.execute('INSERT INTO customers (name, contact, item, amount) VALUES (?, ?, ?, ?)', (name, contact, item, amount))
-            self.db_connection.commit()
+            amount_cents = parse_amount(amount)
+            if amount_cents is None:
+                self.warn_invalid_amount()
+                return
 
-            self.update_customers_table()
-            self.log_display.append(f'Added customer: {name} - Contact: {contact} - Item: {item} - Amount: {amount}')
+            def customer_added(row_id):
+                self.search_cache.clear()
+                self.customers_model.refresh_row(row_id)
+                self.log_display.append(f'Added customer: {name} - Contact: {contact} - Item: {item} - Amount: {format_amount(amount_cents)}')
+
+            self.write_queue.submit(CUSTOMERS.insert_sql, (name, contact, item, amount_cents), on_result=customer_added, operation='add')
 
     def edit_customer(self):
-        selected_row = self.customers_table.currentRow()
-        if selected_row >= 0:
-            id_item = self.customers_table.item(selected_row, 0)
-            name_item = self.customers_table.item(selected_row, 1)
-            contact_item = self.customers_table.item(selected_row, 2)
-            item_item = self.customers_table.item(selected_row, 3)
-            amount_item = self.customers_table.item(selected_row, 4)
-
-            id_value = id_item.text()
-            name_value = name_item.text()
-            contact_value = contact_item.text()
-            item_value = item_item.text()
-            amount_value = amount_item.text()
-
-            # Assuming a new amount is entered for editing
-            new_amount, ok_pressed = QInputDialog.getDouble(self, "Edit Amount", f"Edit amount for {name_value}:", float(amount_value), 0, 100000, 2)
+        selected_index = self.customers_table.currentIndex()
+        if selected_index.isValid():
+            record = CUSTOMERS.record(self.customers_model.record(selected_index.row()))
+
+            # Assuming a new amount is entered for editing; it is checked the
+            # same way as one that is added.
+            new_amount, ok_pressed = QInputDialog.getText(self, "Edit Amount", f"Edit amount for {record.name}:", text=format_amount(record.amount_cents))
 
             if ok_pressed:
-                cursor = self.db_connection.cursor()
-                cursor.execute('UPDATE customers SET amount = ? WHERE id = ?', (new_amount, id_value))
-                self.db_connection.commit()
+                new_amount_cents = parse_amount(new_amount.strip())
+                if new_amount_cents is None:
+                    self.warn_invalid_amount()
+                    return
 
-                self.update_customers_table()
-                self.log_display.append(f'Edited amount for {name_value}. New amount: {new_amount}')
+                def customer_edited(_):
+                    self.search_cache.clear()
+                    self.customers_model.refresh_row(record.id)
+                    self.log_display.append(f'Edited amount for {record.name}. New amount: {format_amount(new_amount_cents)}')
+
+                self.db_executor.submit(execute, CUSTOMER_AMOUNT_UPDATE, (new_amount_cents, record.id), on_result=customer_edited, operation='edit')
+
+    def warn_invalid_amount(self):
+        QMessageBox.warning(self, 'Invalid Amount', f'Enter the purchase amount as a number with at most two decimal places and below {format_amount(MAX_AMOUNT_CENTS)}, for example 12.50.')
 
     def search_customers(self):
+        self.search_timer.stop()
         search_name = self.search_input.text().strip()
+        self.search_term = search_name
+        self.apply_filters()
         if search_name:
-            cursor = self.db_connection.cursor()
-            cursor.execute('SELECT * FROM customers WHERE name LIKE ?', (f'%{search_name}%',))
-            data = cursor.fetchall()
+            self.log_display.append(f'Searched customers for {search_name}')
 
-            self.customers_table.setRowCount(len(data))
-            for row_index, row_data in enumerate(data):
-                for col_index, col_data in enumerate(row_data):
-                    item = QTableWidgetItem(str(col_data))
-                    item.setFlags(Qt.ItemIsEnabled)
-                    self.customers_table.setItem(row_index, col_index, item)
+    def filters_changed(self):
+        # Cached searches were taken under the previous filters.
+        self.filter_timer.stop()
+        self.search_cache.clear()
+        self.apply_filters()
 
-            self.log_display.append(f'Searched customers for {search_name}')
+    def apply_filters(self):
+        clauses = []
+        params = []
 
-    def export_to_csv(self):
-        options = QFileDialog.Options()
-        options |= QFileDialog.DontUseNativeDialog
-        file_name, _ = QFileDialog.getSaveFileName(self, "Save Customers Data", "", "CSV Files (*.csv);;All Files (*)", options=options)
+        item = self.item_filter_input.text().strip()
+        if item:
+            where, filter_params = prefix_filter('item', item)
+            clauses.append(where)
+            params.extend(filter_params)
 
-        if file_name:
-            with open(file_name, 'w') as file:
-                cursor = self.db_connection.cursor()
-                cursor.execute('SELECT * FROM customers')
-                data = cursor.fetchall()
+        # An amount that does not parse leaves that end of the range open.
+        low = parse_amount(self.amount_from_input.text().strip())
+        high = parse_amount(self.amount_to_input.text().strip())
+        if low is not None or high is not None:
+            where, filter_params = range_filter('amount_cents', low, high)
+            clauses.append(where)
+            params.extend(filter_params)
 
-                headers = ['ID', 'Name', 'Contact', 'Item', 'Amount']
-                file.write(','.join(headers) + '\n')
+        show_filtered(self, self.customers_model, CUSTOMERS, clauses, params)
 
-                for row_data in data:
-                    file.write(','.join(map(str, row_data)) + '\n')
+    def cache_search_results(self):
+        if self.search_term:
+            self.search_cache.put(self.search_term, self.customers_model.rows)
+
+    def export_to_csv(self):
+        export_records(self, CUSTOMERS, 'Customers', 'customer')
+
+    def import_from_csv(self):
+        def imported():
+            self.search_cache.clear()
+            self.update_customers_table()
 
-            self.log_display.append(f'Exported customers data to {file_name}')
+        import_records(self, CUSTOMERS, 'Customers', imported)
 
     def view_details(self):
-        selected_row = self.customers_table.currentRow()
-        if selected_row >= 0:
-            id_item = self.customers_table.item(selected_row, 0)
-            name_item = self.customers_table.item(selected_row, 1)
-            contact_item = self.customers_table.item(selected_row, 2)
-            item_item = self.customers_table.item(selected_row, 3)
-            amount_item = self.customers_table.item(selected_row, 4)
-
-            id_value = id_item.text()
-            name_value = name_item.text()
-            contact_value = contact_item.text()
-            item_value = item_item.text()
-            amount_value = amount_item.text()
-
-            details = f'Details for ID {id_value}:\nName: {name_value}\nContact: {contact_value}\nItem: {item_value}\nAmount: {amount_value}'
+        selected_index = self.customers_table.currentIndex()
+        if selected_index.isValid():
+            record = CUSTOMERS.record(self.customers_model.record(selected_index.row()))
+
+            details = f'Details for ID {record.id}:\nName: {record.name}\nContact: {record.contact}\nItem: {record.item}\nAmount: {format_amount(record.amount_cents)}'
             self.log_display.append(details)
 
     def clear_records(self):
         confirmation = QMessageBox.question(self, 'Confirmation', 'Are you sure you want to clear all records? This action cannot be undone.', QMessageBox.Yes | QMessageBox.No)
         if confirmation == QMessageBox.Yes:
-            cursor = self.db_connection.cursor()
-            cursor.execute('DELETE FROM customers')
-            self.db_connection.commit()
+            def records_cleared(_):
+                self.search_cache.clear()
+                self.update_customers_table()
+                self.log_display.append('All records cleared.')
 
-            self.update_customers_table()
-            self.log_display.append('All records cleared.')
+            self.write_queue.flush()
+            self.db_executor.submit(clear_table, CUSTOMERS.table, rebuild_customer_totals, on_result=records_cleared, operation='clear')
 
     def calculate_total_amount(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute('SELECT SUM(amount) FROM customers')
-        total_amount = cursor.fetchone()[0]
-
-        self.log_display.append(f'Total purchase amount from all customers: {total_amount}')
+        def total_calculated(row):
+            total_amount = format_amount(row[0] if row else 0)
+            self.log_display.append(f'Total purchase amount from all customers: {total_amount}')
+
+        self.report_executor.submit(fetch_one, 'SELECT total_cents FROM customer_totals WHERE id = 1', key='total', on_result=total_calculated, operation='total')
+
+    def view_purchase_chart(self, visible):
+        self.chart_panel.setVisible(visible)
+        if visible:
+            self.refresh_chart()
+            self.chart_timer.start()
+        else:
+            self.chart_timer.stop()
+
+    def refresh_chart(self):
+        label = self.chart_grouping_input.currentText()
+        grouping = CHART_GROUPINGS[label]
+        known_version = self.chart_key[1] if self.chart_key and self.chart_key[0] == grouping else None
+
+        def chart_loaded(data):
+            if data is not None:
+                version, rows, other_cents = data
+                self.show_purchase_chart(label, rows, other_cents)
+                self.chart_key = (grouping, version)
+
+        self.report_executor.submit(read_snapshot, customer_chart_data, grouping, CHART_TOP_N, known_version, key='chart', on_result=chart_loaded, operation='chart')
+
+    def view_analytics(self, visible):
+        # Unlike the chart this is not polled: a report reads every distinct
+        # amount, so it is only recomputed on demand, and then only if the
+        # data version has moved since the one on display.
+        self.analytics_panel.setVisible(visible)
+        if visible:
+            self.refresh_analytics()
+
+    def refresh_analytics(self):
+        def analytics_loaded(data):
+            if data is not None:
+                self.analytics_version, report = data
+                self.analytics_display.setPlainText(format_analytics(report))
+            self.analytics_status.setText('Up to date')
+
+        def analytics_failed(error):
+            self.analytics_status.setText(f'Analytics failed: {error}')
+
+        def analytics_progress(value):
+            self.analytics_status.setText(f'Computing... {value}%')
+
+        self.write_queue.flush()
+        self.analytics_status.setText('Computing...')
+        self.bulk_executor.submit(read_snapshot, customer_analytics, self.analytics_version, key='analytics', on_result=analytics_loaded, on_error=analytics_failed, on_progress=analytics_progress, operation='analytics')
+
+    def show_purchase_chart(self, label, rows, other_cents):
+        if self.chart_canvas is None:
+            # matplotlib takes longer to import than the rest of the app; only
+            # pay for it once the chart is first shown, then reuse the canvas.
+            from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+            from matplotlib.figure import Figure
+
+            self.chart_canvas = FigureCanvas(Figure(figsize=(8, 3), tight_layout=True))
+            self.chart_axes = self.chart_canvas.figure.add_subplot()
+            self.chart_panel.layout().addWidget(self.chart_canvas)
+
+        labels = [row[0] for row in rows]
+        amounts = [row[1] / 100 for row in rows]
+        if other_cents:
+            labels.append('Other')
+            amounts.append(other_cents / 100)
+
+        ax = self.chart_axes
+        ax.clear()
+        ax.barh(labels[::-1], amounts[::-1])
+        ax.set_xlabel('Purchase Amount')
+        ax.set_title(f'Purchase Amounts by {label}')
+        self.chart_canvas.draw_idle()
 
-    def view_purchase_chart(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute('SELECT name, amount FROM customers')
-        data = cursor.fetchall()
-
-        names = [row[0] for row in data]
-        amounts = [float(row[1]) for row in data]
-
-        fig, ax = plt.subplots()
-        ax.bar(names, amounts)
-        ax.set_ylabel('Purchase Amount')
-        ax.set_xlabel('Customer Names')
-        ax.set_title('Purchase Amounts by Customer')
+    def update_customers_table(self):
+        self.customers_model.refresh()
 
-        plt.show()
+    def show_database_error(self, job, error):
+        self.log_display.append(f'Database error: {error}')
 
-    def update_customers_table(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute('SELECT * FROM customers')
-        data = cursor.fetchall()
+    def show_stats(self):
+        self.log_display.append(instrumentation.stats.report())
+        if instrumentation.STATS_FILE:
+            instrumentation.stats.dump(instrumentation.STATS_FILE)
+            self.log_display.append(f'Performance stats written to {instrumentation.STATS_FILE}')
 
-        self.customers_table.setRowCount(len(data))
-        for row_index, row_data in enumerate(data):
-            for col_index, col_data in enumerate(row_data):
-                item = QTableWidgetItem(str(col_data))
-                item.setFlags(Qt.ItemIsEnabled)
-                self.customers_table.setItem(row_index, col_index, item)
+    def closeEvent(self, event):
+        shutdown_executors(self)
+        super().closeEvent(event)
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description='Customer Management System')
+    parser.add_argument('--import', dest='import_file', metavar='CSV', help='bulk-load customers records from a CSV file (optionally .gz) and exit')
+    parser.add_argument('--startup-report', metavar='FILE', nargs='?', const='-', help='report import, first paint and first rows times as a JSON line to stderr, or append it to FILE')
+    args, qt_args = parser.parse_known_args()
+
+    startup_timer = StartupTimer('customers', args.startup_report)
+    startup_timer.mark('imports_ms')
+
+    if args.import_file:
+        job = ConsoleJob(connect(CUSTOMERS.database))
+        CUSTOMERS.create_table(job)
+        result = CUSTOMERS.import_file(job, args.import_file)
+        print(file=sys.stderr)
+        print(import_summary(result))
+        sys.exit(0)
+
+    app = QApplication(sys.argv[:1] + qt_args)
     window = CustomerManagementSystem()
+    startup_timer.watch(window, window.customers_model)
     sys.exit(app.exec_())
@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import threading
+
+import instrumentation
+
+# Databases live next to the scripts unless VISITOR_APPS_DB_DIR points
+# elsewhere, e.g. at a share used by several reception desks.
+DB_DIR_ENV = 'VISITOR_APPS_DB_DIR'
+DEFAULT_DB_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BUSY_TIMEOUT_MS = int(os.environ.get('VISITOR_APPS_BUSY_TIMEOUT_MS', 10000))
+SYNCHRONOUS = os.environ.get('VISITOR_APPS_SYNCHRONOUS', 'NORMAL')
+CACHE_SIZE_KIB = 64 * 1024
+MMAP_SIZE = 256 * 1024 * 1024
+# Prepared statements kept per connection. Statements never embed values, so
+# paging, search and insert queries all hit this cache after first use.
+STATEMENT_CACHE_SIZE = 256
+
+thread_local = threading.local()
+
+
+def database_path(name):
+    if os.path.isabs(name):
+        return name
+    return os.path.join(os.environ.get(DB_DIR_ENV, DEFAULT_DB_DIR), name)
+
+
+def connect(name):
+    # WAL lets readers and the single writer proceed concurrently, and
+    # synchronous=NORMAL only fsyncs at checkpoints, which is still safe
+    # against corruption in WAL mode. Writers that find the database locked
+    # wait up to BUSY_TIMEOUT_MS instead of failing straight away.
+    # auto_vacuum only takes effect on a database that has no tables yet;
+    # older files are switched over once with `retention.py vacuum --convert`.
+    factory = instrumentation.InstrumentedConnection if instrumentation.ENABLED else sqlite3.Connection
+    connection = sqlite3.connect(database_path(name), timeout=BUSY_TIMEOUT_MS / 1000, factory=factory, cached_statements=STATEMENT_CACHE_SIZE)
+    connection.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute(f'PRAGMA synchronous = {SYNCHRONOUS}')
+    connection.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+    connection.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    connection.execute('PRAGMA temp_store = MEMORY')
+    return connection
+
+
+def thread_connection(name):
+    # sqlite3 connections must not be shared between threads; each thread
+    # gets, and keeps reusing, its own connection per database.
+    connections = thread_local.__dict__.setdefault('connections', {})
+    connection = connections.get(name)
+    if connection is None:
+        connection = connections[name] = connect(name)
+    return connection
+
+
+def close_thread_connection(name):
+    connections = thread_local.__dict__.get('connections', {})
+    connection = connections.pop(name, None)
+    if connection is not None:
+        connection.close()
@@ -0,0 +1,30 @@
+from datetime import datetime, time, timedelta
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+ALL_DATES = 'All Dates'
+CUSTOM_RANGE = 'Custom Range'
+DATE_RANGES = [ALL_DATES, 'Today', 'Last 7 Days', 'Last 30 Days', CUSTOM_RANGE]
+
+RANGE_DAYS = {'Today': 1, 'Last 7 Days': 7, 'Last 30 Days': 30}
+
+
+def date_range_bounds(choice, custom_start=None, custom_end=None, now=None):
+    # Returns inclusive (start, end) timestamp strings for a DATE_RANGES
+    # choice, or None for all dates. Timestamps are stored as
+    # 'yyyy-MM-dd HH:mm:ss' text, which sorts chronologically.
+    if choice == ALL_DATES:
+        return None
+    if choice == CUSTOM_RANGE:
+        return custom_start.strftime(TIMESTAMP_FORMAT), custom_end.strftime(TIMESTAMP_FORMAT)
+
+    today = (now or datetime.now()).date()
+    start = datetime.combine(today - timedelta(days=RANGE_DAYS[choice] - 1), time.min)
+    end = datetime.combine(today, time(23, 59, 59))
+    return start.strftime(TIMESTAMP_FORMAT), end.strftime(TIMESTAMP_FORMAT)
+
+
+def normalize_timestamp(text):
+    # Accepts any ISO 8601 date/time (space or T separated) and returns it in
+    # the stored format; raises ValueError otherwise.
+    return datetime.fromisoformat(text.strip()).strftime(TIMESTAMP_FORMAT)
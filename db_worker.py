@@ -0,0 +1,190 @@
+import threading
+import time
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+import instrumentation
+from database import close_thread_connection, thread_connection
+
+
+class DatabaseJob:
+    def __init__(self, fn, args, key, on_result, on_error, on_progress, operation=None):
+        self.fn = fn
+        self.args = args
+        self.key = key
+        self.on_result = on_result
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.operation = operation or fn.__name__
+        self.submitted_at = time.perf_counter() if instrumentation.ENABLED else None
+
+        self.cancelled = False
+        self.worker = None
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def cancel(self):
+        # Safe to call from the GUI thread while the job is running: the
+        # worker's current statement is interrupted and its result dropped.
+        with self.lock:
+            self.cancelled = True
+            if self.connection is not None:
+                self.connection.interrupt()
+
+    def is_cancelled(self):
+        return self.cancelled
+
+    def report_progress(self, value):
+        if not self.cancelled:
+            self.worker.progress.emit(self, value)
+
+
+class DatabaseWorker(QObject):
+    finished = pyqtSignal(object, object)
+    failed = pyqtSignal(object, object)
+    progress = pyqtSignal(object, object)
+
+    def __init__(self, database):
+        super().__init__()
+
+        self.database = database
+        self.connection = None
+
+    @pyqtSlot(object)
+    def run(self, job):
+        if job.cancelled:
+            return
+        if self.connection is None:
+            self.connection = thread_connection(self.database)
+
+        job.worker = self
+        with job.lock:
+            job.connection = self.connection
+        try:
+            result = job.fn(job, *job.args)
+        except Exception as error:
+            if self.connection.in_transaction:
+                self.connection.rollback()
+            self.failed.emit(job, error)
+        else:
+            self.finished.emit(job, result)
+        finally:
+            with job.lock:
+                job.connection = None
+
+    @pyqtSlot()
+    def close(self):
+        if self.connection is not None:
+            close_thread_connection(self.database)
+            self.connection = None
+        QThread.currentThread().quit()
+
+
+class DatabaseExecutor(QObject):
+    # Runs database jobs one at a time on a dedicated thread that owns its own
+    # connection. Job functions are called as fn(job, *args) on that thread and
+    # reach the database through job.connection; results come back to the GUI
+    # thread through on_result/on_error. Submitting a job with the key of a job
+    # that is still pending cancels the older one. With instrumentation on,
+    # each job's time from submit until its callback returns is recorded
+    # under its operation name (the job function's name unless given).
+    error = pyqtSignal(object, object)
+
+    submitted = pyqtSignal(object)
+    closing = pyqtSignal()
+
+    def __init__(self, database, parent=None):
+        super().__init__(parent)
+
+        self.pending = {}
+
+        self.thread = QThread()
+        self.worker = DatabaseWorker(database)
+        self.worker.moveToThread(self.thread)
+
+        self.submitted.connect(self.worker.run)
+        self.closing.connect(self.worker.close)
+        self.worker.finished.connect(self.job_finished)
+        self.worker.failed.connect(self.job_failed)
+        self.worker.progress.connect(self.job_progress)
+
+        self.thread.start()
+
+    def submit(self, fn, *args, key=None, on_result=None, on_error=None, on_progress=None, operation=None):
+        job = DatabaseJob(fn, args, key, on_result, on_error, on_progress, operation)
+        if key is not None:
+            self.cancel(key)
+            self.pending[key] = job
+        self.submitted.emit(job)
+        return job
+
+    def cancel(self, key):
+        job = self.pending.pop(key, None)
+        if job is not None:
+            job.cancel()
+
+    def release(self, job):
+        if job.key is not None and self.pending.get(job.key) is job:
+            del self.pending[job.key]
+
+    @pyqtSlot(object, object)
+    def job_finished(self, job, result):
+        self.release(job)
+        if not job.cancelled and job.on_result is not None:
+            job.on_result(result)
+        if job.submitted_at is not None and not job.cancelled:
+            instrumentation.record(job.operation, time.perf_counter() - job.submitted_at)
+
+    @pyqtSlot(object, object)
+    def job_failed(self, job, error):
+        self.release(job)
+        if job.cancelled:
+            return
+        if job.on_error is not None:
+            job.on_error(error)
+        else:
+            self.error.emit(job, error)
+        if job.submitted_at is not None:
+            instrumentation.record(f'{job.operation}.failed', time.perf_counter() - job.submitted_at)
+
+    @pyqtSlot(object, object)
+    def job_progress(self, job, value):
+        if not job.cancelled and job.on_progress is not None:
+            job.on_progress(value)
+
+    def shutdown(self):
+        # Jobs already queued still run; the worker closes its connection
+        # and stops the thread once it reaches the close request.
+        if self.thread.isRunning():
+            self.closing.emit()
+            self.thread.wait()
+
+
+def fetch_all(job, sql, params=()):
+    cursor = job.connection.cursor()
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+
+def fetch_one(job, sql, params=()):
+    cursor = job.connection.cursor()
+    cursor.execute(sql, params)
+    return cursor.fetchone()
+
+
+def read_snapshot(job, fn, *args):
+    # Runs fn(job, *args) in one read transaction, so under WAL all of its
+    # statements see the same snapshot while other connections commit.
+    connection = job.connection
+    connection.execute('BEGIN')
+    try:
+        return fn(job, *args)
+    finally:
+        connection.rollback()
+
+
+def execute(job, sql, params=()):
+    cursor = job.connection.cursor()
+    cursor.execute(sql, params)
+    job.connection.commit()
+    return cursor.lastrowid
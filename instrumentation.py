@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+
+# Off unless VISITOR_APPS_INSTRUMENT is set, in which case database jobs are
+# timed per operation and connections come from InstrumentedConnection.
+# Disabled, the only cost left is a flag check per job. Slow queries go to
+# stderr, or to VISITOR_APPS_SLOW_QUERY_LOG when that names a file; the
+# stats are written as JSON to VISITOR_APPS_STATS_FILE on demand and on exit.
+ENABLED = os.environ.get('VISITOR_APPS_INSTRUMENT', '') not in ('', '0')
+SLOW_QUERY_MS = float(os.environ.get('VISITOR_APPS_SLOW_QUERY_MS', 100))
+SLOW_QUERY_LOG = os.environ.get('VISITOR_APPS_SLOW_QUERY_LOG')
+STATS_FILE = os.environ.get('VISITOR_APPS_STATS_FILE')
+
+# Histogram bucket upper bounds in milliseconds, doubling from 0.1 ms to
+# about 105 s; anything slower lands in a final overflow bucket.
+HISTOGRAM_BOUNDS_MS = [0.1 * 2 ** power for power in range(21)]
+MAX_LOGGED_PARAMS = 200
+
+slow_query_log = logging.getLogger('visitor_apps.slow_queries')
+if ENABLED and SLOW_QUERY_LOG:
+    slow_query_handler = logging.FileHandler(SLOW_QUERY_LOG, encoding='utf-8')
+    slow_query_handler.setFormatter(logging.Formatter('%(asctime)s %(threadName)s %(message)s'))
+    slow_query_log.addHandler(slow_query_handler)
+    slow_query_log.propagate = False
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, milliseconds):
+        self.buckets[bisect_left(HISTOGRAM_BOUNDS_MS, milliseconds)] += 1
+        self.count += 1
+        self.total_ms += milliseconds
+        self.max_ms = max(self.max_ms, milliseconds)
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the requested rank, capped at the
+        # largest value seen, so the estimate is at most one bucket (2x) high.
+        rank = fraction * self.count
+        seen = 0
+        for position, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(HISTOGRAM_BOUNDS_MS[position], self.max_ms) if position < len(HISTOGRAM_BOUNDS_MS) else self.max_ms
+        return 0.0
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.5), 3),
+            'p90_ms': round(self.percentile(0.9), 3),
+            'p99_ms': round(self.percentile(0.99), 3),
+            'max_ms': round(self.max_ms, 3),
+            'buckets_ms': {f'{bound:g}' if position < len(HISTOGRAM_BOUNDS_MS) else 'inf': count for position, (bound, count) in enumerate(zip(HISTOGRAM_BOUNDS_MS + [None], self.buckets)) if count},
+        }
+
+
+class OperationStats:
+    # Latency histograms keyed by operation name, shared by the GUI thread
+    # and database threads.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.started = time.strftime('%Y-%m-%d %H:%M:%S')
+
+    def record(self, operation, seconds):
+        with self.lock:
+            histogram = self.histograms.get(operation)
+            if histogram is None:
+                histogram = self.histograms[operation] = LatencyHistogram()
+            histogram.add(seconds * 1000)
+
+    def snapshot(self):
+        with self.lock:
+            operations = {operation: histogram.summary() for operation, histogram in sorted(self.histograms.items())}
+        return {'since': self.started, 'slow_query_ms': SLOW_QUERY_MS, 'operations': operations}
+
+    def report(self):
+        lines = [f'{"operation":<22}{"count":>8}{"mean":>10}{"p50":>10}{"p99":>10}{"max":>10}  (ms)']
+        for operation, summary in self.snapshot()['operations'].items():
+            lines.append(f'{operation:<22}{summary["count"]:>8}{summary["mean_ms"]:>10.1f}{summary["p50_ms"]:>10.1f}{summary["p99_ms"]:>10.1f}{summary["max_ms"]:>10.1f}')
+        return '\n'.join(lines)
+
+    def dump(self, file_name):
+        with open(file_name, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file, indent=2)
+
+
+stats = OperationStats()
+
+
+def record(operation, seconds):
+    if ENABLED:
+        stats.record(operation, seconds)
+
+
+def statement_kind(sql):
+    words = sql.split(None, 1)
+    return f'query.{words[0].lower()}' if words else 'query'
+
+
+def log_slow_query(connection, sql, params, milliseconds):
+    try:
+        cursor = sqlite3.Connection.cursor(connection)
+        plan = '\n'.join(f'    {row[3]}' for row in cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+    except sqlite3.Error as error:
+        plan = f'    (no plan: {error})'
+    shown_params = repr(params)
+    if len(shown_params) > MAX_LOGGED_PARAMS:
+        shown_params = shown_params[:MAX_LOGGED_PARAMS] + '...'
+    slow_query_log.warning('slow query (%.1f ms): %s\n  params: %s\n  plan:\n%s', milliseconds, ' '.join(sql.split()), shown_params, plan)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    # Times each statement from execute() until its rows are exhausted (or
+    # the next statement starts), so lazily stepped SELECTs are measured
+    # in full, and logs any that exceed SLOW_QUERY_MS with their query plan.
+    sql = None
+    params = ()
+    elapsed = 0.0
+
+    def execute(self, sql, params=()):
+        self.finish()
+        self.sql = sql
+        self.params = params
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self.elapsed = time.perf_counter() - started
+            if self.description is None:
+                self.finish()
+
+    def executemany(self, sql, seq_of_params):
+        self.finish()
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            stats.record(statement_kind(sql), time.perf_counter() - started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self.elapsed += time.perf_counter() - started
+        if row is None:
+            self.finish()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self.elapsed += time.perf_counter() - started
+        if len(rows) < size:
+            self.finish()
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self.elapsed += time.perf_counter() - started
+        self.finish()
+        return rows
+
+    def close(self):
+        self.finish()
+        super().close()
+
+    def __del__(self):
+        # A caller that stops after fetchone() never exhausts the statement;
+        # it is accounted for when the cursor goes away instead.
+        self.finish()
+
+    def finish(self):
+        if self.sql is None:
+            return
+        sql = self.sql
+        self.sql = None
+        stats.record(statement_kind(sql), self.elapsed)
+        milliseconds = self.elapsed * 1000
+        if milliseconds >= SLOW_QUERY_MS:
+            log_slow_query(self.connection, sql, self.params, milliseconds)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    # Connection.execute() goes through cursor(), so shortcut calls are
+    # instrumented as well.
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
@@ -0,0 +1,58 @@
+import logging
+import os
+from logging.handlers import RotatingFileHandler
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QPlainTextEdit
+
+# The panel keeps the last LOG_MAX_ENTRIES lines; older ones are dropped as
+# new ones arrive. Set VISITOR_APPS_LOG_DIR to also keep the full history in
+# <app>.log there, rotated at LOG_FILE_MAX_BYTES with LOG_FILE_BACKUPS old
+# files kept.
+LOG_MAX_ENTRIES = int(os.environ.get('VISITOR_APPS_LOG_MAX_ENTRIES', 1000))
+LOG_DIR = os.environ.get('VISITOR_APPS_LOG_DIR')
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+
+
+def history_logger(app_name):
+    logger = logging.getLogger(f'visitor_apps.history.{app_name}')
+    if LOG_DIR and not logger.handlers:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        handler = RotatingFileHandler(os.path.join(LOG_DIR, f'{app_name}.log'), maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+class LogPanel(QPlainTextEdit):
+    # Drop-in replacement for the read-only QTextEdit log: append() queues
+    # the line and all lines queued during one pass of the event loop are
+    # added together, so a burst of events costs one layout and repaint.
+    def __init__(self, app_name, parent=None, max_entries=LOG_MAX_ENTRIES):
+        super().__init__(parent)
+
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_entries)
+        self.pending = []
+        self.history = history_logger(app_name) if LOG_DIR else None
+
+    def append(self, text):
+        if self.history is not None:
+            self.history.info(text)
+        if not self.pending:
+            QTimer.singleShot(0, self.flush)
+        self.pending.append(text)
+
+    def flush(self):
+        if not self.pending:
+            return
+        # appendPlainText keeps the view pinned to the bottom if it was there.
+        self.appendPlainText('\n'.join(self.pending))
+        self.pending = []
+
+    def toPlainText(self):
+        self.flush()
+        return super().toPlainText()
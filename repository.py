@@ -0,0 +1,72 @@
+from collections import namedtuple
+
+from csv_export import export_table
+from search_index import search_filter
+from storage import (
+    ATTENDANCE_INSERT, VISITOR_INSERT, CUSTOMER_INSERT, create_attendance_table, create_visitors_table, create_customers_table,
+    format_amount, import_attendance, import_visitors, import_customers
+)
+
+# One Repository per entity holds everything the windows, the check-in
+# service and the tools need to know about its table. Statement text never
+# carries values, which are always bound as parameters, so each connection's
+# statement cache prepares a statement once and reuses it from then on.
+#
+# Pages of rows stay the plain tuples sqlite3 returns and cells are only
+# formatted when painted; benchmarks/bench_records.py shows any row factory
+# costing 1.5-3.5x the fetch time for no memory saving. Named records are
+# made on demand, for the few places that want fields by name.
+AttendanceRecord = namedtuple('AttendanceRecord', ['id', 'name', 'timestamp'])
+VisitRecord = namedtuple('VisitRecord', ['id', 'name', 'mobile', 'timestamp', 'reason'])
+CustomerRecord = namedtuple('CustomerRecord', ['id', 'name', 'contact', 'item', 'amount_cents'])
+
+
+class Repository:
+    def __init__(self, database, table, record_type, headers, insert_sql, create_table, import_file, search_columns, formatters=None, export_columns=None, sort_keys=None):
+        self.database = database
+        self.table = table
+        self.record_type = record_type
+        self.columns = list(record_type._fields)
+        self.fields = self.columns[1:]
+        self.headers = list(headers)
+        self.insert_sql = insert_sql
+        self.create_table = create_table
+        self.import_file = import_file
+        self.search_columns = list(search_columns)
+        self.formatters = dict(formatters or {})
+        self.export_columns = list(export_columns or self.columns)
+        # Index columns each sortable column pages by (SqliteTableModel).
+        self.sort_keys = dict(sort_keys or {})
+
+        self.select_sql = f'SELECT {", ".join(self.columns)} FROM {table}'
+
+    def record(self, row):
+        return None if row is None else self.record_type._make(row)
+
+    def search(self, job, term, indexed, limit):
+        # Newest first, for callers that want the latest matches only.
+        sql = self.select_sql
+        params = ()
+        if term:
+            where, params = search_filter(self.table, self.search_columns, term, indexed)
+            sql += f' WHERE ({where})'
+        return job.connection.execute(sql + ' ORDER BY id DESC LIMIT ?', (*params, limit)).fetchall()
+
+    def export(self, job, file_name):
+        return export_table(job, self.table, self.export_columns, self.headers, file_name)
+
+
+ATTENDANCE = Repository(
+    'attendance.db', 'attendance', AttendanceRecord, ['ID', 'Name', 'Timestamp'], ATTENDANCE_INSERT,
+    create_attendance_table, import_attendance, ['name'], sort_keys={'name': ['name', 'timestamp']}
+)
+VISITORS = Repository(
+    'visitors.db', 'visitors', VisitRecord, ['ID', 'Name', 'Mobile', 'Timestamp', 'Reason'], VISITOR_INSERT,
+    create_visitors_table, import_visitors, ['name', 'mobile', 'reason'],
+    sort_keys={'name': ['name', 'timestamp'], 'mobile': ['mobile', 'timestamp']}
+)
+CUSTOMERS = Repository(
+    'customers.db', 'customers', CustomerRecord, ['ID', 'Name', 'Contact', 'Item', 'Amount'], CUSTOMER_INSERT,
+    create_customers_table, import_customers, ['name', 'contact', 'item'], formatters={4: format_amount},
+    export_columns=['id', 'name', 'contact', 'item', "printf('%d.%02d', amount_cents / 100, amount_cents % 100)"]
+)
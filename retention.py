@@ -0,0 +1,225 @@
+import sys
+import argparse
+import os
+import re
+from datetime import datetime, timedelta
+
+from bulk_import import ConsoleJob
+from database import DEFAULT_DB_DIR, DB_DIR_ENV, connect, database_path
+from date_range import TIMESTAMP_FORMAT
+from repository import ATTENDANCE, VISITORS, CUSTOMERS
+
+# Records older than a cutoff move out of the live table into one archive
+# database per month, <table>-archive-YYYY-MM.db next to the live one, with
+# the same schema (search index included). Date-range views that reach
+# before the cutoff ATTACH the months they need; SQLite allows ten attached
+# databases, so at most MAX_ATTACHED_ARCHIVES months are searched at once.
+ARCHIVE_BATCH_SIZE = 5000
+ARCHIVE_DEFAULT_DAYS = 90
+MAX_ATTACHED_ARCHIVES = 8
+VACUUM_PAGES_PER_STEP = 1024
+
+ARCHIVED_TABLES = {repository.table: repository for repository in [ATTENDANCE, VISITORS]}
+
+
+class ArchiveCancelled(Exception):
+    pass
+
+
+def create_archive_state(connection):
+    connection.execute('CREATE TABLE IF NOT EXISTS archive_state (table_name TEXT PRIMARY KEY, archived_until TEXT NOT NULL)')
+    connection.commit()
+
+
+def archived_until(job, table):
+    # Latest timestamp moved to an archive so far, or None; ranges starting
+    # after it can be served from the live table alone.
+    create_archive_state(job.connection)
+    row = job.connection.execute('SELECT archived_until FROM archive_state WHERE table_name = ?', (table,)).fetchone()
+    return row[0] if row else None
+
+
+def archive_path(table, month):
+    return database_path(f'{table}-archive-{month}.db')
+
+
+def archive_months(table):
+    directory = os.path.dirname(archive_path(table, '0000-00'))
+    pattern = re.compile(rf'^{re.escape(table)}-archive-(\d{{4}}-\d{{2}})\.db$')
+    return sorted(match.group(1) for match in map(pattern.match, os.listdir(directory)) if match)
+
+
+def next_month(month):
+    year, number = map(int, month.split('-'))
+    return f'{year + number // 12:04d}-{number % 12 + 1:02d}'
+
+
+def archive_records(job, table, cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    # Moves rows with timestamp < cutoff into their month's archive, a batch
+    # at a time. Each batch is first committed to the archive (INSERT OR
+    # IGNORE on the original id) and then deleted from the live table in a
+    # second transaction: WAL commits are not atomic across attached
+    # databases, and this order means a crash can only leave rows in both
+    # places, which the next run cleans up, never in neither. archive_state
+    # advances with every batch, so a cancelled run leaves its archived rows
+    # reachable too.
+    repository = ARCHIVED_TABLES[table]
+    columns = ', '.join(repository.columns)
+    connection = job.connection
+    cursor = connection.cursor()
+    create_archive_state(connection)
+    cursor.execute('CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)')
+
+    cursor.execute(f'SELECT COUNT(*) FROM {table} WHERE timestamp < ?', (cutoff,))
+    total = cursor.fetchone()[0]
+    moved = 0
+
+    while True:
+        cursor.execute(f'SELECT MIN(timestamp) FROM {table} WHERE timestamp < ?', (cutoff,))
+        oldest = cursor.fetchone()[0]
+        if oldest is None:
+            break
+        month = oldest[:7]
+        month_end = min(f'{next_month(month)}-01 00:00:00', cutoff)
+
+        archive = connect(archive_path(table, month))
+        repository.create_table(ConsoleJob(archive))
+        archive.close()
+
+        cursor.execute('ATTACH DATABASE ? AS archive_target', (archive_path(table, month),))
+        try:
+            while True:
+                if job.is_cancelled():
+                    raise ArchiveCancelled(table)
+
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute('DELETE FROM temp.archive_batch')
+                cursor.execute(f'INSERT INTO temp.archive_batch (id) SELECT id FROM main.{table} WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp LIMIT ?', (f'{month}-01 00:00:00', month_end, batch_size))
+                count = cursor.rowcount
+                cursor.execute(f'INSERT OR IGNORE INTO archive_target.{table} ({columns}) SELECT {columns} FROM main.{table} WHERE id IN (SELECT id FROM temp.archive_batch)')
+                connection.commit()
+                if count == 0:
+                    break
+
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute(f'''
+                    INSERT INTO archive_state (table_name, archived_until)
+                    SELECT ?, MAX(timestamp) FROM main.{table} WHERE id IN (SELECT id FROM temp.archive_batch)
+                    ON CONFLICT (table_name) DO UPDATE SET archived_until = MAX(archived_until, excluded.archived_until)
+                ''', (table,))
+                cursor.execute(f'DELETE FROM main.{table} WHERE id IN (SELECT id FROM temp.archive_batch)')
+                connection.commit()
+                moved += count
+                job.report_progress(min(100, moved * 100 // total) if total else 100)
+        finally:
+            if connection.in_transaction:
+                connection.rollback()
+            cursor.execute('DETACH DATABASE archive_target')
+
+    incremental_vacuum(connection)
+    job.report_progress(100)
+    return moved
+
+
+def attach_archives(job, table, start, end):
+    # Attaches the archive months overlapping [start, end] (the most recent
+    # MAX_ATTACHED_ARCHIVES of them) and (re)creates the temp view
+    # <table>_with_archives over the live table and those archives. Returns
+    # (view name, months attached, months left out).
+    columns = ', '.join(ARCHIVED_TABLES[table].columns)
+    view = f'{table}_with_archives'
+    connection = job.connection
+    cursor = connection.cursor()
+
+    cursor.execute(f'DROP VIEW IF EXISTS temp.{view}')
+    for _, schema, _ in cursor.execute('PRAGMA database_list').fetchall():
+        if schema.startswith('archive_'):
+            cursor.execute(f'DETACH DATABASE {schema}')
+
+    months = [month for month in archive_months(table) if start[:7] <= month <= end[:7]]
+    attached = months[-MAX_ATTACHED_ARCHIVES:]
+    selects = [f'SELECT {columns} FROM main.{table}']
+    for month in attached:
+        schema = 'archive_' + month.replace('-', '_')
+        cursor.execute(f'ATTACH DATABASE ? AS {schema}', (archive_path(table, month),))
+        selects.append(f'SELECT {columns} FROM {schema}.{table}')
+    cursor.execute(f'CREATE TEMP VIEW {view} AS ' + ' UNION ALL '.join(selects))
+    return view, len(attached), len(months) - len(attached)
+
+
+def clear_table(job, table, after_clear=None):
+    # Empties table in one transaction without visiting its rows: with the
+    # triggers dropped, DELETE without WHERE takes SQLite's truncate path,
+    # and the external-content search index is emptied with 'delete-all'.
+    # after_clear(connection) resets anything else the triggers maintain.
+    connection = job.connection
+    cursor = connection.cursor()
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table,))
+    triggers = cursor.fetchall()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f'{table}_fts',))
+    indexed = cursor.fetchone() is not None
+
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        for name, _ in triggers:
+            cursor.execute(f'DROP TRIGGER {name}')
+        cursor.execute(f'DELETE FROM {table}')
+        if indexed:
+            cursor.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('delete-all')")
+        if after_clear is not None:
+            after_clear(connection)
+        for _, sql in triggers:
+            cursor.execute(sql)
+        connection.commit()
+    finally:
+        if connection.in_transaction:
+            connection.rollback()
+
+    incremental_vacuum(connection)
+
+
+def incremental_vacuum(connection, convert=False):
+    # Returns free pages to the file system a step at a time, so writers can
+    # get in between steps. Databases created before auto_vacuum was turned
+    # on need one full VACUUM (convert=True) before this has any effect.
+    cursor = connection.cursor()
+    if cursor.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        if not convert:
+            return 0
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+
+    freed = 0
+    while True:
+        free_pages = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+        if not free_pages:
+            return freed
+        cursor.execute(f'PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP})').fetchall()
+        freed += min(free_pages, VACUUM_PAGES_PER_STEP)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Archive old attendance and visitor records and reclaim space')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    archive_parser = subparsers.add_parser('archive', help='move records older than a cutoff into monthly archive databases')
+    archive_parser.add_argument('table', choices=list(ARCHIVED_TABLES))
+    archive_parser.add_argument('--older-than-days', type=int, default=ARCHIVE_DEFAULT_DAYS)
+    archive_parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+    vacuum_parser = subparsers.add_parser('vacuum', help='reclaim free pages incrementally')
+    vacuum_parser.add_argument('table', choices=list(ARCHIVED_TABLES) + [CUSTOMERS.table])
+    vacuum_parser.add_argument('--convert', action='store_true', help='switch an older database to incremental auto-vacuum (runs one full VACUUM)')
+    args = parser.parse_args()
+
+    print(f'Database directory: {os.environ.get(DB_DIR_ENV, DEFAULT_DB_DIR)}', file=sys.stderr)
+    if args.command == 'archive':
+        repository = ARCHIVED_TABLES[args.table]
+        job = ConsoleJob(connect(repository.database))
+        repository.create_table(job)
+        cutoff = (datetime.now() - timedelta(days=args.older_than_days)).strftime(TIMESTAMP_FORMAT)
+        moved = archive_records(job, args.table, cutoff, args.batch_size)
+        print(file=sys.stderr)
+        print(f'Archived {moved} {args.table} records older than {cutoff}')
+    else:
+        repository = ARCHIVED_TABLES.get(args.table, CUSTOMERS)
+        freed = incremental_vacuum(connect(repository.database), args.convert)
+        print(f'Freed {freed} pages')
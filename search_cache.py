@@ -0,0 +1,50 @@
+from collections import OrderedDict
+
+SEARCH_CACHE_ENTRIES = 32
+SEARCH_CACHE_MAX_ROWS = 5000
+SEARCH_DEBOUNCE_MS = 300
+
+
+class SearchCache:
+    # LRU cache of complete search result sets. Searches are substring
+    # matches, so the results for a term are always a subset of the results
+    # for any cached term it contains; those are filtered here instead of
+    # going back to SQLite.
+    def __init__(self, search_columns, capacity=SEARCH_CACHE_ENTRIES, max_rows=SEARCH_CACHE_MAX_ROWS):
+        self.search_columns = list(search_columns)
+        self.capacity = capacity
+        self.max_rows = max_rows
+        self.entries = OrderedDict()
+
+    def get(self, term):
+        key = term.lower()
+        rows = self.entries.get(key)
+        if rows is not None:
+            self.entries.move_to_end(key)
+            return rows
+
+        superset = None
+        for cached_key in reversed(self.entries):
+            if cached_key in key and (superset is None or len(self.entries[cached_key]) < len(superset)):
+                superset = self.entries[cached_key]
+        if superset is None:
+            return None
+
+        rows = [row for row in superset if self.matches(row, key)]
+        self.put(term, rows)
+        return rows
+
+    def put(self, term, rows):
+        if len(rows) > self.max_rows:
+            return
+        key = term.lower()
+        self.entries[key] = list(rows)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def matches(self, row, key):
+        return any(key in str(row[column]).lower() for column in self.search_columns)
+
+    def clear(self):
+        self.entries.clear()
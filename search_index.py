@@ -0,0 +1,73 @@
+import sqlite3
+
+# Trigram tokens need at least three characters; shorter terms fall back to LIKE.
+MIN_INDEXED_TERM_LENGTH = 3
+
+
+def create_search_index(connection, table, columns):
+    # Builds an external-content FTS5 trigram index over the given columns of
+    # table, kept in sync by triggers. The index is populated from the
+    # existing rows the first time it is created. Returns False when this
+    # SQLite build has no FTS5/trigram support.
+    fts_table = f'{table}_fts'
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+
+    cursor = connection.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,))
+    existed = cursor.fetchone() is not None
+
+    try:
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+                {column_list}, content='{table}', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return False
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_update AFTER UPDATE OF {column_list} ON {table} BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+    ''')
+
+    if not existed:
+        cursor.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+    connection.commit()
+    return True
+
+
+def search_filter(table, columns, term, indexed=True):
+    # Returns a (where, params) pair matching rows whose columns contain term,
+    # suitable for SqliteTableModel.set_filter.
+    if indexed and len(term) >= MIN_INDEXED_TERM_LENGTH:
+        query = '{' + ' '.join(columns) + '} : "' + term.replace('"', '""') + '"'
+        return f'id IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)', (query,)
+
+    pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    where = ' OR '.join(f"{column} LIKE ? ESCAPE '\\'" for column in columns)
+    return where, (pattern,) * len(columns)
+
+
+def index_rows_after(connection, table, columns, after_id):
+    # Adds rows with id > after_id to the search index in one statement, for
+    # bulk loads that run with the sync triggers suspended.
+    fts_table = f'{table}_fts'
+    column_list = ', '.join(columns)
+    cursor = connection.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,))
+    if cursor.fetchone() is not None:
+        cursor.execute(f'INSERT INTO {fts_table} (rowid, {column_list}) SELECT id, {column_list} FROM {table} WHERE id > ?', (after_id,))
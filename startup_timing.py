@@ -0,0 +1,54 @@
+import time
+
+# Each app imports this module before Qt and its own modules, so STARTED is
+# as close to process start as the scripts can measure.
+STARTED = time.perf_counter()
+
+import json
+import sys
+
+from PyQt5.QtCore import QEvent, QObject
+
+STARTUP_MARKS = ['imports_ms', 'first_paint_ms', 'first_rows_ms']
+
+
+class StartupTimer(QObject):
+    # Records milliseconds from STARTED to the end of the imports, the
+    # window's first paint and the first page of rows (or an empty table)
+    # arriving, and reports them as one JSON line once all three are known:
+    # to stderr when output is '-', otherwise appended to the file named.
+    def __init__(self, app_name, output=None, parent=None):
+        super().__init__(parent)
+
+        self.app_name = app_name
+        self.output = output
+        self.marks = {}
+
+    def mark(self, name):
+        if name in self.marks:
+            return
+        self.marks[name] = round((time.perf_counter() - STARTED) * 1000, 1)
+        if self.output and all(mark in self.marks for mark in STARTUP_MARKS):
+            self.report()
+
+    def watch(self, window, model):
+        window.installEventFilter(self)
+        model.rowsInserted.connect(self.rows_arrived)
+        model.fully_loaded.connect(self.rows_arrived)
+
+    def rows_arrived(self, *_):
+        self.mark('first_rows_ms')
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint:
+            watched.removeEventFilter(self)
+            self.mark('first_paint_ms')
+        return False
+
+    def report(self):
+        line = json.dumps({'app': self.app_name, 'time': time.strftime('%Y-%m-%d %H:%M:%S'), **self.marks})
+        if self.output == '-':
+            print(line, file=sys.stderr)
+        else:
+            with open(self.output, 'a', encoding='utf-8') as file:
+                file.write(line + '\n')
@@ -0,0 +1,510 @@
+from decimal import Decimal
+
+from bulk_import import import_csv
+from date_range import normalize_timestamp
+from search_index import create_search_index, index_rows_after
+
+# Schema, validation and insert statements shared by the desktop apps and the
+# headless check-in service. Nothing here depends on Qt.
+ATTENDANCE_INSERT = 'INSERT INTO attendance (name, timestamp) VALUES (?, ?)'
+VISITOR_INSERT = 'INSERT INTO visitors (name, mobile, timestamp, reason) VALUES (?, ?, ?, ?)'
+CUSTOMER_INSERT = 'INSERT INTO customers (name, contact, item, amount_cents) VALUES (?, ?, ?, ?)'
+CUSTOMER_AMOUNT_UPDATE = 'UPDATE customers SET amount_cents = ? WHERE id = ?'
+# One purchase of at most 10 billion, so that totals over millions of
+# purchases still fit in an SQLite INTEGER.
+MAX_AMOUNT_CENTS = 10 ** 12
+
+
+def create_attendance_table(job):
+    cursor = job.connection.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_timestamp ON attendance (timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attendance_name_timestamp ON attendance (name, timestamp)')
+    job.connection.commit()
+    create_attendance_daily(job.connection)
+    create_change_log(job.connection, 'attendance', ['name', 'timestamp'])
+
+    return create_search_index(job.connection, 'attendance', ['name'])
+
+
+def create_change_log(connection, table, columns):
+    # Notes the id of every edited row so sync.py can pick up changes to
+    # rows it has already copied; new rows it finds by id alone.
+    cursor = connection.cursor()
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS {table}_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, row_id INTEGER NOT NULL)')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_changes_update AFTER UPDATE OF {', '.join(columns)} ON {table} BEGIN
+            INSERT INTO {table}_changes (row_id) VALUES (new.id);
+        END
+    ''')
+    connection.commit()
+
+
+def create_attendance_daily(connection):
+    # One row per person per day with their first and last punch, maintained
+    # by triggers so payroll reports never scan the raw log. A punch that is
+    # removed recomputes its day from idx_attendance_name_timestamp.
+    cursor = connection.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'attendance_daily'")
+    existed = cursor.fetchone() is not None
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance_daily (
+            day TEXT NOT NULL,
+            name TEXT NOT NULL,
+            first_in TEXT NOT NULL,
+            last_out TEXT NOT NULL,
+            punch_count INTEGER NOT NULL,
+            PRIMARY KEY (day, name)
+        ) WITHOUT ROWID
+    ''')
+
+    add_punch = '''
+        INSERT INTO attendance_daily (day, name, first_in, last_out, punch_count) VALUES (substr(new.timestamp, 1, 10), new.name, new.timestamp, new.timestamp, 1)
+            ON CONFLICT (day, name) DO UPDATE SET first_in = MIN(first_in, excluded.first_in), last_out = MAX(last_out, excluded.last_out), punch_count = punch_count + 1;
+    '''
+    remove_punch = '''
+        DELETE FROM attendance_daily WHERE day = substr(old.timestamp, 1, 10) AND name = old.name AND punch_count = 1;
+        UPDATE attendance_daily SET
+            punch_count = punch_count - 1,
+            first_in = (SELECT MIN(timestamp) FROM attendance WHERE name = old.name AND timestamp BETWEEN day || ' 00:00:00' AND day || ' 23:59:59'),
+            last_out = (SELECT MAX(timestamp) FROM attendance WHERE name = old.name AND timestamp BETWEEN day || ' 00:00:00' AND day || ' 23:59:59')
+        WHERE day = substr(old.timestamp, 1, 10) AND name = old.name;
+    '''
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS attendance_daily_insert AFTER INSERT ON attendance BEGIN {add_punch} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS attendance_daily_delete AFTER DELETE ON attendance BEGIN {remove_punch} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS attendance_daily_update AFTER UPDATE OF name, timestamp ON attendance BEGIN {remove_punch} {add_punch} END')
+    connection.commit()
+
+    if not existed:
+        add_attendance_daily(connection, 0)
+        connection.commit()
+
+
+def add_attendance_daily(connection, after_id):
+    # Folds rows with id > after_id into the daily summaries in one pass, for
+    # bulk loads that run with the triggers dropped.
+    connection.execute('''
+        INSERT INTO attendance_daily (day, name, first_in, last_out, punch_count)
+        SELECT substr(timestamp, 1, 10), name, MIN(timestamp), MAX(timestamp), COUNT(*) FROM attendance WHERE id > ? GROUP BY 1, 2
+        ON CONFLICT (day, name) DO UPDATE SET
+            first_in = MIN(first_in, excluded.first_in), last_out = MAX(last_out, excluded.last_out), punch_count = punch_count + excluded.punch_count
+    ''', (after_id,))
+
+
+def reset_attendance_daily(connection):
+    connection.execute('DELETE FROM attendance_daily')
+
+
+def attendance_month_report(job, month, archive_file=None):
+    # Returns [(name, days present, punches, seconds from first to last punch
+    # summed over the days)] for a 'YYYY-MM' month, read from the daily
+    # summaries. A month that has been archived is split between the live
+    # database and archive_file, whose summaries are merged in per day.
+    connection = job.connection
+    cursor = connection.cursor()
+    bounds = (f'{month}-01', f'{month}-31')
+    daily = 'SELECT day, name, first_in, last_out, punch_count FROM main.attendance_daily WHERE day BETWEEN ? AND ?'
+    params = list(bounds)
+    if archive_file is not None:
+        cursor.execute('ATTACH DATABASE ? AS report_archive', (archive_file,))
+        daily = f'''
+            SELECT day, name, MIN(first_in) AS first_in, MAX(last_out) AS last_out, SUM(punch_count) AS punch_count FROM (
+                {daily} UNION ALL SELECT day, name, first_in, last_out, punch_count FROM report_archive.attendance_daily WHERE day BETWEEN ? AND ?
+            ) GROUP BY day, name
+        '''
+        params.extend(bounds)
+
+    try:
+        cursor.execute(f'''
+            SELECT name, COUNT(*), SUM(punch_count), SUM(CAST(ROUND((julianday(last_out) - julianday(first_in)) * 86400) AS INTEGER))
+            FROM ({daily}) GROUP BY name ORDER BY name
+        ''', params)
+        return cursor.fetchall()
+    finally:
+        if archive_file is not None:
+            cursor.execute('DETACH DATABASE report_archive')
+
+
+def parse_attendance_row(name, timestamp):
+    name = name.strip()
+    if not name:
+        raise ValueError('name is empty')
+    return name, normalize_timestamp(timestamp)
+
+
+def index_attendance_rows(connection, after_id):
+    index_rows_after(connection, 'attendance', ['name'], after_id)
+    add_attendance_daily(connection, after_id)
+
+
+def import_attendance(job, file_name):
+    return import_csv(job, 'attendance', ['name', 'timestamp'], parse_attendance_row, file_name, after_batch=index_attendance_rows)
+
+
+def create_visitors_table(job):
+    cursor = job.connection.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS visitors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            mobile TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            reason TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_visitors_timestamp ON visitors (timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_visitors_name_timestamp ON visitors (name, timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_visitors_mobile_timestamp ON visitors (mobile, timestamp)')
+    # Header sorts page through an index in order; the NOCASE copy serves the
+    # case-insensitive prefix filter on reason (see column_filters).
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_visitors_reason ON visitors (reason)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_visitors_reason_nocase ON visitors (reason COLLATE NOCASE)')
+    job.connection.commit()
+    create_visitor_directory(job.connection)
+    create_change_log(job.connection, 'visitors', ['name', 'mobile', 'timestamp', 'reason'])
+
+    return create_search_index(job.connection, 'visitors', ['name', 'mobile', 'reason'])
+
+
+# A visit that is older than the one on file (a back-dated entry or an
+# imported history) still counts but does not rename the visitor.
+VISITOR_DIRECTORY_MERGE = '''
+    name = CASE WHEN excluded.last_visit >= last_visit THEN excluded.name ELSE name END,
+    last_visit = MAX(last_visit, excluded.last_visit),
+    visit_count = visit_count + excluded.visit_count
+'''
+
+
+def create_visitor_directory(connection):
+    # One row per mobile number with the name from its latest visit and how
+    # many visits it has made. Only inserts maintain it: archiving old visits
+    # keeps their visitors on file, and clearing resets it explicitly.
+    cursor = connection.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'visitor_directory'")
+    existed = cursor.fetchone() is not None
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS visitor_directory (
+            mobile TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            last_visit TEXT NOT NULL,
+            visit_count INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS visitor_directory_insert AFTER INSERT ON visitors BEGIN
+            INSERT INTO visitor_directory (mobile, name, last_visit, visit_count) VALUES (new.mobile, new.name, new.timestamp, 1)
+                ON CONFLICT (mobile) DO UPDATE SET {VISITOR_DIRECTORY_MERGE};
+        END
+    ''')
+    connection.commit()
+
+    if not existed:
+        add_visitor_directory(connection, 0)
+        connection.commit()
+
+
+def add_visitor_directory(connection, after_id):
+    # With MAX() as the only aggregate SQLite takes the bare name column from
+    # the row holding the maximum, i.e. each number's latest visit.
+    connection.execute(f'''
+        INSERT INTO visitor_directory (mobile, name, last_visit, visit_count)
+        SELECT mobile, name, MAX(timestamp), COUNT(*) FROM visitors WHERE id > ? GROUP BY mobile
+        ON CONFLICT (mobile) DO UPDATE SET {VISITOR_DIRECTORY_MERGE}
+    ''', (after_id,))
+
+
+def reset_visitor_directory(connection):
+    connection.execute('DELETE FROM visitor_directory')
+
+
+def load_visitor_directory(job):
+    cursor = job.connection.cursor()
+    cursor.execute('SELECT mobile, name, last_visit, visit_count FROM visitor_directory')
+    return cursor.fetchall()
+
+
+def parse_visitor_row(name, mobile, timestamp, reason):
+    name = name.strip()
+    mobile = mobile.strip()
+    reason = reason.strip()
+    if not (name and mobile and reason):
+        raise ValueError('name, mobile and reason are required')
+    return name, mobile, normalize_timestamp(timestamp), reason
+
+
+def index_visitor_rows(connection, after_id):
+    index_rows_after(connection, 'visitors', ['name', 'mobile', 'reason'], after_id)
+    add_visitor_directory(connection, after_id)
+
+
+def import_visitors(job, file_name):
+    return import_csv(job, 'visitors', ['name', 'mobile', 'timestamp', 'reason'], parse_visitor_row, file_name, after_batch=index_visitor_rows)
+
+
+def parse_amount(text):
+    # Amounts are stored as integer cents; anything that is not a
+    # non-negative number with at most two decimal places, or that is at or
+    # above MAX_AMOUNT_CENTS, is rejected. quantize raises for numbers too
+    # long for the decimal context, such as 1e30.
+    try:
+        amount = Decimal(text)
+        if not amount.is_finite() or amount < 0 or amount != amount.quantize(Decimal('0.01')):
+            return None
+        amount_cents = int(amount * 100)
+    except ArithmeticError:
+        return None
+    if amount_cents >= MAX_AMOUNT_CENTS:
+        return None
+    return amount_cents
+
+
+def format_amount(cents):
+    return f'{cents // 100}.{cents % 100:02d}'
+
+
+def create_customers_table(job):
+    cursor = job.connection.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            contact TEXT NOT NULL,
+            item TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL
+        )
+    ''')
+    job.connection.commit()
+
+    cursor.execute('PRAGMA table_info(customers)')
+    if 'amount' in [column[1] for column in cursor.fetchall()]:
+        migrate_customer_amounts(job.connection)
+    # One index per sortable column, so a header sort costs a page fetch
+    # rather than a sort of the whole table; item also gets a NOCASE copy
+    # for its prefix filter, and amount_cents serves the amount range.
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_customers_name ON customers (name)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_customers_contact ON customers (contact)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_customers_item ON customers (item)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_customers_item_nocase ON customers (item COLLATE NOCASE)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_customers_amount ON customers (amount_cents)')
+    job.connection.commit()
+    create_customer_totals(job.connection)
+
+    return create_search_index(job.connection, 'customers', ['name', 'contact', 'item'])
+
+
+def migrate_customer_amounts(connection):
+    # Older databases stored amount as TEXT. Rebuild the table with integer
+    # cents, keeping ids and the AUTOINCREMENT sequence. Amounts are parsed
+    # with parse_amount, as new ones are; rows whose amount does not parse
+    # are moved, unchanged, to customers_unmigrated for someone to correct.
+    connection.create_function('parse_amount', 1, lambda amount: parse_amount(str(amount).strip()), deterministic=True)
+    cursor = connection.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'customers'")
+    sequence = cursor.fetchone()
+    cursor.execute('''
+        CREATE TABLE customers_migrated (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            contact TEXT NOT NULL,
+            item TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO customers_migrated (id, name, contact, item, amount_cents)
+        SELECT id, name, contact, item, parse_amount(amount) FROM customers WHERE parse_amount(amount) IS NOT NULL
+    ''')
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM customers WHERE parse_amount(amount) IS NULL)')
+    if cursor.fetchone()[0]:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS customers_unmigrated (
+                id INTEGER PRIMARY KEY,
+                name TEXT,
+                contact TEXT,
+                item TEXT,
+                amount TEXT
+            )
+        ''')
+        cursor.execute('''
+            INSERT OR REPLACE INTO customers_unmigrated (id, name, contact, item, amount)
+            SELECT id, name, contact, item, amount FROM customers WHERE parse_amount(amount) IS NULL
+        ''')
+    cursor.execute('DROP TABLE customers')
+    cursor.execute('ALTER TABLE customers_migrated RENAME TO customers')
+    if sequence is not None:
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'customers'", sequence)
+    connection.commit()
+
+
+def unmigrated_customer_count(job):
+    # Rows migrate_customer_amounts set aside, for the window to point out.
+    cursor = job.connection.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'customers_unmigrated'")
+    if cursor.fetchone() is None:
+        return 0
+    cursor.execute('SELECT COUNT(*) FROM customers_unmigrated')
+    return cursor.fetchone()[0]
+
+
+def create_customer_totals(connection):
+    # Running totals for the whole table, per customer name and per item,
+    # maintained by triggers so totals and charts never scan customers.
+    cursor = connection.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'customer_totals'")
+    existed = cursor.fetchone() is not None
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customer_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_cents INTEGER NOT NULL,
+            purchase_count INTEGER NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('PRAGMA table_info(customer_totals)')
+    if 'version' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE customer_totals ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customer_name_totals (
+            name TEXT PRIMARY KEY,
+            total_cents INTEGER NOT NULL,
+            purchase_count INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customer_item_totals (
+            item TEXT PRIMARY KEY,
+            total_cents INTEGER NOT NULL,
+            purchase_count INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+    add_purchase = '''
+        UPDATE customer_totals SET total_cents = total_cents + new.amount_cents, purchase_count = purchase_count + 1 WHERE id = 1;
+        INSERT INTO customer_name_totals (name, total_cents, purchase_count) VALUES (new.name, new.amount_cents, 1)
+            ON CONFLICT (name) DO UPDATE SET total_cents = total_cents + excluded.total_cents, purchase_count = purchase_count + 1;
+        INSERT INTO customer_item_totals (item, total_cents, purchase_count) VALUES (new.item, new.amount_cents, 1)
+            ON CONFLICT (item) DO UPDATE SET total_cents = total_cents + excluded.total_cents, purchase_count = purchase_count + 1;
+    '''
+    remove_purchase = '''
+        UPDATE customer_totals SET total_cents = total_cents - old.amount_cents, purchase_count = purchase_count - 1 WHERE id = 1;
+        UPDATE customer_name_totals SET total_cents = total_cents - old.amount_cents, purchase_count = purchase_count - 1 WHERE name = old.name;
+        DELETE FROM customer_name_totals WHERE name = old.name AND purchase_count = 0;
+        UPDATE customer_item_totals SET total_cents = total_cents - old.amount_cents, purchase_count = purchase_count - 1 WHERE item = old.item;
+        DELETE FROM customer_item_totals WHERE item = old.item AND purchase_count = 0;
+    '''
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_customer_name_totals_total ON customer_name_totals (total_cents)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_customer_item_totals_total ON customer_item_totals (total_cents)')
+
+    # version changes whenever the totals do, including bulk imports that
+    # update customer_totals directly, so charts can skip redundant redraws.
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS customer_totals_version AFTER UPDATE OF total_cents, purchase_count ON customer_totals BEGIN
+            UPDATE customer_totals SET version = version + 1 WHERE id = 1;
+        END
+    ''')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS customer_totals_insert AFTER INSERT ON customers BEGIN {add_purchase} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS customer_totals_delete AFTER DELETE ON customers BEGIN {remove_purchase} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS customer_totals_update AFTER UPDATE OF name, item, amount_cents ON customers BEGIN {remove_purchase} {add_purchase} END')
+    connection.commit()
+
+    if not existed:
+        rebuild_customer_totals(connection)
+        connection.commit()
+
+
+def rebuild_customer_totals(connection):
+    # Leaves committing to the caller, so a clear can reset the totals in
+    # the same transaction.
+    cursor = connection.cursor()
+    cursor.execute('SELECT COALESCE(MAX(version), 0) FROM customer_totals')
+    version = cursor.fetchone()[0]
+    cursor.execute('DELETE FROM customer_totals')
+    cursor.execute('DELETE FROM customer_name_totals')
+    cursor.execute('DELETE FROM customer_item_totals')
+    cursor.execute('INSERT INTO customer_totals (id, total_cents, purchase_count, version) SELECT 1, COALESCE(SUM(amount_cents), 0), COUNT(*), ? FROM customers', (version + 1,))
+    cursor.execute('INSERT INTO customer_name_totals (name, total_cents, purchase_count) SELECT name, SUM(amount_cents), COUNT(*) FROM customers GROUP BY name')
+    cursor.execute('INSERT INTO customer_item_totals (item, total_cents, purchase_count) SELECT item, SUM(amount_cents), COUNT(*) FROM customers GROUP BY item')
+
+
+def customer_chart_data(job, grouping, limit, known_version=None):
+    # Returns (version, [(label, total_cents)], other_cents) for the limit
+    # largest names or items and everything else lumped together, or None
+    # when the totals are still at known_version.
+    cursor = job.connection.cursor()
+    cursor.execute('SELECT version, total_cents FROM customer_totals WHERE id = 1')
+    version, total_cents = cursor.fetchone()
+    if version == known_version:
+        return None
+    cursor.execute(f'SELECT {grouping}, total_cents FROM customer_{grouping}_totals ORDER BY total_cents DESC LIMIT ?', (limit,))
+    rows = cursor.fetchall()
+    return version, rows, total_cents - sum(row[1] for row in rows)
+
+
+def parse_customer_row(name, contact, item, amount):
+    name = name.strip()
+    contact = contact.strip()
+    item = item.strip()
+    if not (name and contact and item):
+        raise ValueError('name, contact and item are required')
+    amount_cents = parse_amount(amount.strip())
+    if amount_cents is None:
+        raise ValueError(f'invalid amount {amount!r}')
+    return name, contact, item, amount_cents
+
+
+def add_imported_customers(connection, after_id):
+    index_rows_after(connection, 'customers', ['name', 'contact', 'item'], after_id)
+
+    cursor = connection.cursor()
+    cursor.execute('''
+        UPDATE customer_totals SET
+            total_cents = total_cents + (SELECT COALESCE(SUM(amount_cents), 0) FROM customers WHERE id > ?1),
+            purchase_count = purchase_count + (SELECT COUNT(*) FROM customers WHERE id > ?1)
+        WHERE id = 1
+    ''', (after_id,))
+    cursor.execute('''
+        INSERT INTO customer_name_totals (name, total_cents, purchase_count)
+        SELECT name, SUM(amount_cents), COUNT(*) FROM customers WHERE id > ? GROUP BY name
+        ON CONFLICT (name) DO UPDATE SET total_cents = total_cents + excluded.total_cents, purchase_count = purchase_count + excluded.purchase_count
+    ''', (after_id,))
+    cursor.execute('''
+        INSERT INTO customer_item_totals (item, total_cents, purchase_count)
+        SELECT item, SUM(amount_cents), COUNT(*) FROM customers WHERE id > ? GROUP BY item
+        ON CONFLICT (item) DO UPDATE SET total_cents = total_cents + excluded.total_cents, purchase_count = purchase_count + excluded.purchase_count
+    ''', (after_id,))
+
+
+def import_customers(job, file_name):
+    return import_csv(job, 'customers', ['name', 'contact', 'item', 'amount_cents'], parse_customer_row, file_name, after_batch=add_imported_customers)
+
+
+def commit_batch(job, statements):
+    # Runs every (sql, params) pair in one transaction, so the batch costs a
+    # single commit. Each statement gets its own savepoint: one failing row is
+    # rolled back and reported without losing the rest of the batch.
+    connection = job.connection
+    cursor = connection.cursor()
+    results = []
+    cursor.execute('BEGIN IMMEDIATE')
+    for sql, params in statements:
+        cursor.execute('SAVEPOINT queued_write')
+        try:
+            cursor.execute(sql, params)
+        except Exception as error:
+            cursor.execute('ROLLBACK TO queued_write')
+            results.append(error)
+        else:
+            results.append(cursor.lastrowid)
+        cursor.execute('RELEASE queued_write')
+    connection.commit()
+    return results
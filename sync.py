@@ -0,0 +1,226 @@
+import sys
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from bulk_import import ConsoleJob
+from database import connect
+from date_range import TIMESTAMP_FORMAT
+from repository import ATTENDANCE, VISITORS
+
+# Merges the attendance and visitor databases of several desks into one
+# central copy:
+#
+#     python sync.py --central /srv/central north=/mnt/north south=/mnt/south
+#
+# Each desk directory holds that desk's attendance.db and visitors.db. The
+# central databases are ordinary app databases with one extra column, uid
+# ('<site>:<desk id>'), unique per copied row, so they can be opened with
+# the apps themselves (VISITOR_APPS_DB_DIR=/srv/central) and rows entered
+# there directly simply have no uid.
+#
+# Per site and table, sync_state in the central database remembers the
+# highest desk id copied and the last change-log entry applied. A run reads
+# only rows above that id and rows edited since (see
+# storage.create_change_log), so it costs the day's delta rather than the
+# whole history. Rows are upserted on uid in batches, each committed
+# together with its watermark, so a run that stops part way resumes where it
+# left off and re-applying a batch changes nothing.
+#
+# A desk's <table>_changes log grows by one row per edit until a sync run
+# with --trim-changes deletes the entries it has applied. Only trim when a
+# desk feeds a single central copy; any other copy would miss those edits.
+SYNC_BATCH_SIZE = 5000
+SYNCED_TABLES = {repository.table: repository for repository in [ATTENDANCE, VISITORS]}
+
+
+class SyncError(Exception):
+    pass
+
+
+def prepare_central(job, repository):
+    connection = job.connection
+    repository.create_table(job)
+    cursor = connection.cursor()
+    cursor.execute(f'PRAGMA table_info({repository.table})')
+    if 'uid' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute(f'ALTER TABLE {repository.table} ADD COLUMN uid TEXT')
+    cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS idx_{repository.table}_uid ON {repository.table} (uid)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            site TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            last_id INTEGER NOT NULL,
+            last_change INTEGER NOT NULL,
+            synced_at TEXT NOT NULL,
+            PRIMARY KEY (site, table_name)
+        ) WITHOUT ROWID
+    ''')
+    connection.commit()
+
+
+def sync_state(connection, site, table):
+    row = connection.execute('SELECT last_id, last_change FROM sync_state WHERE site = ? AND table_name = ?', (site, table)).fetchone()
+    return row if row else (0, 0)
+
+
+def upsert_sql(repository):
+    # The WHERE keeps rows that are already up to date untouched, so their
+    # triggers do not fire again and rowcount counts real changes only.
+    fields = repository.fields
+    return f'''
+        INSERT INTO {repository.table} (uid, {', '.join(fields)}) VALUES (?, {', '.join('?' for _ in fields)})
+        ON CONFLICT (uid) DO UPDATE SET {', '.join(f'{field} = excluded.{field}' for field in fields)}
+        WHERE {' OR '.join(f'{field} IS NOT excluded.{field}' for field in fields)}
+    '''
+
+
+def open_source(path):
+    # Read-only, so copying can never write to a desk's database.
+    if not os.path.exists(path):
+        raise SyncError(f'{path} does not exist')
+    return sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+
+
+def trim_changes(central, path, site, table):
+    # Deletes the change-log entries the central copy has applied. seq is
+    # AUTOINCREMENT, so entries logged after this never reuse a trimmed seq.
+    last_change = sync_state(central, site, table)[1]
+    source = sqlite3.connect(path, timeout=30)
+    try:
+        if source.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f'{table}_changes',)).fetchone():
+            source.execute(f'DELETE FROM {table}_changes WHERE seq <= ?', (last_change,))
+            source.commit()
+    finally:
+        source.close()
+
+
+def sync_table(job, source, site, repository, batch_size=SYNC_BATCH_SIZE):
+    # Copies new and edited rows of one table from source into the central
+    # database behind job. Returns (rows read, rows inserted or changed).
+    central = job.connection
+    table = repository.table
+    columns = ', '.join(repository.columns)
+    insert = upsert_sql(repository)
+    last_id, last_change = sync_state(central, site, table)
+    total = read = applied = 0
+
+    def apply(rows, new_last_id, new_last_change):
+        nonlocal read, applied
+        cursor = central.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.executemany(insert, [(f'{site}:{row[0]}', *row[1:]) for row in rows])
+        applied += max(cursor.rowcount, 0)
+        cursor.execute('''
+            INSERT INTO sync_state (site, table_name, last_id, last_change, synced_at) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (site, table_name) DO UPDATE SET last_id = excluded.last_id, last_change = excluded.last_change, synced_at = excluded.synced_at
+        ''', (site, table, new_last_id, new_last_change, datetime.now().strftime(TIMESTAMP_FORMAT)))
+        central.commit()
+        read += len(rows)
+        job.report_progress(min(100, read * 100 // total))
+
+    # One read transaction, so both passes see the same snapshot of the desk.
+    source_cursor = source.cursor()
+    source_cursor.execute('BEGIN')
+    try:
+        # Ids are AUTOINCREMENT, so they are never reused, even after a
+        # clear; a sequence behind the watermark means a different file.
+        source_cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,))
+        row = source_cursor.fetchone()
+        if (row[0] if row else 0) < last_id:
+            raise SyncError(f'{site} {table}: the desk database is behind what was already synced; was it replaced?')
+
+        source_cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (f'{table}_changes',))
+        logged = source_cursor.fetchone() is not None
+        source_cursor.execute(f'SELECT COUNT(*) FROM {table} WHERE id > ?', (last_id,))
+        total = source_cursor.fetchone()[0]
+        if logged:
+            source_cursor.execute(f'SELECT COUNT(*) FROM {table}_changes WHERE seq > ?', (last_change,))
+            total += source_cursor.fetchone()[0]
+
+        # New rows, by id.
+        while True:
+            source_cursor.execute(f'SELECT {columns} FROM {table} WHERE id > ? ORDER BY id LIMIT ?', (last_id, batch_size))
+            rows = source_cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            apply(rows, last_id, last_change)
+
+        # Rows edited since the last run; desks without a change log only
+        # ever contribute new rows.
+        if logged:
+            while True:
+                source_cursor.execute(f'''
+                    SELECT changes.seq, {', '.join(f'{table}.{column}' for column in repository.columns)}
+                    FROM {table}_changes AS changes JOIN {table} ON {table}.id = changes.row_id
+                    WHERE changes.seq > ? ORDER BY changes.seq LIMIT ?
+                ''', (last_change, batch_size))
+                changed = source_cursor.fetchall()
+                if not changed:
+                    break
+                last_change = changed[-1][0]
+                apply([row[1:] for row in changed], last_id, last_change)
+    finally:
+        source.rollback()
+
+    return read, applied
+
+
+def sync_site(central_dir, site, desk_dir, tables, batch_size=SYNC_BATCH_SIZE, trim=False):
+    # Yields (site, table, rows read, rows changed, seconds) as each table
+    # finishes, so tables already synced are reported even if a later one
+    # fails. Paths are made absolute first: connect() would otherwise resolve
+    # a relative central directory against the app directory, not the CWD.
+    central_dir = os.path.abspath(central_dir)
+    desk_dir = os.path.abspath(desk_dir)
+    for table in tables:
+        repository = SYNCED_TABLES[table]
+        started = time.perf_counter()
+        path = os.path.join(desk_dir, repository.database)
+        central = connect(os.path.join(central_dir, repository.database))
+        try:
+            source = open_source(path)
+            try:
+                job = ConsoleJob(central)
+                prepare_central(job, repository)
+                read, applied = sync_table(job, source, site, repository, batch_size)
+            finally:
+                source.close()
+            if trim:
+                trim_changes(central, path, site, table)
+        finally:
+            central.close()
+        yield site, table, read, applied, time.perf_counter() - started
+
+
+def parse_source(text):
+    site, separator, desk_dir = text.partition('=')
+    if not separator or not site or ':' in site:
+        raise argparse.ArgumentTypeError(f'expected SITE=DIRECTORY with no ":" in SITE, got {text!r}')
+    return site, desk_dir
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Merge desk attendance and visitor databases into a central copy')
+    parser.add_argument('--central', required=True, help='directory holding the central databases')
+    parser.add_argument('sources', nargs='+', type=parse_source, metavar='SITE=DIRECTORY', help='a desk directory and the site name its rows are tagged with')
+    parser.add_argument('--tables', nargs='+', choices=list(SYNCED_TABLES), default=list(SYNCED_TABLES))
+    parser.add_argument('--batch-size', type=int, default=SYNC_BATCH_SIZE)
+    parser.add_argument('--trim-changes', action='store_true', help="delete applied entries from each desk's change log; only when a desk feeds this central copy alone")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.abspath(args.central), exist_ok=True)
+    failed = False
+    for site, desk_dir in args.sources:
+        try:
+            for site_name, table, read, applied, seconds in sync_site(args.central, site, desk_dir, args.tables, args.batch_size, args.trim_changes):
+                print(file=sys.stderr)
+                print(f'{site_name} {table}: {read} rows read, {applied} inserted or changed in {seconds:.1f}s')
+        except (SyncError, sqlite3.Error) as error:
+            print(file=sys.stderr)
+            print(f'{site}: {error}', file=sys.stderr)
+            failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,268 @@
+from bisect import bisect_left
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+
+from db_worker import fetch_all, fetch_one
+
+
+# A sort on a result that is already fully loaded and no larger than this
+# is done in memory instead of querying again.
+LOCAL_SORT_MAX_ROWS = 5000
+
+
+class SqliteTableModel(QAbstractTableModel):
+    # Rows are fetched a page at a time so the view only ever materializes
+    # what has been scrolled into range. Paging is keyset-based on
+    # (order columns, id) rather than OFFSET, so any page costs one index seek.
+    # Pages are read on the executor's thread and appended when they arrive.
+    #
+    # Clicking a header sorts in SQL, ascending or descending, on the same
+    # keyset. sort_keys maps a column to the index columns it sorts by, such
+    # as name to (name, timestamp), so that every sortable column can be
+    # served by an index in order; other columns sort by (column, id).
+    fully_loaded = pyqtSignal()
+
+    def __init__(self, executor, table, columns, headers, page_size=500, formatters=None, sort_keys=None, deferred=False, parent=None):
+        super().__init__(parent)
+
+        self.executor = executor
+        self.table = table
+        self.columns = list(columns)
+        self.headers = list(headers)
+        self.page_size = page_size
+        self.formatters = dict(formatters or {})
+        self.sort_keys = {column: list(keys) for column, keys in (sort_keys or {}).items()}
+
+        self.where = ''
+        self.params = ()
+        self.order_by = 'id'
+        self.order_columns = []
+        self.descending = False
+        self.default_order = 'id'
+        self.header_order = None
+        self.rows = []
+        self.last_key = None
+        # A deferred model loads nothing until the first refresh(), for
+        # executors that must wait for the schema to be created elsewhere.
+        self.has_more = not deferred
+        self.fetching = False
+        self.generation = 0
+        self.page_operation = 'refresh'
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        value = self.rows[index.row()][index.column()]
+        formatter = self.formatters.get(index.column())
+        if formatter is not None:
+            return formatter(value)
+        return str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section]
+        return str(section + 1)
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self.has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self.has_more or self.fetching:
+            return
+
+        self.fetching = True
+        sql, params = self.page_query()
+        # The first page is what a refresh or search waits for; later pages
+        # are timed separately as scrolling.
+        operation = self.page_operation if self.last_key is None else 'page'
+        self.executor.submit(fetch_all, sql, params, key=(self, 'page'), on_result=self.page_loaded, on_error=self.page_failed, operation=operation)
+
+    def page_loaded(self, page):
+        self.fetching = False
+        self.has_more = len(page) == self.page_size
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.last_key = self.sort_key(page[-1])
+            self.endInsertRows()
+
+        if not self.has_more:
+            self.fully_loaded.emit()
+
+    def page_failed(self, error):
+        self.fetching = False
+        self.has_more = False
+        self.executor.error.emit(None, error)
+
+    def sort_key(self, row):
+        if not self.order_columns:
+            return row[0]
+        return tuple(row[column] for column in self.order_columns) + (row[0],)
+
+    def key_position(self, key):
+        # Where a row with this sort key belongs in the loaded rows.
+        if not self.descending:
+            return bisect_left(self.rows, key, key=self.sort_key)
+        low, high = 0, len(self.rows)
+        while low < high:
+            middle = (low + high) // 2
+            if self.sort_key(self.rows[middle]) > key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def page_query(self):
+        clauses = []
+        params = []
+        keys = [self.columns[column] for column in self.order_columns] + ['id']
+        direction = ' DESC' if self.descending else ''
+        # The keyset bound goes first: SQLite seeks the index on the first
+        # lower bound it sees, and a filter such as timestamp >= ? listed
+        # before it would make deep pages scan from the start of the range.
+        if self.last_key is not None:
+            comparison = '<' if self.descending else '>'
+            if not self.order_columns:
+                clauses.append(f'id {comparison} ?')
+                params.append(self.last_key)
+            else:
+                clauses.append(f'({", ".join(keys)}) {comparison} ({", ".join("?" for _ in keys)})')
+                params.extend(self.last_key)
+        if self.where:
+            clauses.append(f'({self.where})')
+            params.extend(self.params)
+
+        sql = f'SELECT {", ".join(self.columns)} FROM {self.table}'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY ' + ', '.join(key + direction for key in keys) + ' LIMIT ?'
+        params.append(self.page_size)
+        return sql, params
+
+    def row_query(self, row_id):
+        sql = f'SELECT {", ".join(self.columns)} FROM {self.table} WHERE id = ?'
+        params = [row_id]
+        if self.where:
+            sql += f' AND ({self.where})'
+            params.extend(self.params)
+        return sql, params
+
+    def refresh_row(self, row_id):
+        # Re-read a single row after an insert or edit and apply it in place,
+        # checking it against the current filter instead of reloading everything.
+        sql, params = self.row_query(row_id)
+        generation = self.generation
+        self.executor.submit(fetch_one, sql, params, on_result=lambda row: self.row_loaded(generation, row_id, row), operation='refresh_row')
+
+    def row_loaded(self, generation, row_id, row):
+        if generation != self.generation:
+            return
+
+        old_position = self.row_position(row_id)
+        if old_position is not None:
+            if row is not None and self.sort_key(row) == self.sort_key(self.rows[old_position]):
+                self.rows[old_position] = row
+                self.dataChanged.emit(self.index(old_position, 0), self.index(old_position, len(self.columns) - 1))
+                return
+            self.beginRemoveRows(QModelIndex(), old_position, old_position)
+            del self.rows[old_position]
+            self.endRemoveRows()
+
+        if row is None:
+            return
+        key = self.sort_key(row)
+        position = self.key_position(key)
+        # Rows past the last fetched page are picked up by fetchMore.
+        if position < len(self.rows) or not self.has_more:
+            self.beginInsertRows(QModelIndex(), position, position)
+            self.rows.insert(position, row)
+            if position == len(self.rows) - 1:
+                self.last_key = key
+            self.endInsertRows()
+
+    def row_position(self, row_id):
+        if not self.order_columns:
+            position = self.key_position(row_id)
+            if position < len(self.rows) and self.rows[position][0] == row_id:
+                return position
+            return None
+        for position, row in enumerate(self.rows):
+            if row[0] == row_id:
+                return position
+        return None
+
+    def set_filter(self, where='', params=(), order_by='id', operation='refresh'):
+        self.where = where
+        self.params = tuple(params)
+        self.set_order(order_by)
+        self.refresh(operation)
+
+    def set_order(self, order_by):
+        # order_by is the caller's order, such as timestamp for a date range;
+        # a header the user has clicked takes precedence over it.
+        self.default_order = order_by
+        self.order_by, self.descending = self.header_order or (order_by, False)
+        if self.order_by == 'id':
+            self.order_columns = []
+        else:
+            self.order_columns = [self.columns.index(column) for column in self.sort_keys.get(self.order_by, [self.order_by])]
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        header_order = (self.columns[column], order == Qt.DescendingOrder) if column >= 0 else None
+        if header_order == self.header_order:
+            return
+        self.header_order = header_order
+        self.set_order(self.default_order)
+        if not self.has_more and len(self.rows) <= LOCAL_SORT_MAX_ROWS:
+            self.layoutAboutToBeChanged.emit()
+            self.rows.sort(key=self.sort_key, reverse=self.descending)
+            self.last_key = self.sort_key(self.rows[-1]) if self.rows else None
+            self.layoutChanged.emit()
+        else:
+            self.refresh('sort')
+
+    def refresh(self, operation='refresh'):
+        self.page_operation = operation
+        self.reset_rows([], True)
+        self.fetchMore()
+
+    def set_rows(self, rows, where='', params=(), order_by='id'):
+        # Shows an already complete result set, such as a cached search,
+        # without querying; where/params/order_by still describe the rows so
+        # that refresh_row keeps them consistent.
+        self.where = where
+        self.params = tuple(params)
+        self.set_order(order_by)
+        # Cached rows may have been loaded under another order.
+        self.reset_rows(sorted(rows, key=self.sort_key, reverse=self.descending), False)
+
+    def reset_rows(self, rows, has_more):
+        self.executor.cancel((self, 'page'))
+
+        self.beginResetModel()
+        self.rows = rows
+        self.last_key = self.sort_key(rows[-1]) if rows else None
+        self.has_more = has_more
+        self.fetching = False
+        self.generation += 1
+        self.endResetModel()
+
+    def record(self, row):
+        return self.rows[row]
@@ -0,0 +1,193 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QAbstractItemView, QFileDialog, QInputDialog, QProgressDialog, QTableView
+from datetime import datetime, timedelta
+
+import instrumentation
+from bulk_import import import_summary
+from date_range import TIMESTAMP_FORMAT, date_range_bounds
+from db_worker import DatabaseExecutor, fetch_one, read_snapshot
+from retention import ARCHIVE_DEFAULT_DAYS, archive_records, archived_until, attach_archives
+from search_index import search_filter
+
+# Pieces the three app windows share. They rely on the attributes every
+# window has: db_executor, report_executor, bulk_executor, write_queue,
+# log_display and search_cache, plus archived_until and attached_months for
+# tables that are archived.
+
+
+def create_executors(window, database):
+    # Writes go through the first executor. Browsing and searches go through
+    # the second, and imports, exports and reports through the third, each on
+    # a connection of its own: under WAL a long read never holds up a write,
+    # and paging and single writes never wait behind a bulk job.
+    db_executor = DatabaseExecutor(database, window)
+    report_executor = DatabaseExecutor(database, window)
+    bulk_executor = DatabaseExecutor(database, window)
+    for executor in [db_executor, report_executor, bulk_executor]:
+        executor.error.connect(window.show_database_error)
+    return db_executor, report_executor, bulk_executor
+
+
+def shutdown_executors(window):
+    window.write_queue.flush()
+    window.db_executor.shutdown()
+    window.report_executor.shutdown()
+    window.bulk_executor.shutdown()
+    if instrumentation.ENABLED and instrumentation.STATS_FILE:
+        instrumentation.stats.dump(instrumentation.STATS_FILE)
+
+
+def create_table_view(window, model):
+    view = QTableView(window)
+    view.setModel(model)
+    view.setSelectionBehavior(QAbstractItemView.SelectRows)
+    view.setSelectionMode(QAbstractItemView.SingleSelection)
+    # No indicator until the first click, so opening the window does not sort.
+    view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+    view.setSortingEnabled(True)
+    return view
+
+
+def date_range_filter(window, repository):
+    # Returns (where, params, table) for the window's date range, or None for
+    # all dates; a range reaching into archived months reads from the view
+    # over the table and its archives.
+    bounds = date_range_bounds(window.date_range_input.currentText(), window.date_from_input.dateTime().toPyDateTime(), window.date_to_input.dateTime().toPyDateTime())
+    if bounds is None:
+        return None
+    table = repository.table
+    if window.archived_until is not None and bounds[0] <= window.archived_until:
+        table = attach_archive_view(window, repository.table, bounds)
+    return 'timestamp >= ? AND timestamp <= ?', bounds, table
+
+
+def attach_archive_view(window, table, bounds):
+    # Attached on the report executor, ahead of the page query that uses it.
+    months = (bounds[0][:7], bounds[1][:7])
+    if months != window.attached_months:
+        def archives_attached(result):
+            _, attached, skipped = result
+            if skipped:
+                window.log_display.append(f'Showing the {attached} most recent archived months in this range; narrow the range to see the other {skipped}.')
+
+        window.attached_months = months
+        window.report_executor.submit(attach_archives, table, *bounds, on_result=archives_attached)
+    return f'{table}_with_archives'
+
+
+def show_filtered(window, model, repository, clauses, params, order_by='id', table=None):
+    # ANDs the window's search term onto clauses and loads the model, from
+    # the search cache when it has the term.
+    table = table or repository.table
+    rows = None
+    if window.search_term:
+        # The archives have search indexes of their own, which the view over
+        # all of them cannot use.
+        where, search_params = search_filter(repository.table, repository.search_columns, window.search_term, window.search_indexed and table == repository.table)
+        clauses.append(f'({where})')
+        params.extend(search_params)
+        rows = window.search_cache.get(window.search_term)
+
+    where = ' AND '.join(clauses)
+    model.table = table
+    if rows is not None:
+        model.set_rows(rows, where, params, order_by)
+    else:
+        model.set_filter(where, params, order_by, operation='search' if window.search_term else 'refresh')
+
+
+def export_records(window, repository, title, noun):
+    options = QFileDialog.Options()
+    options |= QFileDialog.DontUseNativeDialog
+    file_name, _ = QFileDialog.getSaveFileName(window, f"Save {title} Data", "", "CSV Files (*.csv);;Gzipped CSV Files (*.csv.gz);;All Files (*)", options=options)
+
+    if file_name:
+        progress = QProgressDialog(f'Exporting {title.lower()} data...', 'Cancel', 0, 100, window)
+        progress.setMinimumDuration(500)
+
+        def export_finished(row_count):
+            progress.reset()
+            window.log_display.append(f'Exported {row_count} {noun} records to {file_name}')
+
+        def export_failed(error):
+            progress.reset()
+            window.log_display.append(f'Export failed: {error}')
+
+        def export_cancelled():
+            job.cancel()
+            window.log_display.append('Export cancelled.')
+
+        window.write_queue.flush()
+        job = window.bulk_executor.submit(read_snapshot, repository.export, file_name, on_result=export_finished, on_error=export_failed, on_progress=progress.setValue, operation='export')
+        progress.canceled.connect(export_cancelled)
+
+
+def import_records(window, repository, title, imported):
+    # imported() runs once the import ends, however it ends.
+    options = QFileDialog.Options()
+    options |= QFileDialog.DontUseNativeDialog
+    file_name, _ = QFileDialog.getOpenFileName(window, f"Import {title} Data", "", "CSV Files (*.csv *.csv.gz);;All Files (*)", options=options)
+
+    if file_name:
+        progress = QProgressDialog(f'Importing {title.lower()} data...', 'Cancel', 0, 100, window)
+        progress.setMinimumDuration(500)
+
+        def import_finished(result):
+            progress.reset()
+            imported()
+            window.log_display.append(import_summary(result))
+
+        def import_failed(error):
+            progress.reset()
+            window.log_display.append(f'Import failed: {error}')
+
+        def import_cancelled():
+            # The job may still be committing its current batch; the no-op
+            # behind it finishes once the job has ended.
+            job.cancel()
+            window.bulk_executor.submit(fetch_one, 'SELECT 1', on_result=import_stopped)
+
+        def import_stopped(_):
+            imported()
+            window.log_display.append('Import cancelled. Batches already loaded were kept.')
+
+        # Imported batches commit on the bulk connection, so adding and
+        # editing records goes on while a long file loads.
+        window.write_queue.flush()
+        job = window.bulk_executor.submit(repository.import_file, file_name, on_result=import_finished, on_error=import_failed, on_progress=progress.setValue, operation='import')
+        progress.canceled.connect(import_cancelled)
+
+
+def prompt_and_archive(window, repository, noun):
+    days, accepted = QInputDialog.getInt(window, 'Archive Old Records', f'Archive {noun} records older than (days):', ARCHIVE_DEFAULT_DAYS, 1, 36500)
+    if accepted:
+        cutoff = (datetime.now() - timedelta(days=days)).strftime(TIMESTAMP_FORMAT)
+        progress = QProgressDialog(f'Archiving {noun} records...', 'Cancel', 0, 100, window)
+        progress.setMinimumDuration(500)
+
+        def archiving_done():
+            progress.reset()
+            window.attached_months = None
+            window.search_cache.clear()
+            window.db_executor.submit(archived_until, repository.table, on_result=archive_state_loaded)
+
+        def archive_state_loaded(until):
+            window.archived_until = until
+            window.apply_filters()
+
+        def archive_finished(moved):
+            archiving_done()
+            window.log_display.append(f'Archived {moved} {noun} records older than {cutoff}')
+
+        def archive_failed(error):
+            archiving_done()
+            window.log_display.append(f'Archiving failed: {error}')
+
+        def archive_cancelled():
+            job.cancel()
+            archiving_done()
+            window.log_display.append('Archiving cancelled. Batches already archived were kept.')
+
+        window.write_queue.flush()
+        job = window.db_executor.submit(archive_records, repository.table, cutoff, on_result=archive_finished, on_error=archive_failed, on_progress=progress.setValue, operation='archive')
+        progress.canceled.connect(archive_cancelled)
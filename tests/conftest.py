@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bulk_import import ConsoleJob
+from database import connect
+
+
+@pytest.fixture
+def db_dir(tmp_path, monkeypatch):
+    # Every test gets its own database directory.
+    monkeypatch.setenv('VISITOR_APPS_DB_DIR', str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def open_table(db_dir):
+    # open_table(REPOSITORY) returns a connection to that repository's
+    # database with its schema, triggers and summaries created.
+    connections = []
+
+    def open_table(repository):
+        connection = connect(repository.database)
+        repository.create_table(ConsoleJob(connection))
+        connections.append(connection)
+        return connection
+
+    yield open_table
+    for connection in connections:
+        connection.close()
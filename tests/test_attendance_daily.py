@@ -0,0 +1,33 @@
+from repository import ATTENDANCE
+
+
+def attendance_daily(connection):
+    return connection.execute('SELECT day, name, first_in, last_out, punch_count FROM attendance_daily ORDER BY day, name').fetchall()
+
+
+def expected_attendance_daily(connection):
+    return connection.execute('''
+        SELECT substr(timestamp, 1, 10) AS day, name, MIN(timestamp), MAX(timestamp), COUNT(*) FROM attendance GROUP BY day, name ORDER BY day, name
+    ''').fetchall()
+
+
+def test_attendance_daily_follows_inserts_updates_and_deletes(open_table):
+    connection = open_table(ATTENDANCE)
+    punches = [
+        ('Khan', '2026-03-02 09:00:00'), ('Khan', '2026-03-02 13:00:00'), ('Khan', '2026-03-02 17:30:00'),
+        ('Bibi', '2026-03-02 08:45:00'), ('Khan', '2026-03-03 09:10:00'),
+    ]
+    for punch in punches:
+        connection.execute(ATTENDANCE.insert_sql, punch)
+    connection.commit()
+    assert attendance_daily(connection) == expected_attendance_daily(connection)
+
+    # Moving the day's last punch recomputes last_out from what remains.
+    connection.execute("UPDATE attendance SET timestamp = '2026-03-03 18:00:00' WHERE id = 3")
+    connection.execute("UPDATE attendance SET name = 'Bibi' WHERE id = 2")
+    connection.commit()
+    assert attendance_daily(connection) == expected_attendance_daily(connection)
+
+    connection.execute('DELETE FROM attendance WHERE id IN (1, 4)')
+    connection.commit()
+    assert attendance_daily(connection) == expected_attendance_daily(connection)
@@ -0,0 +1,39 @@
+import csv
+from decimal import Decimal
+
+from bulk_import import ConsoleJob, import_csv
+from repository import CUSTOMERS
+
+
+def write_lines(path, lines):
+    path.write_text(''.join(f'{line}\n' for line in lines), encoding='utf-8')
+    return str(path)
+
+
+def rejects(file_name):
+    with open(file_name + '.rejects.csv', encoding='utf-8', newline='') as file:
+        return [(line, values) for line, _, *values in list(csv.reader(file))[1:]]
+
+
+def test_unreadable_amounts_go_to_rejects(open_table, tmp_path):
+    connection = open_table(CUSTOMERS)
+    file_name = write_lines(tmp_path / 'customers.csv', [
+        'name,contact,item,amount', 'Aisha,0300,Tea,12.50', 'Bilal,0301,Rice,1e30', 'Omar,0302,Tea,Rs 500', 'Sana,0303,Sugar,3',
+    ])
+    result = CUSTOMERS.import_file(ConsoleJob(connection), file_name)
+    assert (result.imported, result.rejected) == (2, 2)
+    assert rejects(file_name) == [('3', ['Bilal', '0301', 'Rice', '1e30']), ('4', ['Omar', '0302', 'Tea', 'Rs 500'])]
+    assert connection.execute('SELECT name, amount_cents FROM customers ORDER BY id').fetchall() == [('Aisha', 1250), ('Sana', 300)]
+
+
+def test_arithmetic_error_rejects_the_line_not_the_file(open_table, tmp_path):
+    connection = open_table(CUSTOMERS)
+    file_name = write_lines(tmp_path / 'customers.csv', ['Aisha,0300,Tea,1250', 'Bilal,0301,Rice,twelve', 'Omar,0302,Tea,300'])
+
+    def parse_row(name, contact, item, amount):
+        # Decimal raises decimal.InvalidOperation, an ArithmeticError, for text.
+        return name, contact, item, int(Decimal(amount))
+
+    result = import_csv(ConsoleJob(connection), 'customers', ['name', 'contact', 'item', 'amount_cents'], parse_row, file_name)
+    assert (result.imported, result.rejected) == (2, 1)
+    assert rejects(file_name) == [('2', ['Bilal', '0301', 'Rice', 'twelve'])]
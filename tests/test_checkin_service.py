@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+import pytest
+
+from checkin_service import CheckinService
+
+
+async def request(port, head, body=b''):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(head.encode('latin-1') + b'\r\nConnection: close\r\n\r\n' + body)
+    response = await reader.read()
+    writer.close()
+    status_line, _, payload = response.partition(b'\r\n\r\n')
+    return int(status_line.split()[1]), json.loads(payload)
+
+
+def post(port, path, values):
+    body = json.dumps(values).encode('utf-8')
+    return request(port, f'POST {path} HTTP/1.1\r\nContent-Length: {len(body)}', body)
+
+
+@pytest.fixture
+def serve(db_dir):
+    # Runs test(service, port) against a service started on a free port.
+    def run(test):
+        async def main():
+            service = CheckinService()
+            await service.start('127.0.0.1', 0)
+            try:
+                return await test(service, service.server.sockets[0].getsockname()[1])
+            finally:
+                await service.close()
+        return asyncio.run(main())
+    return run
+
+
+def test_negative_content_length_is_rejected(serve):
+    async def test(service, port):
+        return await request(port, 'POST /attendance HTTP/1.1\r\nContent-Length: -5')
+    assert serve(test) == (400, {'error': 'malformed request'})
+
+
+def test_out_of_range_amount_is_rejected(serve):
+    async def test(service, port):
+        rejected = await post(port, '/customers', {'name': 'Aisha', 'contact': '0300', 'item': 'Tea', 'amount': '1e30'})
+        accepted = await post(port, '/customers', {'name': 'Aisha', 'contact': '0300', 'item': 'Tea', 'amount': '12.50'})
+        return rejected[0], accepted[0]
+    assert serve(test) == (400, 201)
+
+
+def test_value_sqlite_cannot_store_is_rejected(serve):
+    async def test(service, port):
+        # An integer beyond 64 bits only fails once the batch binds it.
+        service.endpoints['customers'].parse_body = lambda values: ('Aisha', '0300', 'Tea', 2 ** 70)
+        return (await post(port, '/customers', {}))[0]
+    assert serve(test) == 400
+
+
+def test_unexpected_error_is_answered(serve, capsys):
+    async def test(service, port):
+        service.endpoints['attendance'].parse_body = lambda values: [][1]
+        return await post(port, '/attendance', {'name': 'Khan'})
+    assert serve(test) == (500, {'error': 'internal error'})
+    assert 'IndexError' in capsys.readouterr().err
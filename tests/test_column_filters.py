@@ -0,0 +1,44 @@
+import pytest
+
+from column_filters import prefix_filter, range_filter
+from repository import CUSTOMERS
+
+ITEMS = ['Tea', 'tea cups', 'Teapot', '50% off', '50 kg rice', 'Rice_1', 'Rice 1', 'C:\\Tea', 'Sugar']
+
+
+@pytest.fixture
+def customers(open_table):
+    connection = open_table(CUSTOMERS)
+    connection.executemany(CUSTOMERS.insert_sql, [('Aisha', '0300', item, 100 * position) for position, item in enumerate(ITEMS)])
+    connection.commit()
+    return connection
+
+
+def items(connection, where, params):
+    return [row[0] for row in connection.execute(f'SELECT item FROM customers WHERE {where} ORDER BY id', params)]
+
+
+@pytest.mark.parametrize('prefix, expected', [
+    ('tea', ['Tea', 'tea cups', 'Teapot']),
+    ('TEAP', ['Teapot']),
+    # Wildcards and the escape character in the prefix match literally.
+    ('50%', ['50% off']),
+    ('Rice_', ['Rice_1']),
+    ('C:\\', ['C:\\Tea']),
+    ('', ITEMS),
+])
+def test_prefix_filter(customers, prefix, expected):
+    assert items(customers, *prefix_filter('item', prefix)) == expected
+
+
+@pytest.mark.parametrize('low, high, expected', [
+    (200, 400, ['Teapot', '50% off', '50 kg rice']),
+    (600, None, ['Rice 1', 'C:\\Tea', 'Sugar']),
+    (None, 100, ['Tea', 'tea cups']),
+])
+def test_range_filter(customers, low, high, expected):
+    assert items(customers, *range_filter('amount_cents', low, high)) == expected
+
+
+def test_range_filter_without_bounds():
+    assert range_filter('amount_cents') == ('', ())
@@ -0,0 +1,100 @@
+import sqlite3
+
+import pytest
+
+from bulk_import import ConsoleJob
+from database import connect
+from repository import CUSTOMERS
+from storage import CUSTOMER_AMOUNT_UPDATE, MAX_AMOUNT_CENTS, parse_amount, unmigrated_customer_count
+
+
+@pytest.mark.parametrize('text, cents', [
+    ('12.50', 1250), ('12.5', 1250), ('0', 0), ('9999999999.99', MAX_AMOUNT_CENTS - 1),
+    ('10000000000', None), ('99999999999999999999', None), ('9' * 29, None), ('1e30', None),
+    ('-1', None), ('1.005', None), ('12,50', None), ('Rs 500', None), ('nan', None), ('sNaN', None), ('inf', None), ('', None),
+])
+def test_parse_amount(text, cents):
+    assert parse_amount(text) == cents
+
+
+def test_migration_sets_aside_amounts_that_do_not_parse(db_dir):
+    # A table from before amounts were stored as cents.
+    legacy = sqlite3.connect(db_dir / CUSTOMERS.database)
+    legacy.execute('CREATE TABLE customers (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, contact TEXT NOT NULL, item TEXT NOT NULL, amount TEXT NOT NULL)')
+    legacy.executemany('INSERT INTO customers (name, contact, item, amount) VALUES (?, ?, ?, ?)', [
+        ('Aisha', '0300', 'Tea', '12.5'), ('Bilal', '0301', 'Rice', 'Rs 500'), ('Omar', '0302', 'Tea', ' 3 '), ('Sana', '0303', 'Sugar', '12,50'),
+    ])
+    legacy.commit()
+    legacy.close()
+
+    connection = connect(CUSTOMERS.database)
+    job = ConsoleJob(connection)
+    CUSTOMERS.create_table(job)
+    assert connection.execute('SELECT id, amount_cents FROM customers ORDER BY id').fetchall() == [(1, 1250), (3, 300)]
+    assert connection.execute('SELECT id, amount FROM customers_unmigrated ORDER BY id').fetchall() == [(2, 'Rs 500'), (4, '12,50')]
+    assert unmigrated_customer_count(job) == 2
+    assert connection.execute('SELECT total_cents, purchase_count FROM customer_totals').fetchone() == (1550, 2)
+
+    # New ids still follow the old ones, including those set aside.
+    assert connection.execute(CUSTOMERS.insert_sql, ('Zia', '0304', 'Tea', 100)).lastrowid == 5
+    connection.close()
+
+
+def test_no_unmigrated_table_for_new_databases(open_table):
+    connection = open_table(CUSTOMERS)
+    assert unmigrated_customer_count(ConsoleJob(connection)) == 0
+
+
+def customer_totals(connection):
+    return (
+        connection.execute('SELECT total_cents, purchase_count FROM customer_totals').fetchall(),
+        connection.execute('SELECT name, total_cents, purchase_count FROM customer_name_totals ORDER BY name').fetchall(),
+        connection.execute('SELECT item, total_cents, purchase_count FROM customer_item_totals ORDER BY item').fetchall(),
+    )
+
+
+def expected_customer_totals(connection):
+    return (
+        connection.execute('SELECT COALESCE(SUM(amount_cents), 0), COUNT(*) FROM customers').fetchall(),
+        connection.execute('SELECT name, SUM(amount_cents), COUNT(*) FROM customers GROUP BY name ORDER BY name').fetchall(),
+        connection.execute('SELECT item, SUM(amount_cents), COUNT(*) FROM customers GROUP BY item ORDER BY item').fetchall(),
+    )
+
+
+def version(connection):
+    return connection.execute('SELECT version FROM customer_totals').fetchone()[0]
+
+
+def test_customer_totals_follow_inserts_updates_and_deletes(open_table):
+    connection = open_table(CUSTOMERS)
+    rows = [('Aisha', '0300', 'Tea', 250), ('Bilal', '0301', 'Tea', 1000), ('Aisha', '0300', 'Rice', 1250)]
+    for row in rows:
+        connection.execute(CUSTOMERS.insert_sql, row)
+    connection.commit()
+    assert customer_totals(connection) == expected_customer_totals(connection)
+    assert customer_totals(connection)[0] == [(2500, 3)]
+
+    before = version(connection)
+    connection.execute(CUSTOMER_AMOUNT_UPDATE, (300, 1))
+    connection.execute("UPDATE customers SET name = 'Bilal', item = 'Sugar' WHERE id = 3")
+    connection.commit()
+    assert customer_totals(connection) == expected_customer_totals(connection)
+    assert version(connection) > before
+
+    # A name or item whose last purchase goes is dropped, not left at zero.
+    connection.execute('DELETE FROM customers WHERE id = 1')
+    connection.commit()
+    assert customer_totals(connection) == expected_customer_totals(connection)
+    assert connection.execute("SELECT COUNT(*) FROM customer_name_totals WHERE name = 'Aisha'").fetchone() == (0,)
+
+
+def test_customer_totals_rebuilt_for_existing_rows(open_table):
+    # Summaries created over a table that already has rows start from them.
+    connection = open_table(CUSTOMERS)
+    connection.executemany(CUSTOMERS.insert_sql, [('Aisha', '0300', 'Tea', 250), ('Aisha', '0300', 'Tea', 100)])
+    connection.execute('DROP TABLE customer_totals')
+    connection.execute('DROP TABLE customer_name_totals')
+    connection.execute('DROP TABLE customer_item_totals')
+    connection.commit()
+    connection = open_table(CUSTOMERS)
+    assert customer_totals(connection) == expected_customer_totals(connection)
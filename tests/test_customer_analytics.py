@@ -0,0 +1,51 @@
+import pytest
+
+from bulk_import import ConsoleJob
+from customer_analytics import ANALYTICS_HISTOGRAM_BINS, customer_analytics, format_analytics
+from repository import CUSTOMERS
+
+pytest.importorskip('numpy')
+
+
+def analytics(open_table, amounts):
+    connection = open_table(CUSTOMERS)
+    connection.executemany(CUSTOMERS.insert_sql, [(f'C{position % 4}', '0300', 'Tea', amount) for position, amount in enumerate(amounts)])
+    connection.commit()
+    _, report = customer_analytics(ConsoleJob(connection))
+    return report
+
+
+def histogram_lines(report):
+    lines = format_analytics(report).splitlines()
+    start = lines.index('Purchase amounts') + 1
+    return [line.split() for line in lines[start:lines.index('', start)]]
+
+
+def test_one_amount_gives_one_bin(open_table):
+    report = analytics(open_table, [1250, 1250, 1250])
+    _, _, _, _, _, edges, histogram = report['amounts']
+    assert (edges, histogram) == ([1250, 1251], [3])
+    assert histogram_lines(report) == [['12.50', '-', '12.50', '3', '#' * 40]]
+
+
+def test_narrow_range_has_a_bin_per_cent(open_table):
+    report = analytics(open_table, [100, 101, 101, 104])
+    _, _, _, _, _, edges, histogram = report['amounts']
+    assert (edges, histogram) == ([100, 101, 102, 103, 104, 105], [1, 2, 0, 0, 1])
+    assert [line[:3] for line in histogram_lines(report)] == [[f'1.0{cent}', '-', f'1.0{cent}'] for cent in range(5)]
+
+
+def test_wide_range_bins_cover_every_amount_once(open_table):
+    amounts = [0, 1, 999, 1000, 1001, 5000, 9999, 10000, 10000, 12345]
+    report = analytics(open_table, amounts)
+    low, high, _, _, _, edges, histogram = report['amounts']
+    assert len(histogram) == ANALYTICS_HISTOGRAM_BINS
+    assert all(isinstance(edge, int) for edge in edges)
+    assert edges[0] == low and edges[-2] <= high < edges[-1]
+    assert histogram == [sum(start <= amount < end for amount in amounts) for start, end in zip(edges, edges[1:])]
+
+    # Each line ends where the next starts, a cent earlier, and the last at the maximum.
+    lines = histogram_lines(report)
+    assert lines[-1][2] == '123.45'
+    for line, following in zip(lines, lines[1:]):
+        assert round(float(line[2]) * 100) + 1 == round(float(following[0]) * 100)
@@ -0,0 +1,46 @@
+import csv
+
+import pytest
+
+from bulk_import import ConsoleJob
+from repository import ATTENDANCE, CUSTOMERS, VISITORS, CustomerRecord
+
+
+def test_record_names_the_fields():
+    record = CUSTOMERS.record((1, 'Aisha', '0300', 'Tea', 1250))
+    assert record == CustomerRecord(1, 'Aisha', '0300', 'Tea', 1250)
+    assert (record.name, record.amount_cents) == ('Aisha', 1250)
+    assert CUSTOMERS.record(None) is None
+
+
+@pytest.mark.parametrize('repository', [ATTENDANCE, VISITORS, CUSTOMERS])
+def test_select_sql_reads_the_record_columns(open_table, repository):
+    connection = open_table(repository)
+    cursor = connection.execute(repository.select_sql)
+    assert [column[0] for column in cursor.description] == repository.columns
+    assert repository.fields == repository.columns[1:]
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_search_returns_the_newest_matches(open_table, indexed):
+    connection = open_table(VISITORS)
+    visits = [
+        ('Sana', '0300', '2026-03-02 10:00:00', 'Meeting'), ('Omar', '0311', '2026-03-02 11:00:00', 'Delivery'),
+        ('Sana Malik', '0300', '2026-03-03 10:00:00', 'Interview'), ('Bilal', '0322', '2026-03-03 12:00:00', 'Meeting'),
+    ]
+    connection.executemany(VISITORS.insert_sql, visits)
+    connection.commit()
+    job = ConsoleJob(connection)
+    assert [row[0] for row in VISITORS.search(job, 'sana', indexed, 10)] == [3, 1]
+    assert [row[0] for row in VISITORS.search(job, 'meeting', indexed, 1)] == [4]
+    assert [row[0] for row in VISITORS.search(job, '', indexed, 2)] == [4, 3]
+
+
+def test_export_writes_headers_and_formatted_amounts(open_table, tmp_path):
+    connection = open_table(CUSTOMERS)
+    connection.executemany(CUSTOMERS.insert_sql, [('Aisha', '0300', 'Tea', 1250), ('Bilal', '0301', 'Rice', 5)])
+    connection.commit()
+    file_name = str(tmp_path / 'customers.csv')
+    assert CUSTOMERS.export(ConsoleJob(connection), file_name) == 2
+    with open(file_name, encoding='utf-8', newline='') as file:
+        assert list(csv.reader(file)) == [CUSTOMERS.headers, ['1', 'Aisha', '0300', 'Tea', '12.50'], ['2', 'Bilal', '0301', 'Rice', '0.05']]
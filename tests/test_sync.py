@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from bulk_import import ConsoleJob
+from database import connect
+from repository import ATTENDANCE, VISITORS
+from sync import SyncError, sync_site
+
+SYNC_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sync.py')
+
+
+def open_desk(directory, repository):
+    os.makedirs(directory, exist_ok=True)
+    connection = connect(os.path.join(directory, repository.database))
+    repository.create_table(ConsoleJob(connection))
+    return connection
+
+
+def sync(central, site, desk, **kwargs):
+    return [(table, read, applied) for _, table, read, applied, _ in sync_site(central, site, desk, ['attendance', 'visitors'], **kwargs)]
+
+
+def central_rows(central, repository):
+    connection = sqlite3.connect(os.path.join(central, repository.database))
+    try:
+        return connection.execute(f'SELECT uid, {", ".join(repository.fields)} FROM {repository.table} ORDER BY uid').fetchall()
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def desks(tmp_path):
+    north = str(tmp_path / 'north')
+    south = str(tmp_path / 'south')
+    for desk, name in [(north, 'Khan'), (south, 'Bibi')]:
+        attendance = open_desk(desk, ATTENDANCE)
+        attendance.executemany(ATTENDANCE.insert_sql, [(name, f'2026-03-0{day} 09:00:00') for day in range(1, 4)])
+        attendance.commit()
+        attendance.close()
+        visitors = open_desk(desk, VISITORS)
+        visitors.execute(VISITORS.insert_sql, (f'{name} guest', '0300', '2026-03-01 10:00:00', 'Meeting'))
+        visitors.commit()
+        visitors.close()
+    central = tmp_path / 'central'
+    central.mkdir()
+    return str(central), north, south
+
+
+def test_sync_is_idempotent(desks):
+    central, north, south = desks
+    assert sync(central, 'north', north) == [('attendance', 3, 3), ('visitors', 1, 1)]
+    assert sync(central, 'south', south) == [('attendance', 3, 3), ('visitors', 1, 1)]
+    rows = central_rows(central, ATTENDANCE)
+
+    # A second run reads nothing new and changes nothing.
+    assert sync(central, 'north', north) == [('attendance', 0, 0), ('visitors', 0, 0)]
+    assert central_rows(central, ATTENDANCE) == rows
+    assert [row[0] for row in rows] == ['north:1', 'north:2', 'north:3', 'south:1', 'south:2', 'south:3']
+
+
+def test_sync_reapplying_a_batch_changes_nothing(desks):
+    central, north, _ = desks
+    sync(central, 'north', north)
+    connection = connect(os.path.join(central, ATTENDANCE.database))
+    connection.execute("UPDATE sync_state SET last_id = 0 WHERE site = 'north' AND table_name = 'attendance'")
+    connection.commit()
+    connection.close()
+
+    assert sync(central, 'north', north)[0] == ('attendance', 3, 0)
+    assert len(central_rows(central, ATTENDANCE)) == 3
+
+
+def test_sync_propagates_edits(desks):
+    central, north, _ = desks
+    sync(central, 'north', north)
+
+    desk = connect(os.path.join(north, ATTENDANCE.database))
+    desk.execute("UPDATE attendance SET name = 'Khan Sahib' WHERE id = 2")
+    desk.execute(ATTENDANCE.insert_sql, ('Zia', '2026-03-04 09:00:00'))
+    desk.commit()
+    desk.close()
+
+    assert sync(central, 'north', north)[0] == ('attendance', 2, 2)
+    rows = central_rows(central, ATTENDANCE)
+    assert ('north:2', 'Khan Sahib', '2026-03-02 09:00:00') in rows
+    assert ('north:4', 'Zia', '2026-03-04 09:00:00') in rows
+
+    # The central copy's own summaries follow the synced edit.
+    connection = sqlite3.connect(os.path.join(central, ATTENDANCE.database))
+    assert connection.execute("SELECT name FROM attendance_daily WHERE day = '2026-03-02'").fetchall() == [('Khan Sahib',)]
+    connection.close()
+
+
+def test_trim_changes_keeps_later_edits(desks):
+    central, north, _ = desks
+    desk = connect(os.path.join(north, ATTENDANCE.database))
+    desk.execute("UPDATE attendance SET name = 'Khan Sahib' WHERE id = 1")
+    desk.commit()
+    sync(central, 'north', north, trim=True)
+    assert desk.execute('SELECT COUNT(*) FROM attendance_changes').fetchone() == (0,)
+
+    desk.execute("UPDATE attendance SET name = 'K. Sahib' WHERE id = 1")
+    desk.commit()
+    desk.close()
+    sync(central, 'north', north, trim=True)
+    assert central_rows(central, ATTENDANCE)[0] == ('north:1', 'K. Sahib', '2026-03-01 09:00:00')
+
+
+def test_sync_relative_paths_and_partial_results(desks, monkeypatch):
+    central, north, _ = desks
+    monkeypatch.chdir(os.path.dirname(central))
+    os.remove(os.path.join(north, VISITORS.database))
+
+    results = []
+    with pytest.raises(SyncError):
+        for result in sync_site('central', 'north', 'north', ['attendance', 'visitors']):
+            results.append(result[1:4])
+    assert results == [('attendance', 3, 3)]
+    assert len(central_rows(central, ATTENDANCE)) == 3
+
+
+def test_sync_refuses_a_replaced_desk_database(desks):
+    central, north, _ = desks
+    sync(central, 'north', north)
+    for name in os.listdir(north):
+        os.remove(os.path.join(north, name))
+    open_desk(north, ATTENDANCE).close()
+    open_desk(north, VISITORS).close()
+
+    with pytest.raises(SyncError):
+        sync(central, 'north', north)
+
+
+def test_sync_command_line_with_relative_directories(desks, tmp_path):
+    # Relative directories are taken from the working directory, not the
+    # database directory, and the central one is created when missing.
+    database_dir = tmp_path / 'databases'
+    database_dir.mkdir()
+    environment = dict(os.environ, VISITOR_APPS_DB_DIR=str(database_dir))
+    command = [sys.executable, SYNC_SCRIPT, '--central', 'merged', 'north=north', 'south=south']
+
+    result = subprocess.run(command, cwd=tmp_path, env=environment, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[0].startswith('north attendance: 3 rows read, 3 inserted or changed')
+    assert len(central_rows(str(tmp_path / 'merged'), ATTENDANCE)) == 6
+    assert os.listdir(database_dir) == []
+
+    # A desk that cannot be read fails the run without stopping the others.
+    command[-1] = 'south=missing'
+    result = subprocess.run(command, cwd=tmp_path, env=environment, capture_output=True, text=True)
+    assert result.returncode == 1
+    assert 'north attendance: 0 rows read' in result.stdout
+    assert result.stderr.strip().splitlines()[-1].startswith('south:')
@@ -0,0 +1,99 @@
+import pytest
+from PyQt5.QtCore import Qt
+
+from repository import ATTENDANCE, CUSTOMERS
+from table_model import SqliteTableModel
+
+NAMES = ['Khan', 'Ahmed', 'Khan', 'Bibi', 'Ahmed', 'Khan', 'Bibi', 'Khan', 'Ahmed', 'Zia', 'Khan', 'Bibi']
+TIMESTAMPS = ['2026-01-01 09:00:00', '2026-01-01 09:00:00', '2026-01-02 09:00:00']
+
+
+def page_through(model, connection):
+    # Reads every page the way fetchMore does, minus the executor.
+    rows = []
+    model.last_key = None
+    while True:
+        sql, params = model.page_query()
+        page = connection.execute(sql, params).fetchall()
+        rows.extend(page)
+        if len(page) < model.page_size:
+            return rows
+        model.last_key = model.sort_key(page[-1])
+
+
+@pytest.fixture
+def attendance(open_table):
+    # Many rows share a name, a timestamp or both, so every page boundary
+    # falls inside a run of ties.
+    connection = open_table(ATTENDANCE)
+    connection.executemany(ATTENDANCE.insert_sql, [(name, TIMESTAMPS[position % len(TIMESTAMPS)]) for position, name in enumerate(NAMES)])
+    connection.commit()
+    return connection
+
+
+def attendance_model(page_size):
+    return SqliteTableModel(None, ATTENDANCE.table, ATTENDANCE.columns, ATTENDANCE.headers, page_size=page_size, sort_keys=ATTENDANCE.sort_keys)
+
+
+@pytest.mark.parametrize('page_size', [1, 2, 5])
+@pytest.mark.parametrize('column, descending', [(None, False), ('name', False), ('name', True), ('timestamp', False), ('timestamp', True)])
+def test_keyset_paging_covers_ties_in_order(attendance, page_size, column, descending):
+    model = attendance_model(page_size)
+    model.header_order = (column, descending) if column else None
+    model.set_order('id')
+
+    keys = {None: [], 'name': ['name', 'timestamp'], 'timestamp': ['timestamp']}[column]
+    positions = [ATTENDANCE.columns.index(key) for key in keys]
+    expected = sorted(attendance.execute(ATTENDANCE.select_sql).fetchall(), key=lambda row: tuple(row[position] for position in positions) + (row[0],), reverse=descending)
+    assert page_through(model, attendance) == expected
+
+
+def test_keyset_paging_with_filter_and_default_order(attendance):
+    model = attendance_model(2)
+    model.where = 'timestamp >= ? AND timestamp <= ?'
+    model.params = ('2026-01-01 00:00:00', '2026-01-01 23:59:59')
+    model.set_order('timestamp')
+
+    rows = page_through(model, attendance)
+    assert rows == attendance.execute(f'{ATTENDANCE.select_sql} WHERE timestamp < ? ORDER BY timestamp, id', ('2026-01-02',)).fetchall()
+
+
+def test_key_position_matches_descending_order(attendance):
+    model = attendance_model(100)
+    model.header_order = ('name', True)
+    model.set_order('id')
+    model.rows = page_through(model, attendance)
+
+    for position, row in enumerate(model.rows):
+        assert model.key_position(model.sort_key(row)) == position
+
+
+def test_keyset_paging_on_amounts(open_table):
+    connection = open_table(CUSTOMERS)
+    connection.executemany(CUSTOMERS.insert_sql, [(f'C{position % 3}', '0300', 'Tea', [500, 250, 500, 100][position % 4]) for position in range(10)])
+    connection.commit()
+    model = SqliteTableModel(None, CUSTOMERS.table, CUSTOMERS.columns, CUSTOMERS.headers, page_size=3, sort_keys=CUSTOMERS.sort_keys)
+    model.header_order = ('amount_cents', True)
+    model.set_order('id')
+
+    rows = page_through(model, connection)
+    assert [(row[4], row[0]) for row in rows] == sorted(((row[4], row[0]) for row in rows), reverse=True)
+    assert len(rows) == 10
+
+
+@pytest.mark.parametrize('column, order', [(1, Qt.AscendingOrder), (1, Qt.DescendingOrder), (2, Qt.DescendingOrder), (-1, Qt.AscendingOrder)])
+def test_local_sort_matches_sql_order(attendance, column, order):
+    # A fully loaded result is sorted in memory; it must come out as the
+    # query for that order would return it.
+    model = attendance_model(100)
+    model.rows = page_through(model, attendance)
+    model.has_more = False
+    model.header_order = ('id', False)
+    model.sort(column, order)
+    local = list(model.rows)
+
+    assert not model.has_more
+    assert local == page_through(model, attendance)
+    for position, row in enumerate(local):
+        assert model.key_position(model.sort_key(row)) == position
+
@@ -0,0 +1,40 @@
+from bulk_import import ConsoleJob
+from repository import VISITORS
+from storage import load_visitor_directory, reset_visitor_directory
+
+
+def test_visitor_directory_follows_inserts(open_table):
+    connection = open_table(VISITORS)
+    visits = [
+        ('Sana', '0300', '2026-03-02 10:00:00', 'Meeting'),
+        ('Sana Malik', '0300', '2026-03-05 10:00:00', 'Interview'),
+        # Back-dated: counts as a visit but does not rename the visitor.
+        ('S. M.', '0300', '2026-02-01 10:00:00', 'Delivery'),
+        ('Omar', '0311', '2026-03-04 11:00:00', 'Meeting'),
+    ]
+    for visit in visits:
+        connection.execute(VISITORS.insert_sql, visit)
+    connection.commit()
+    directory = connection.execute('SELECT mobile, name, last_visit, visit_count FROM visitor_directory ORDER BY mobile').fetchall()
+    assert directory == [('0300', 'Sana Malik', '2026-03-05 10:00:00', 3), ('0311', 'Omar', '2026-03-04 11:00:00', 1)]
+
+    # Only inserts maintain it: archiving deletes old visits but keeps their
+    # visitors on file, and a clear resets it explicitly.
+    connection.execute('DELETE FROM visitors WHERE mobile = ?', ('0311',))
+    connection.commit()
+    assert connection.execute('SELECT COUNT(*) FROM visitor_directory').fetchone() == (2,)
+    reset_visitor_directory(connection)
+    connection.commit()
+    assert connection.execute('SELECT COUNT(*) FROM visitor_directory').fetchone() == (0,)
+
+
+def test_visitor_directory_follows_imports(open_table, tmp_path):
+    # Imports drop the trigger for each batch and merge the batch in bulk.
+    connection = open_table(VISITORS)
+    connection.execute(VISITORS.insert_sql, ('Sana', '0300', '2026-03-02 10:00:00', 'Meeting'))
+    connection.commit()
+    file_name = tmp_path / 'visitors.csv'
+    file_name.write_text('name,mobile,timestamp,reason\nSana Malik,0300,2026-03-05 10:00:00,Interview\nOmar,0311,2026-03-04 11:00:00,Meeting\n', encoding='utf-8')
+    VISITORS.import_file(ConsoleJob(connection), str(file_name))
+    directory = load_visitor_directory(ConsoleJob(connection))
+    assert sorted(directory) == [('0300', 'Sana Malik', '2026-03-05 10:00:00', 2), ('0311', 'Omar', '2026-03-04 11:00:00', 1)]
@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+from PyQt5.QtCore import QCoreApplication, QObject, pyqtSignal
+
+from write_queue import WriteQueue
+
+
+class FailingExecutor(QObject):
+    # Fails every batch the way DatabaseExecutor reports a failed job.
+    error = pyqtSignal(object, object)
+
+    def __init__(self, failure):
+        super().__init__()
+        self.failure = failure
+
+    def submit(self, fn, *args, on_result=None, on_error=None, operation=None):
+        on_error(self.failure)
+
+
+@pytest.fixture
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+def test_failed_batch_is_reported_once(app):
+    failure = sqlite3.OperationalError('database is locked')
+    executor = FailingExecutor(failure)
+    handled = []
+    unhandled = []
+    executor.error.connect(lambda job, error: unhandled.append(error))
+
+    queue = WriteQueue(executor, max_batch=10)
+    queue.submit('INSERT', on_error=handled.append)
+    queue.submit('INSERT')
+    queue.submit('INSERT')
+    queue.flush()
+    assert handled == [failure]
+    assert unhandled == [failure]
+
+
+def test_failed_batch_with_handlers_skips_error_handler(app):
+    executor = FailingExecutor(sqlite3.OperationalError('disk I/O error'))
+    handled = []
+    unhandled = []
+    executor.error.connect(lambda job, error: unhandled.append(error))
+
+    queue = WriteQueue(executor, max_batch=10)
+    queue.submit('INSERT', on_error=handled.append)
+    queue.submit('INSERT', on_error=handled.append)
+    queue.flush()
+    assert len(handled) == 2
+    assert unhandled == []
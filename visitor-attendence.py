@@ -1,18 +1,44 @@
 import sys
+import argparse
+from startup_timing import StartupTimer
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
-    QTextEdit, QTableWidget, QTableWidgetItem, QDateTimeEdit, QFileDialog, QMessageBox
+    QCompleter, QDateTimeEdit, QComboBox, QMessageBox, QShortcut
 )
-from PyQt5.QtGui import QIcon, QFont
-from PyQt5.QtCore import Qt, QDateTime
-import sqlite3
+from PyQt5.QtGui import QIcon, QFont, QKeySequence
+from PyQt5.QtCore import Qt, QDateTime, QDate, QTime, QTimer, QStringListModel
 from datetime import datetime
 
+import instrumentation
+from bulk_import import ConsoleJob, import_summary
+from database import connect
+from date_range import DATE_RANGES, CUSTOM_RANGE
+from log_panel import LogPanel
+from retention import archived_until, clear_table
+from search_cache import SearchCache, SEARCH_DEBOUNCE_MS
+from column_filters import prefix_filter
+from repository import VISITORS
+from storage import reset_visitor_directory
+from table_model import SqliteTableModel
+from table_window import create_executors, create_table_view, date_range_filter, export_records, import_records, prompt_and_archive, show_filtered, shutdown_executors
+from visitor_directory import VisitorDirectory, load_directory
+from write_queue import WriteQueue
+
+
 class VisitorTrackingSystem(QWidget):
     def __init__(self):
         super().__init__()
 
-        self.db_connection = sqlite3.connect('visitors.db')
+        self.db_executor, self.report_executor, self.bulk_executor = create_executors(self, VISITORS.database)
+        self.write_queue = WriteQueue(self.db_executor, parent=self)
+        self.search_indexed = False
+        self.search_cache = SearchCache([1, 2, 4])
+        self.search_term = ''
+        self.archived_until = None
+        self.attached_months = None
+        self.directory = VisitorDirectory()
+        self.directory_requested = False
+        self.recognized_mobile = None
         self.create_table()
 
         self.init_ui()
@@ -34,6 +60,14 @@ class VisitorTrackingSystem(QWidget):
         self.mobile_label = QLabel('Enter Mobile Number:', self)
         self.mobile_input = QLineEdit(self)
 
+        # The completers' lists are refilled from the in-memory directory as
+        # the user types, so Qt only ever filters a handful of entries.
+        self.name_completer = QCompleter(QStringListModel(self), self)
+        self.name_completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self.name_input.setCompleter(self.name_completer)
+        self.mobile_completer = QCompleter(QStringListModel(self), self)
+        self.mobile_input.setCompleter(self.mobile_completer)
+
         self.timestamp_label = QLabel('Timestamp:', self)
         self.timestamp_input = QDateTimeEdit(self)
         self.timestamp_input.setDateTime(QDateTime.currentDateTime())
@@ -44,27 +78,56 @@ class VisitorTrackingSystem(QWidget):
         self.mark_visit_button = QPushButton('Mark Visit', self)
         self.mark_visit_button.setStyleSheet("background-color: #4CAF50; color: white;")
 
-        self.search_label = QLabel('Search Visitor Name:', self)
+        self.search_label = QLabel('Search Name, Mobile or Reason:', self)
         self.search_input = QLineEdit(self)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.search_visitors)
 
         self.search_button = QPushButton('Search', self)
         self.search_button.setStyleSheet("background-color: #008CBA; color: white;")
 
+        self.date_range_label = QLabel('Show:', self)
+        self.date_range_input = QComboBox(self)
+        self.date_range_input.addItems(DATE_RANGES)
+        self.date_from_label = QLabel('From:', self)
+        self.date_from_input = QDateTimeEdit(QDateTime(QDate.currentDate(), QTime(0, 0)), self)
+        self.date_from_input.setCalendarPopup(True)
+        self.date_to_label = QLabel('To:', self)
+        self.date_to_input = QDateTimeEdit(QDateTime(QDate.currentDate(), QTime(23, 59, 59)), self)
+        self.date_to_input.setCalendarPopup(True)
+        self.date_from_input.setEnabled(False)
+        self.date_to_input.setEnabled(False)
+
+        self.reason_filter_label = QLabel('Reason starts with:', self)
+        self.reason_filter_input = QLineEdit(self)
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.filter_timer.timeout.connect(self.filters_changed)
+
         self.export_button = QPushButton('Export to CSV', self)
         self.export_button.setStyleSheet("background-color: #f44336; color: white;")
 
         self.view_details_button = QPushButton('View Details', self)
         self.view_details_button.setStyleSheet("background-color: #555555; color: white;")
 
+        self.import_button = QPushButton('Import CSV', self)
+        self.import_button.setStyleSheet("background-color: #2c3e50; color: white;")
         self.clear_records_button = QPushButton('Clear Records', self)
         self.clear_records_button.setStyleSheet("background-color: #FFA500; color: white;")
+        self.archive_button = QPushButton('Archive Old Records', self)
+        self.archive_button.setStyleSheet("background-color: #7f8c8d; color: white;")
 
-        self.log_display = QTextEdit(self)
-        self.log_display.setReadOnly(True)
+        self.log_display = LogPanel('visitors', self)
 
-        self.visitors_table = QTableWidget(self)
-        self.visitors_table.setColumnCount(5)
-        self.visitors_table.setHorizontalHeaderLabels(['ID', 'Name', 'Mobile', 'Timestamp', 'Reason'])
+        self.visitors_model = SqliteTableModel(self.report_executor, VISITORS.table, VISITORS.columns, VISITORS.headers, formatters=VISITORS.formatters, sort_keys=VISITORS.sort_keys, deferred=True, parent=self)
+        self.visitors_model.fully_loaded.connect(self.cache_search_results)
+        # The directory loads once the first page is in, so it never delays it.
+        self.visitors_model.rowsInserted.connect(self.load_directory)
+        self.visitors_model.fully_loaded.connect(self.load_directory)
+        self.visitors_table = create_table_view(self, self.visitors_model)
 
         layout = QVBoxLayout(self)
 
@@ -86,36 +149,65 @@ class VisitorTrackingSystem(QWidget):
         search_layout.addWidget(self.search_button)
         layout.addLayout(search_layout)
 
+        date_layout = QHBoxLayout()
+        date_layout.addWidget(self.date_range_label)
+        date_layout.addWidget(self.date_range_input)
+        date_layout.addWidget(self.date_from_label)
+        date_layout.addWidget(self.date_from_input)
+        date_layout.addWidget(self.date_to_label)
+        date_layout.addWidget(self.date_to_input)
+        date_layout.addWidget(self.reason_filter_label)
+        date_layout.addWidget(self.reason_filter_input)
+        layout.addLayout(date_layout)
+
         buttons_layout = QHBoxLayout()
         buttons_layout.addWidget(self.export_button)
         buttons_layout.addWidget(self.view_details_button)
+        buttons_layout.addWidget(self.import_button)
         buttons_layout.addWidget(self.clear_records_button)
+        buttons_layout.addWidget(self.archive_button)
         layout.addLayout(buttons_layout)
 
         layout.addWidget(self.log_display)
         layout.addWidget(self.visitors_table)
 
         self.mark_visit_button.clicked.connect(self.mark_visit)
+        self.name_input.textEdited.connect(self.complete_name)
+        self.mobile_input.textEdited.connect(self.complete_mobile)
+        self.name_completer.activated[str].connect(self.name_chosen)
+        self.mobile_completer.activated[str].connect(self.recognize_visitor)
+        self.mobile_input.editingFinished.connect(self.recognize_visitor)
         self.search_button.clicked.connect(self.search_visitors)
+        self.search_input.returnPressed.connect(self.search_visitors)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        self.date_range_input.currentIndexChanged.connect(self.date_range_changed)
+        self.date_from_input.dateTimeChanged.connect(self.date_range_changed)
+        self.date_to_input.dateTimeChanged.connect(self.date_range_changed)
+        self.reason_filter_input.textChanged.connect(self.filter_timer.start)
+        self.reason_filter_input.returnPressed.connect(self.filters_changed)
         self.export_button.clicked.connect(self.export_to_csv)
         self.view_details_button.clicked.connect(self.view_details)
+        self.import_button.clicked.connect(self.import_from_csv)
         self.clear_records_button.clicked.connect(self.clear_records)
+        self.archive_button.clicked.connect(self.archive_old_records)
+
+        if instrumentation.ENABLED:
+            self.stats_shortcut = QShortcut(QKeySequence('Ctrl+Shift+S'), self)
+            self.stats_shortcut.activated.connect(self.show_stats)
 
-        self.update_visitors_table()
+        # Rows are read once create_table has finished.
         self.show()
 
     def create_table(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS visitors (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                mobile TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                reason TEXT NOT NULL
-            )
-        ''')
-        self.db_connection.commit()
+        def table_created(indexed):
+            self.search_indexed = indexed
+            self.visitors_model.refresh()
+
+        def archive_state_loaded(until):
+            self.archived_until = until
+
+        self.db_executor.submit(VISITORS.create_table, on_result=table_created)
+        self.db_executor.submit(archived_until, VISITORS.table, on_result=archive_state_loaded)
 
     def mark_visit(self):
         name = self.name_input.text().strip()
@@ -124,90 +216,171 @@ class VisitorTrackingSystem(QWidget):
         reason = self.reason_input.text().strip()
 
         if name and mobile and reason:
-            cursor = self.db_connection.cursor()
-            cursor.execute('INSERT INTO visitors (name, mobile, timestamp, reason) VALUES (?, ?, ?, ?)', (name, mobile, timestamp, reason))
-            self.db_connection.commit()
-
-            self.update_visitors_table()
-            self.log_display.append(f'Marked visit for {name} at {timestamp} - Reason: {reason}')
+            def visit_marked(row_id):
+                self.search_cache.clear()
+                self.directory.add_visit(mobile, name, timestamp)
+                self.visitors_model.refresh_row(row_id)
+                self.log_display.append(f'Marked visit for {name} at {timestamp} - Reason: {reason}')
+
+            self.write_queue.submit(VISITORS.insert_sql, (name, mobile, timestamp, reason), on_result=visit_marked, operation='mark')
+
+    def load_directory(self, *_):
+        if self.directory_requested:
+            return
+
+        def directory_loaded(directory):
+            self.directory = directory
+
+        self.directory_requested = True
+        self.bulk_executor.submit(load_directory, on_result=directory_loaded, operation='directory')
+
+    def reload_directory(self):
+        self.directory_requested = False
+        self.load_directory()
+
+    def complete_name(self, text):
+        text = text.strip()
+        self.name_completer.model().setStringList(self.directory.complete_name(text) if text else [])
+
+    def complete_mobile(self, text):
+        text = text.strip()
+        self.mobile_completer.model().setStringList(self.directory.complete_mobile(text) if text else [])
+
+    def name_chosen(self, name):
+        if not self.mobile_input.text().strip():
+            mobile = self.directory.mobile_for_name(name)
+            if mobile is not None:
+                self.mobile_input.setText(mobile)
+                self.recognize_visitor()
+
+    def recognize_visitor(self, *_):
+        # A known number fills in the visitor's latest name, unless one has
+        # already been typed.
+        mobile = self.mobile_input.text().strip()
+        known = self.directory.visitor(mobile)
+        if known is None:
+            return
+        name, last_visit, visit_count = known
+        if not self.name_input.text().strip():
+            self.name_input.setText(name)
+        if self.recognized_mobile != mobile:
+            self.recognized_mobile = mobile
+            self.log_display.append(f'Returning visitor {name} ({mobile}): {visit_count} previous visits, last on {last_visit}')
 
     def search_visitors(self):
+        self.search_timer.stop()
         search_name = self.search_input.text().strip()
+        self.search_term = search_name
+        self.apply_filters()
         if search_name:
-            cursor = self.db_connection.cursor()
-            cursor.execute('SELECT * FROM visitors WHERE name LIKE ?', (f'%{search_name}%',))
-            data = cursor.fetchall()
-
-            self.visitors_table.setRowCount(len(data))
-            for row_index, row_data in enumerate(data):
-                for col_index, col_data in enumerate(row_data):
-                    item = QTableWidgetItem(str(col_data))
-                    item.setFlags(Qt.ItemIsEnabled)
-                    self.visitors_table.setItem(row_index, col_index, item)
-
             self.log_display.append(f'Searched visits for {search_name}')
 
-    def export_to_csv(self):
-        options = QFileDialog.Options()
-        options |= QFileDialog.DontUseNativeDialog
-        file_name, _ = QFileDialog.getSaveFileName(self, "Save Visitors Data", "", "CSV Files (*.csv);;All Files (*)", options=options)
-
-        if file_name:
-            with open(file_name, 'w') as file:
-                cursor = self.db_connection.cursor()
-                cursor.execute('SELECT * FROM visitors')
-                data = cursor.fetchall()
+    def date_range_changed(self):
+        custom = self.date_range_input.currentText() == CUSTOM_RANGE
+        self.date_from_input.setEnabled(custom)
+        self.date_to_input.setEnabled(custom)
+        self.filters_changed()
+
+    def filters_changed(self):
+        # Cached searches were taken under the previous range and filters.
+        self.filter_timer.stop()
+        self.search_cache.clear()
+        self.apply_filters()
+
+    def apply_filters(self):
+        clauses = []
+        params = []
+        order_by = 'id'
+        table = None
+
+        date_range = date_range_filter(self, VISITORS)
+        if date_range is not None:
+            where, bounds, table = date_range
+            clauses.append(where)
+            params.extend(bounds)
+            order_by = 'timestamp'
+
+        reason = self.reason_filter_input.text().strip()
+        if reason:
+            where, filter_params = prefix_filter('reason', reason)
+            clauses.append(where)
+            params.extend(filter_params)
+
+        show_filtered(self, self.visitors_model, VISITORS, clauses, params, order_by, table)
+
+    def cache_search_results(self):
+        if self.search_term:
+            self.search_cache.put(self.search_term, self.visitors_model.rows)
 
-                headers = ['ID', 'Name', 'Mobile', 'Timestamp', 'Reason']
-                file.write(','.join(headers) + '\n')
+    def export_to_csv(self):
+        export_records(self, VISITORS, 'Visitors', 'visitor')
 
-                for row_data in data:
-                    file.write(','.join(map(str, row_data)) + '\n')
+    def import_from_csv(self):
+        def imported():
+            self.search_cache.clear()
+            self.update_visitors_table()
+            self.reload_directory()
 
-            self.log_display.append(f'Exported visitors data to {file_name}')
+        import_records(self, VISITORS, 'Visitors', imported)
 
     def view_details(self):
-        selected_row = self.visitors_table.currentRow()
-        if selected_row >= 0:
-            id_item = self.visitors_table.item(selected_row, 0)
-            name_item = self.visitors_table.item(selected_row, 1)
-            mobile_item = self.visitors_table.item(selected_row, 2)
-            timestamp_item = self.visitors_table.item(selected_row, 3)
-            reason_item = self.visitors_table.item(selected_row, 4)
-
-            id_value = id_item.text()
-            name_value = name_item.text()
-            mobile_value = mobile_item.text()
-            timestamp_value = timestamp_item.text()
-            reason_value = reason_item.text()
-
-            details = f'Details for ID {id_value}:\nName: {name_value}\nMobile: {mobile_value}\nTimestamp: {timestamp_value}\nReason: {reason_value}'
+        selected_index = self.visitors_table.currentIndex()
+        if selected_index.isValid():
+            record = VISITORS.record(self.visitors_model.record(selected_index.row()))
+
+            details = f'Details for ID {record.id}:\nName: {record.name}\nMobile: {record.mobile}\nTimestamp: {record.timestamp}\nReason: {record.reason}'
             self.log_display.append(details)
 
     def clear_records(self):
         confirmation = QMessageBox.question(self, 'Confirmation', 'Are you sure you want to clear all records? This action cannot be undone.', QMessageBox.Yes | QMessageBox.No)
         if confirmation == QMessageBox.Yes:
-            cursor = self.db_connection.cursor()
-            cursor.execute('DELETE FROM visitors')
-            self.db_connection.commit()
+            def records_cleared(_):
+                self.search_cache.clear()
+                self.directory = VisitorDirectory()
+                self.update_visitors_table()
+                self.log_display.append('All records cleared.' if self.archived_until is None else 'All records cleared. Archived months were kept.')
 
-            self.update_visitors_table()
-            self.log_display.append('All records cleared.')
+            self.write_queue.flush()
+            self.db_executor.submit(clear_table, VISITORS.table, reset_visitor_directory, on_result=records_cleared, operation='clear')
+
+    def archive_old_records(self):
+        prompt_and_archive(self, VISITORS, 'visitor')
 
     def update_visitors_table(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute('SELECT * FROM visitors')
-        data = cursor.fetchall()
+        self.visitors_model.refresh()
+
+    def show_database_error(self, job, error):
+        self.log_display.append(f'Database error: {error}')
+
+    def show_stats(self):
+        self.log_display.append(instrumentation.stats.report())
+        if instrumentation.STATS_FILE:
+            instrumentation.stats.dump(instrumentation.STATS_FILE)
+            self.log_display.append(f'Performance stats written to {instrumentation.STATS_FILE}')
 
-        self.visitors_table.setRowCount(len(data))
-        for row_index, row_data in enumerate(data):
-            for col_index, col_data in enumerate(row_data):
-                item = QTableWidgetItem(str(col_data))
-                item.setFlags(Qt.ItemIsEnabled)
-                self.visitors_table.setItem(row_index, col_index, item)
+    def closeEvent(self, event):
+        shutdown_executors(self)
+        super().closeEvent(event)
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description='Visitor Tracking System')
+    parser.add_argument('--import', dest='import_file', metavar='CSV', help='bulk-load visitors records from a CSV file (optionally .gz) and exit')
+    parser.add_argument('--startup-report', metavar='FILE', nargs='?', const='-', help='report import, first paint and first rows times as a JSON line to stderr, or append it to FILE')
+    args, qt_args = parser.parse_known_args()
+
+    startup_timer = StartupTimer('visitors', args.startup_report)
+    startup_timer.mark('imports_ms')
+
+    if args.import_file:
+        job = ConsoleJob(connect(VISITORS.database))
+        VISITORS.create_table(job)
+        result = VISITORS.import_file(job, args.import_file)
+        print(file=sys.stderr)
+        print(import_summary(result))
+        sys.exit(0)
+
+    app = QApplication(sys.argv[:1] + qt_args)
     window = VisitorTrackingSystem()
+    startup_timer.watch(window, window.visitors_model)
     sys.exit(app.exec_())
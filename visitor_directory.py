@@ -0,0 +1,81 @@
+from bisect import bisect_left
+
+from storage import load_visitor_directory
+
+COMPLETION_LIMIT = 20
+
+
+class PrefixIndex:
+    # Keys kept sorted, so every key starting with a prefix sits in one run
+    # found by a binary search; adding a key is a search and a list insert.
+    def __init__(self, keys=()):
+        self.keys = sorted(set(keys))
+
+    def add(self, key):
+        position = bisect_left(self.keys, key)
+        if position == len(self.keys) or self.keys[position] != key:
+            self.keys.insert(position, key)
+
+    def matches(self, prefix, limit=COMPLETION_LIMIT):
+        found = []
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and len(found) < limit and self.keys[position].startswith(prefix):
+            found.append(self.keys[position])
+            position += 1
+        return found
+
+
+class VisitorDirectory:
+    # In-memory copy of the visitor_directory table for autocomplete:
+    # mobile numbers and names (matched case-insensitively) by prefix, and a
+    # visitor's latest name, number and visit count by exact key.
+    def __init__(self, rows=()):
+        self.by_mobile = {}
+        self.by_name = {}
+        for mobile, name, last_visit, visit_count in rows:
+            self.by_mobile[mobile] = (name, last_visit, visit_count)
+            self.remember_name(mobile, name, last_visit)
+        self.mobiles = PrefixIndex(self.by_mobile)
+        self.names = PrefixIndex(self.by_name)
+
+    def remember_name(self, mobile, name, last_visit):
+        # A name shared by several numbers completes to the latest visitor.
+        key = name.casefold()
+        known = self.by_name.get(key)
+        if known is None or last_visit >= known[2]:
+            self.by_name[key] = (name, mobile, last_visit)
+
+    def add_visit(self, mobile, name, timestamp):
+        # Mirrors the visitor_directory_insert trigger.
+        known = self.by_mobile.get(mobile)
+        if known is None:
+            self.by_mobile[mobile] = (name, timestamp, 1)
+            self.mobiles.add(mobile)
+        elif timestamp >= known[1]:
+            self.by_mobile[mobile] = (name, timestamp, known[2] + 1)
+        else:
+            self.by_mobile[mobile] = (known[0], known[1], known[2] + 1)
+            return
+        if name.casefold() not in self.by_name:
+            self.names.add(name.casefold())
+        self.remember_name(mobile, name, timestamp)
+
+    def complete_mobile(self, prefix, limit=COMPLETION_LIMIT):
+        return self.mobiles.matches(prefix, limit)
+
+    def complete_name(self, prefix, limit=COMPLETION_LIMIT):
+        return [self.by_name[key][0] for key in self.names.matches(prefix.casefold(), limit)]
+
+    def visitor(self, mobile):
+        # (name, last visit, visit count) for a known number, else None.
+        return self.by_mobile.get(mobile)
+
+    def mobile_for_name(self, name):
+        known = self.by_name.get(name.casefold())
+        return known[1] if known is not None else None
+
+
+def load_directory(job):
+    # Built on the database thread, so sorting a large directory never
+    # stalls the window.
+    return VisitorDirectory(load_visitor_directory(job))
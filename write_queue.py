@@ -0,0 +1,73 @@
+import os
+
+from PyQt5.QtCore import QObject, QTimer
+
+from db_worker import execute
+from storage import commit_batch
+
+# Group commit is off by default: every write commits on its own. Setting
+# VISITOR_APPS_GROUP_COMMIT_BATCH above 1 queues writes and commits them
+# together once that many are pending or the oldest has waited
+# VISITOR_APPS_GROUP_COMMIT_DELAY_MS. A crash can then lose at most the
+# writes still queued in that window; how durable a commit is against power
+# loss is governed separately by VISITOR_APPS_SYNCHRONOUS (see database.py).
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get('VISITOR_APPS_GROUP_COMMIT_BATCH', 1))
+GROUP_COMMIT_MAX_DELAY_MS = int(os.environ.get('VISITOR_APPS_GROUP_COMMIT_DELAY_MS', 50))
+
+
+class WriteQueue(QObject):
+    def __init__(self, executor, max_batch=GROUP_COMMIT_MAX_BATCH, max_delay_ms=GROUP_COMMIT_MAX_DELAY_MS, parent=None):
+        super().__init__(parent)
+
+        self.executor = executor
+        self.max_batch = max_batch
+        self.pending = []
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(max_delay_ms)
+        self.timer.timeout.connect(self.flush)
+
+    def submit(self, sql, params=(), on_result=None, on_error=None, operation=None):
+        if self.max_batch <= 1:
+            self.executor.submit(execute, sql, params, on_result=on_result, on_error=on_error, operation=operation)
+            return
+
+        self.pending.append((sql, params, on_result, on_error, operation))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        self.timer.stop()
+        if not self.pending:
+            return
+
+        batch = self.pending
+        self.pending = []
+
+        def batch_committed(results):
+            for (_, _, on_result, on_error, _), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    if on_error is not None:
+                        on_error(result)
+                    else:
+                        self.executor.error.emit(None, result)
+                elif on_result is not None:
+                    on_result(result)
+
+        def batch_failed(error):
+            # As in batch_committed, the error handler only hears about
+            # writes that have no on_error of their own, and only once.
+            unhandled = False
+            for _, _, _, on_error, _ in batch:
+                if on_error is not None:
+                    on_error(error)
+                else:
+                    unhandled = True
+            if unhandled:
+                self.executor.error.emit(None, error)
+
+        operation = batch[0][4] or 'commit_batch'
+        self.executor.submit(commit_batch, [(sql, params) for sql, params, _, _, _ in batch], on_result=batch_committed, on_error=batch_failed, operation=operation)